@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'first_app',
     'django_extensions',
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'first_app.metrics.MetricsMiddleware',
+    'first_app.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +88,20 @@ DATABASES['default']['TEST'] = {
     'NAME': 'test_api_django_db',  # Explicitly set test database name
 }
 
+# Реплики для чтения (first_app.replicas): URL через запятую. GET/HEAD/OPTIONS читают со случайной реплики,
+# остальные запросы — с primary; клиент (токен или сессия), который что-то записал, ещё
+# READ_YOUR_WRITES_SECONDS читает с primary. Локально это две базы SQLite: DATABASE_URL=sqlite:////tmp/primary.sqlite3
+# DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_DATABASES = []
+for number, url in enumerate(DATABASE_REPLICA_URLS, 1):
+    DATABASES[f'replica{number}'] = dj_database_url.parse(url, conn_max_age=600)
+    # В тестах реплика — зеркало тестовой базы primary
+    DATABASES[f'replica{number}']['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(f'replica{number}')
+DATABASE_ROUTERS = ['first_app.replicas.ReplicaRouter']
+READ_YOUR_WRITES_SECONDS = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -105,10 +122,20 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'first_app.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-    ]
+    ],
+    # orjson необязателен: без него эти классы работают как стандартные JSONRenderer/JSONParser
+    'DEFAULT_RENDERER_CLASSES': [
+        'first_app.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'first_app.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # Internationalization
@@ -134,7 +161,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "BACKEND": "first_app.metrics.CountingRedisCache",
         "LOCATION": "redis://127.0.0.1:6379",
     }
 }
@@ -146,3 +173,89 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Moscow'
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-reservation-outbox': {
+        'task': 'first_app.tasks.dispatch_reservation_outbox',
+        'schedule': 2.0,
+    },
+    'refresh-sales-rollups': {
+        'task': 'first_app.tasks.refresh_sales_rollups',
+        'schedule': 300.0,
+    },
+    'deduct-completed-orders': {
+        'task': 'first_app.tasks.deduct_completed_orders',
+        'schedule': 30.0,
+    },
+    'compact-stock-ledger': {
+        'task': 'first_app.tasks.compact_stock_ledger',
+        'schedule': 60.0 * 60,
+    },
+}
+
+# Бронирование столов: сколько минут гости занимают стол и сколько живёт индекс доступности в кэше
+RESERVATION_SEATING_MINUTES = 120
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
+# Сколько секунд документ меню ресторана хранится в кэше (версия сбрасывается при любом изменении меню)
+MENU_CACHE_TIMEOUT = 60 * 15
+
+# Агрегаты продаж: насколько отступать назад от отметки последнего прохода (задача читает заказы с реплики,
+# поэтому запас должен перекрывать и её отставание)
+SALES_ROLLUP_OVERLAP_SECONDS = 120
+
+# Уведомления о бронированиях: размер пачки и сколько пачек outbox передавать за один проход диспетчера
+RESERVATION_NOTIFY_BATCH_SIZE = 500
+RESERVATION_OUTBOX_MAX_BATCHES = 20
+# Не ушедшее письмо остаётся в outbox: через сколько секунд повторить и после скольких неудач снять событие
+RESERVATION_NOTIFY_RETRY_SECONDS = 60
+RESERVATION_NOTIFY_MAX_ATTEMPTS = 3
+
+# Журнал движений по складу: снимок остатков берётся на момент «сейчас минус задержка»,
+# чтобы в него не попали ещё не закоммиченные движения
+STOCK_SNAPSHOT_LAG_SECONDS = 300
+
+# Списание ингредиентов по рецептам: при STOCK_DEDUCTION_DEFERRED завершение заказа не списывает сразу,
+# а оставляет заказ пакетной задаче (размер пачки и число пачек за проход)
+STOCK_DEDUCTION_DEFERRED = False
+STOCK_DEDUCTION_BATCH_SIZE = 200
+STOCK_DEDUCTION_MAX_BATCHES = 10
+
+# Поиск (first_app.search.RankedSearchFilter): конфигурация to_tsvector; 'simple' не стеммит и одинаково
+# разбирает русские и латинские имена
+SEARCH_CONFIG = 'simple'
+
+# Кэш токенов (first_app.authentication): сколько пользователь живёт в общем кэше, размер и время жизни
+# LRU процесса (отзыв из чужого процесса виден не позже чем через AUTH_TOKEN_LOCAL_TTL) и отметки об отзыве
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 15
+AUTH_TOKEN_LOCAL_SIZE = 1024
+AUTH_TOKEN_LOCAL_TTL = 5
+AUTH_TOKEN_REVOKED_TIMEOUT = 30
+
+# Метрики (first_app.metrics): путь эндпоинта Prometheus; при нескольких воркерах gunicorn — общий каталог,
+# куда каждый воркер не чаще раза в METRICS_FLUSH_SECONDS сбрасывает свои счётчики (снимки завершившихся
+# воркеров удаляет хук child_exit в gunicorn.conf.py)
+METRICS_PATH = '/metrics'
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_SECONDS = 5
+
+# Бенчмарк эндпоинтов (first_app.benchmarks, manage.py benchmark): замеров на эндпоинт и допустимый рост
+# задержки относительно first_app/benchmark_baseline.json — доля плюс абсолютный запас от шума быстрых эндпоинтов
+BENCHMARK_ITERATIONS = 50
+BENCHMARK_LATENCY_TOLERANCE = float(os.getenv('BENCHMARK_LATENCY_TOLERANCE', '1.0'))
+BENCHMARK_LATENCY_SLACK_MS = 5
+
+# Асинхронные версии горячих GET-эндпоинтов (first_app.async_urls): включаются под ASGI (api_django/asgi.py
+# ставит ASYNC_READ_VIEWS=1), под gunicorn с синхронными воркерами остаются обычные ViewSet
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '0') == '1'
+
+# Лента зала и кухни по SSE (first_app.live, только под ASGI): 'redis' — события расходятся по всем воркерам
+# через pub/sub, 'local' — только внутри процесса (разработка с одним воркером, тесты); интервал пинга,
+# чтобы прокси не закрывали тихое соединение, и сколько событий ждут медленного клиента до закрытия потока
+LIVE_EVENTS_BACKEND = os.getenv('LIVE_EVENTS_BACKEND', 'redis')
+LIVE_EVENTS_REDIS_URL = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0')
+LIVE_EVENTS_HEARTBEAT_SECONDS = 15
+LIVE_EVENTS_QUEUE_SIZE = 256
+# Публикация в Redis идёт из фонового потока, а не из запроса: таймаут операций с Redis в секундах
+# и сколько событий ждут отправки, пока Redis недоступен
+LIVE_EVENTS_REDIS_TIMEOUT = 0.5
+LIVE_EVENTS_PUBLISH_QUEUE_SIZE = 10000
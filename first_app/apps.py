@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class FirstAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'first_app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from .metrics import install_query_counter
+        from .replicas import install_write_tracker
+        from .search import install_sqlite_functions
+        connection_created.connect(install_query_counter)
+        connection_created.connect(install_write_tracker)
+        connection_created.connect(install_sqlite_functions)
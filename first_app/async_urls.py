@@ -0,0 +1,24 @@
+from django.urls import path
+from .async_views import aavailability, alist, amenu, aretrieve, async_read_view
+from .views import RestaurantLiveView, RestaurantViewSet, TableViewSet
+
+# Асинхронные версии горячих GET-маршрутов роутера из first_app.urls (те же пути и имена);
+# подключаются перед роутером при ASYNC_READ_VIEWS
+urlpatterns = [
+    path('api/v1/restaurants/<int:pk>/menu/',
+         async_read_view(RestaurantViewSet, {'get': 'menu'}, amenu, 'restaurant', detail=True),
+         name='restaurant-menu'),
+    path('api/v1/tables/',
+         async_read_view(TableViewSet, {'get': 'list', 'post': 'create'}, alist, 'table', detail=False),
+         name='table-list'),
+    path('api/v1/tables/availability/',
+         async_read_view(TableViewSet, {'get': 'availability'}, aavailability, 'table', detail=False),
+         name='table-availability'),
+    path('api/v1/tables/<int:pk>/',
+         async_read_view(TableViewSet, {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+                                        'delete': 'destroy'}, aretrieve, 'table', detail=True),
+         name='table-detail'),
+    # Поток SSE держит соединение часами: под синхронными воркерами каждый экран занимал бы воркер,
+    # поэтому у роутера этого маршрута нет
+    path('api/v1/restaurants/<int:pk>/live/', RestaurantLiveView.as_view(), name='restaurant-live'),
+]
@@ -0,0 +1,143 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from . import menus
+from .availability import afind_available_tables
+from .mixins import FastListMixin
+from .readers import reader_for_serializer
+
+
+async def apaginate_queryset(view, queryset):
+    """
+    paginate_queryset на асинхронном ORM: COUNT(*) и строки страницы читаются через acount() и async for,
+    ссылки и ответ строит тот же экземпляр PageNumberPagination. Остальные пагинаторы (keyset и т.п.)
+    работают как есть в потоке sync_to_async.
+    """
+    paginator = view.paginator
+    if paginator is None:
+        return None
+    if type(paginator).paginate_queryset is not PageNumberPagination.paginate_queryset:
+        return await sync_to_async(view.paginate_queryset)(queryset)
+    request = view.request
+    paginator.request = request
+    page_size = paginator.get_page_size(request)
+    if not page_size:
+        return None
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        paginator.page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    if django_paginator.num_pages > 1 and paginator.template is not None:
+        paginator.display_page_controls = True
+    paginator.page.object_list = [row async for row in paginator.page.object_list]
+    return paginator.page.object_list
+
+
+async def aget_object(view):
+    """get_object на асинхронном ORM: те же фильтры, lookup_field и 404, что у GenericAPIView."""
+    # filter_queryset может сам ходить в базу (FTS5 на SQLite), поэтому выполняется в потоке
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    try:
+        instance = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+    except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    view.check_object_permissions(view.request, instance)
+    return instance
+
+
+async def alist(view, request, **kwargs):
+    async def handler(request):
+        reader = None
+        if isinstance(view, FastListMixin):
+            reader = reader_for_serializer(view.get_serializer_class(), *view.get_sparse_selection())
+        queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+        if reader is not None:
+            queryset = reader.values(queryset)
+        page = await apaginate_queryset(view, queryset)
+        rows = page if page is not None else [row async for row in queryset]
+        data = reader.render(rows) if reader is not None else view.get_serializer(rows, many=True).data
+        return view.get_paginated_response(data) if page is not None else Response(data)
+    return await view.aconditional_response(handler, request)
+
+
+async def aretrieve(view, request, **kwargs):
+    async def handler(request):
+        return Response(view.get_serializer(await aget_object(view)).data)
+    return await view.aconditional_response(handler, request)
+
+
+async def amenu(view, request, pk):
+    document = await menus.aget_document(pk)
+    if document is None:
+        restaurant = await aget_object(view)
+        document = await menus.abuild_document(restaurant)
+        await menus.astore_document(restaurant.pk, document)
+    return Response(document, status=status.HTTP_200_OK)
+
+
+async def aavailability(view, request, **kwargs):
+    params = view.get_availability_query(request)
+    slots = await afind_available_tables(params['restaurant'], params['date'], params['time'], params['guests'],
+                                         params.get('duration'))
+    return Response({'restaurant': params['restaurant'], 'date': params['date'], 'slots': slots},
+                    status=status.HTTP_200_OK)
+
+
+def _plain_response(response):
+    # Отрендеренный Response Django всё равно отдал бы в sync_to_async(response.render); обычный HttpResponse — нет
+    if not isinstance(response, Response):
+        return response
+    response.render()
+    plain = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        plain[header] = value
+    return plain
+
+
+def async_read_view(viewset_class, actions, handler, basename, detail):
+    """
+    Асинхронное представление для маршрута ViewSet: GET/HEAD с JSON-ответом обрабатывает handler
+    (асинхронный ORM и API кэша), всё остальное — запись, Browsable API, ошибки аутентификации,
+    прав и троттлинга — уходит в сам ViewSet через sync_to_async, поэтому поведение маршрута не меняется.
+    Настройки (queryset, фильтры, сериализатор, пагинация, ETag) берутся из экземпляра ViewSet.
+    """
+    actions = {**actions, 'head': actions['get']}
+    fallback = sync_to_async(viewset_class.as_view(dict(actions), basename=basename, detail=detail))
+
+    async def view(request, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await fallback(request, **kwargs)
+        viewset = viewset_class(basename=basename, detail=detail)
+        viewset.action_map = actions
+        for method, action in actions.items():
+            setattr(viewset, method, getattr(viewset, action))
+        viewset.args, viewset.kwargs = (), kwargs
+        drf_request = viewset.request = viewset.initialize_request(request, **kwargs)
+        viewset.headers = viewset.default_response_headers
+        try:
+            # Согласование формата, аутентификация, права и троттлинг — как в APIView.dispatch
+            await sync_to_async(viewset.initial)(drf_request, **kwargs)
+        except Exception:
+            return await fallback(request, **kwargs)
+        if not isinstance(drf_request.accepted_renderer, JSONRenderer):
+            return await fallback(request, **kwargs)
+        try:
+            response = await handler(viewset, drf_request, **kwargs)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+        return _plain_response(viewset.finalize_response(drf_request, response, **kwargs))
+
+    # actions читает first_app.metrics: метки маршрута те же, что у синхронного ViewSet
+    view.actions = actions
+    return csrf_exempt(view)
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from . import metrics
+from .replicas import primary_reads
+
+LOCAL, SHARED, DATABASE = 'local', 'shared', 'db'
+# Отметка об отзыве: пока она в кэше, запрос, прочитавший токен из БД до отзыва, не вернёт его в кэш
+REVOKED = 'revoked'
+# Что о пользователе хранится в кэше: хватает для аутентификации и проверок прав DRF, секретов (хэша пароля)
+# нет; остальные поля экземпляр дочитывает из БД при первом обращении
+PRINCIPAL_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+CACHE_HITS = 'auth_token_cache_hits_total'
+CACHE_MISSES = 'auth_token_cache_misses_total'
+metrics.registry.describe(CACHE_HITS, 'Аутентификации по токену из кэша (tier: local — LRU процесса, shared — Redis)')
+metrics.registry.describe(CACHE_MISSES, 'Аутентификации по токену с чтением из БД')
+
+
+def token_key(key):
+    return f"auth:principal:{key}"
+
+
+def principal(user):
+    return {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+
+
+def principal_user(cached):
+    """Пользователь из закэшированных полей; остальные поля отложены (deferred)."""
+    return get_user_model().from_db(DEFAULT_DB_ALIAS, list(cached), list(cached.values()))
+
+
+class LocalTokenCache:
+    """Ограниченный LRU токен -> поля пользователя в памяти процесса; записи живут AUTH_TOKEN_LOCAL_TTL секунд."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        if settings.AUTH_TOKEN_LOCAL_SIZE <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (user, time.monotonic() + settings.AUTH_TOKEN_LOCAL_TTL)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.AUTH_TOKEN_LOCAL_SIZE:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def record_lookup(tier):
+    """Считает, какой уровень ответил на аутентификацию; счётчики выводятся в /metrics (first_app.metrics)."""
+    if tier == DATABASE:
+        metrics.registry.increment(CACHE_MISSES)
+    else:
+        metrics.registry.increment(CACHE_HITS, tier=tier)
+
+
+def cache_stats():
+    """Попадания по уровням, промахи и доля попаданий по всем воркерам."""
+    counters = metrics.registry.collect_counters()
+    counts = {LOCAL: 0, SHARED: 0, DATABASE: counters.get((CACHE_MISSES, ()), 0)}
+    for tier in (LOCAL, SHARED):
+        counts[tier] = counters.get((CACHE_HITS, (('tier', tier),)), 0)
+    total = sum(counts.values())
+    return {**counts, 'total': total,
+            'hit_ratio': (counts[LOCAL] + counts[SHARED]) / total if total else None}
+
+
+local_tokens = LocalTokenCache()
+
+
+def invalidate(keys):
+    """Отзывает токены сразу в обоих уровнях кэша (локальный — только в текущем процессе)."""
+    keys = list(keys)
+    if not keys:
+        return
+    local_tokens.discard(keys)
+    cache.set_many({token_key(key): REVOKED for key in keys}, settings.AUTH_TOKEN_REVOKED_TIMEOUT)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к БД на каждый запрос: пользователь ищется в LRU процесса,
+    затем в общем кэше (Redis) и только потом в БД. Уровень, ответивший на запрос, записывается
+    в request.auth_cache_tier и в счётчики /metrics.
+    """
+
+    def authenticate(self, request):
+        self.cache_tier = None
+        result = super().authenticate(request)
+        if self.cache_tier is not None:
+            request._request.auth_cache_tier = self.cache_tier
+            record_lookup(self.cache_tier)
+        return result
+
+    def authenticate_credentials(self, key):
+        cached, self.cache_tier = local_tokens.get(key), LOCAL
+        if cached is None:
+            cached, self.cache_tier = cache.get(token_key(key)), SHARED
+            if cached is None or cached == REVOKED:
+                self.cache_tier = DATABASE
+                # Только что выданного токена на реплике может ещё не быть
+                with primary_reads():
+                    user = super().authenticate_credentials(key)[0]
+                if cached is None:
+                    # add, а не set: не перетираем отметку об отзыве, записанную параллельно
+                    cache.add(token_key(key), principal(user), settings.AUTH_TOKEN_CACHE_TIMEOUT)
+                local_tokens.set(key, principal(user))
+                return user, Token(key=key, user=user)
+            local_tokens.set(key, cached)
+        # Новый экземпляр на каждый запрос: словарь из LRU общий для потоков процесса
+        user = principal_user(cached)
+        return user, Token(key=key, user=user)
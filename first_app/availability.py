@@ -0,0 +1,151 @@
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from .models import Table, Reservation
+from .replicas import primary_reads
+
+
+def seating_minutes():
+    return settings.RESERVATION_SEATING_MINUTES
+
+
+def tables_key(restaurant_slug):
+    return f"availability:tables:{restaurant_slug}"
+
+
+def busy_key(restaurant_slug, day):
+    return f"availability:busy:{restaurant_slug}:{day.isoformat()}"
+
+
+def generation_key(restaurant_slug, day):
+    return f"availability:generation:{restaurant_slug}:{day.isoformat()}"
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _tables_query(restaurant_slug):
+    return Table.objects.filter(restaurant__slug=restaurant_slug).order_by('table_number') \
+        .values_list('id', 'table_number', 'capacity', 'slug')
+
+
+def _busy_query(restaurant_slug, day):
+    return Reservation.objects.filter(table__restaurant__slug=restaurant_slug, reservation_date=day,
+                                      status=Reservation.CONFIRMED).values_list('id', 'table_id', 'time')
+
+
+def _busy(reservations):
+    return {pk: (table_id, _minutes(start)) for pk, table_id, start in reservations}
+
+
+def _index_keys(restaurant_slug, day):
+    return [tables_key(restaurant_slug), busy_key(restaurant_slug, day), generation_key(restaurant_slug, day)]
+
+
+def _cached_busy(cached, keys):
+    # Брони годятся, только если собраны при текущем поколении дня; пустое поколение — тоже промах
+    entry, generation = cached.get(keys[1]), cached.get(keys[2])
+    if generation is None or entry is None or entry[0] != generation:
+        return None, generation
+    return entry[1], generation
+
+
+def load_index(restaurant_slug, day):
+    """
+    Индекс доступности ресторана на дату: столы (id, номер, вместимость, слаг) и подтверждённые
+    брони {id брони: (id стола, начало в минутах)}. Обе части и поколение дня лежат в кэше и читаются
+    одним get_many; при промахе строятся по primary, чтобы в кэш не попали данные отстающей реплики.
+    Брони сохраняются с поколением, прочитанным до запроса к базе: если бронь изменилась, пока индекс
+    строился, поколение уже другое и следующий запрос соберёт индекс заново.
+    """
+    keys = _index_keys(restaurant_slug, day)
+    cached = cache.get_many(keys)
+    tables = cached.get(keys[0])
+    busy, generation = _cached_busy(cached, keys)
+    if generation is None:
+        cache.add(keys[2], time.time_ns(), None)
+        generation = cache.get(keys[2])
+    missing = {}
+    with primary_reads():
+        if tables is None:
+            tables = missing[keys[0]] = list(_tables_query(restaurant_slug))
+        if busy is None:
+            busy = _busy(_busy_query(restaurant_slug, day))
+            missing[keys[1]] = (generation, busy)
+    if missing:
+        cache.set_many(missing, settings.AVAILABILITY_CACHE_TIMEOUT)
+    return tables, busy
+
+
+async def aload_index(restaurant_slug, day):
+    """load_index на асинхронном ORM и асинхронном API кэша."""
+    keys = _index_keys(restaurant_slug, day)
+    cached = await cache.aget_many(keys)
+    tables = cached.get(keys[0])
+    busy, generation = _cached_busy(cached, keys)
+    if generation is None:
+        await cache.aadd(keys[2], time.time_ns(), None)
+        generation = await cache.aget(keys[2])
+    missing = {}
+    with primary_reads():
+        if tables is None:
+            tables = missing[keys[0]] = [row async for row in _tables_query(restaurant_slug)]
+        if busy is None:
+            busy = _busy([row async for row in _busy_query(restaurant_slug, day)])
+            missing[keys[1]] = (generation, busy)
+    if missing:
+        await cache.aset_many(missing, settings.AVAILABILITY_CACHE_TIMEOUT)
+    return tables, busy
+
+
+def _slots(tables, busy, times, guests, duration):
+    starts = defaultdict(list)
+    for table_id, start in busy.values():
+        starts[table_id].append(start)
+
+    slots = []
+    for slot in times:
+        slot_start = _minutes(slot)
+        free = [
+            {'slug': slug, 'table_number': number, 'capacity': capacity}
+            for pk, number, capacity, slug in tables
+            if capacity >= guests and all(abs(slot_start - start) >= duration for start in starts[pk])
+        ]
+        slots.append({'time': slot.strftime('%H:%M'), 'tables': free})
+    return slots
+
+
+def find_available_tables(restaurant_slug, day, times, guests=1, duration=None):
+    tables, busy = load_index(restaurant_slug, day)
+    return _slots(tables, busy, times, guests, duration or seating_minutes())
+
+
+async def afind_available_tables(restaurant_slug, day, times, guests=1, duration=None):
+    tables, busy = await aload_index(restaurant_slug, day)
+    return _slots(tables, busy, times, guests, duration or seating_minutes())
+
+
+def invalidate_day(restaurant_slug, day):
+    """
+    Сбрасывает брони дня после изменения брони (вызывать после коммита). Сдвиг поколения атомарен
+    (incr), поэтому параллельные изменения не затирают друг друга, как затирали бы get/правка/set
+    общего словаря; индекс дня пересобирается одним запросом при следующем поиске.
+    """
+    try:
+        cache.incr(generation_key(restaurant_slug, day))
+    except ValueError:
+        # Поколения ещё нет (или оно вытеснено): новое значение не совпадёт ни с одним сохранённым
+        cache.add(generation_key(restaurant_slug, day), time.time_ns(), None)
+
+
+def invalidate_tables(restaurant_slug):
+    cache.delete(tables_key(restaurant_slug))
+
+
+def has_conflict(table, day, start, exclude_pk=None, duration=None):
+    duration = duration or seating_minutes()
+    starts = Reservation.objects.filter(table=table, reservation_date=day, status=Reservation.CONFIRMED) \
+        .exclude(pk=exclude_pk).values_list('time', flat=True)
+    return any(abs(_minutes(start) - _minutes(other)) < duration for other in starts)
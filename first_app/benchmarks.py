@@ -0,0 +1,308 @@
+import gc
+import json
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as day_time
+from decimal import Decimal
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .models import (
+    Restaurant, Table, Warehouse, Employee, Supplier, Product, Inventory,
+    Menu, Dish, MenuDetail, Modifier, RecipeItem, Customer, Reservation, Order, OrderDetail, Payment
+)
+from .slugs import bulk_create_with_slugs
+from .synthetic import CATEGORIES, FIRST_NAMES, HOURS, HOUR_WEIGHTS, LAST_NAMES, RESTAURANT_STAFF
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+
+ROLES = [role for role, _, _ in RESTAURANT_STAFF]
+CATEGORY_NAMES = list(CATEGORIES)
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Scenario:
+    """Один замеряемый запрос: url и тело строятся по контексту набора данных и номеру итерации."""
+
+    def __init__(self, name, method, url, data=None, expected_status=200):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.data = data
+        self.expected_status = expected_status
+
+    def request(self, client, context, iteration):
+        url = self.url(context, iteration)
+        if self.method == 'get':
+            return client.get(url)
+        return client.post(url, self.data(context, iteration) if self.data else {}, format='json')
+
+
+def _moment(rng, days_back):
+    day = timezone.localdate() - timedelta(days=rng.randrange(days_back))
+    hour = rng.choices(HOURS, HOUR_WEIGHTS)[0]
+    return timezone.make_aware(datetime.combine(day, day_time(hour, rng.randrange(60), rng.randrange(60))))
+
+
+def seed(scale=1, pool=1, random_seed=2025):
+    """
+    Детерминированный набор данных для замеров: scale масштабирует рестораны, клиентов, брони и заказы,
+    pool — сколько объектов отложить под create и действия, которые меняют объект (cancel, complete).
+    Возвращает контекст для сценариев.
+    """
+    rng = random.Random(random_seed)
+    warehouses = bulk_create_with_slugs([Warehouse(name=f"Склад {i + 1}", address=f"Промзона, {i + 1}")
+                                         for i in range(4 * scale + 1)])
+    spare_warehouse = warehouses.pop()
+    restaurants = bulk_create_with_slugs([
+        Restaurant(name=f"Ресторан {i + 1}", address=f"Тверская, {i + 1}", phone=f"+7495000{i:04d}",
+                   email=f"branch{i + 1}@example.com", warehouse=warehouse)
+        for i, warehouse in enumerate(warehouses)])
+    bulk_create_with_slugs([
+        Employee(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), role=role,
+                 restaurant=restaurant, salary=Decimal(rng.randrange(30000, 120000, 500)))
+        for restaurant in restaurants for role in ROLES])
+    tables = bulk_create_with_slugs([
+        Table(restaurant=restaurant, table_number=number, capacity=rng.choice((2, 2, 4, 4, 4, 6, 8)))
+        for restaurant in restaurants for number in range(1, 16)])
+
+    suppliers = bulk_create_with_slugs([
+        Supplier(name=f"Поставщик {i + 1}", contact_person=rng.choice(FIRST_NAMES), phone=f"+7495100{i:04d}",
+                 email=f"supplier{i + 1}@example.com", address=f"Склад поставщика, {i + 1}") for i in range(10)])
+    products = bulk_create_with_slugs([
+        Product(name=f"Продукт {i + 1}", unit=rng.choice((Product.UNIT_KG, Product.UNIT_L, Product.UNIT_PCS)),
+                supplier=rng.choice(suppliers)) for i in range(60 + pool)])
+    products, spare_products = products[:60], products[60:]
+    bulk_create_with_slugs([Inventory(warehouse=warehouse, product=product, quantity=Decimal(rng.randint(50, 500)))
+                            for warehouse in warehouses for product in products])
+
+    dishes = bulk_create_with_slugs([
+        Dish(name=f"Блюдо {i + 1}", description="Фирменное блюдо", category=CATEGORY_NAMES[i % len(CATEGORY_NAMES)],
+             base_price=Decimal(rng.randrange(150, 1500, 10))) for i in range(60 + pool)])
+    dishes, spare_dishes = dishes[:60], dishes[60:]
+    menus = bulk_create_with_slugs([Menu(restaurant=restaurant, name=name) for restaurant in restaurants
+                                    for name in ("Основное меню", "Бизнес-ланч")])
+    spare_menu = bulk_create_with_slugs([Menu(restaurant=restaurants[0], name="Банкетное меню")])[0]
+    MenuDetail.objects.bulk_create([MenuDetail(menu=menu, dish=dish, price=dish.base_price)
+                                    for menu in menus for dish in rng.sample(dishes, 30)])
+    bulk_create_with_slugs([Modifier(name=f"Добавка {i + 1}", price_change=Decimal(rng.randrange(0, 200, 10)),
+                                     dish=rng.choice(dishes)) for i in range(40)])
+    RecipeItem.objects.bulk_create([RecipeItem(dish=dish, product=product, quantity=Decimal('0.150'))
+                                    for dish in dishes for product in rng.sample(products, 3)])
+
+    customers = bulk_create_with_slugs([
+        Customer(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                 email=f"guest{i + 1}@example.com", phone=f"+7916{i:07d}") for i in range(200 * scale)])
+    reservations = bulk_create_with_slugs([
+        Reservation(table=rng.choice(tables), customer=rng.choice(customers),
+                    reservation_date=timezone.localdate() + timedelta(days=rng.randrange(30)),
+                    time=day_time(rng.choices(HOURS, HOUR_WEIGHTS)[0]), number_of_guests=rng.randint(1, 6),
+                    status=Reservation.CONFIRMED if i < 2 * pool else rng.choice(
+                        (Reservation.CONFIRMED, Reservation.CONFIRMED, Reservation.COMPLETED, Reservation.CANCELLED)))
+        for i in range(300 * scale + 2 * pool)])
+
+    # Популярность блюд убывает по закону Ципфа
+    popularity = [1 / (rank + 1) for rank in range(len(dishes))]
+    orders, details = [], []
+    for i in range(1000 * scale + pool):
+        status = Order.PENDING if i >= 1000 * scale else rng.choices(
+            (Order.COMPLETED, Order.PENDING, Order.CANCELLED), (80, 12, 8))[0]
+        customer = rng.choice(customers) if rng.random() < 0.7 else None
+        order = Order(restaurant=rng.choice(restaurants), customer=customer, order_date=_moment(rng, 30),
+                      status=status, total_amount=0)
+        for dish in rng.choices(dishes, popularity, k=rng.randint(1, 4)):
+            detail = OrderDetail(order=order, dish=dish, quantity=rng.randint(1, 3), price=dish.base_price)
+            order.total_amount += detail.price * detail.quantity
+            details.append(detail)
+        orders.append(order)
+    bulk_create_with_slugs(orders, batch_size=500)
+    OrderDetail.objects.bulk_create(details, batch_size=1000)
+    bulk_create_with_slugs([
+        Payment(order=order, amount=order.total_amount, payment_time=order.order_date + timedelta(minutes=50),
+                payment_method=rng.choice((Payment.CARD, Payment.CARD, Payment.CASH, Payment.ONLINE)),
+                transaction_id=f"tx-{order.id}")
+        for order in orders if order.status == Order.COMPLETED], batch_size=500)
+
+    user = User.objects.create_user(username='benchmark', password='benchmark')
+    return {
+        'token': Token.objects.create(user=user).key,
+        'restaurants': restaurants, 'warehouses': warehouses, 'spare_warehouse': spare_warehouse,
+        'suppliers': suppliers, 'spare_products': spare_products, 'dishes': dishes, 'spare_dishes': spare_dishes,
+        'spare_menu': spare_menu, 'tables': tables, 'customers': customers, 'orders': orders,
+        'cancel_reservations': reservations[:pool], 'complete_reservations': reservations[pool:2 * pool],
+        'pending_orders': orders[1000 * scale:],
+        'detail': {basename: model._default_manager.order_by('pk').values_list('pk', flat=True).first()
+                   for basename, model, _ in RESOURCES},
+    }
+
+
+RESOURCES = (
+    # (basename маршрута, модель, тело create по контексту и номеру итерации)
+    ('restaurant', Restaurant, lambda ctx, i: {
+        'name': f"Новый филиал {i}", 'address': "Арбат, 1", 'phone': "+74950000000",
+        'email': f"new-branch-{i}@example.com"}),
+    ('table', Table, lambda ctx, i: {
+        'restaurant': ctx['restaurants'][0].slug, 'table_number': 1000 + i, 'capacity': 4}),
+    ('warehouse', Warehouse, lambda ctx, i: {'name': f"Новый склад {i}", 'address': "Промзона, 100"}),
+    ('employee', Employee, lambda ctx, i: {
+        'first_name': "Иван", 'last_name': f"Новиков{i}", 'role': "Официант",
+        'restaurant': ctx['restaurants'][0].slug, 'salary': "45000.00"}),
+    ('supplier', Supplier, lambda ctx, i: {
+        'name': f"Новый поставщик {i}", 'contact_person': "Мария", 'phone': "+74951000000",
+        'email': f"new-supplier-{i}@example.com", 'address': "Москва"}),
+    ('product', Product, lambda ctx, i: {
+        'name': f"Новый продукт {i}", 'unit': Product.UNIT_KG, 'supplier': ctx['suppliers'][0].slug}),
+    ('inventory', Inventory, lambda ctx, i: {
+        'warehouse': ctx['spare_warehouse'].slug, 'product': ctx['spare_products'][i].slug, 'quantity': "25.00"}),
+    ('menu', Menu, lambda ctx, i: {'restaurant': ctx['restaurants'][0].slug, 'name': f"Сезонное меню {i}"}),
+    ('dish', Dish, lambda ctx, i: {
+        'name': f"Новое блюдо {i}", 'description': "Сезонное", 'category': "Горячее", 'base_price': "590.00"}),
+    ('menudetail', MenuDetail, lambda ctx, i: {
+        'menu': ctx['spare_menu'].slug, 'dish': ctx['spare_dishes'][i].slug, 'price': "650.00"}),
+    ('modifier', Modifier, lambda ctx, i: {
+        'name': f"Соус {i}", 'price_change': "50.00", 'dish': ctx['dishes'][0].slug}),
+    ('customer', Customer, lambda ctx, i: {
+        'first_name': "Ольга", 'last_name': f"Морозова{i}", 'email': f"new-guest-{i}@example.com"}),
+    ('reservation', Reservation, lambda ctx, i: {
+        'table': ctx['tables'][0].slug, 'customer': ctx['customers'][0].slug,
+        'reservation_date': str(date(2030, 1, 1) + timedelta(days=i)), 'time': "19:00", 'number_of_guests': 2}),
+    ('order', Order, lambda ctx, i: {
+        'restaurant': ctx['restaurants'][0].slug, 'customer': ctx['customers'][0].slug, 'total_amount': "1200.00"}),
+    ('orderdetail', OrderDetail, lambda ctx, i: {
+        'order': ctx['orders'][0].pk, 'dish': ctx['dishes'][0].slug, 'quantity': 2, 'price': "300.00"}),
+    ('payment', Payment, lambda ctx, i: {
+        'order': ctx['orders'][0].slug, 'amount': "1200.00", 'payment_method': Payment.CARD,
+        'transaction_id': f"bench-{i}"}),
+)
+
+
+def _detail_url(basename, action=None, objects=None):
+    def url(ctx, i):
+        pk = ctx[objects][i].pk if objects else ctx['detail'][basename]
+        return reverse(f"{basename}-{action or 'detail'}", args=[pk])
+    return url
+
+
+def build_scenarios():
+    scenarios = []
+    for basename, _, create_data in RESOURCES:
+        scenarios += [
+            Scenario(f"{basename}-list", 'get', lambda ctx, i, name=basename: reverse(f"{name}-list")),
+            Scenario(f"{basename}-detail", 'get', _detail_url(basename)),
+            Scenario(f"{basename}-create", 'post', lambda ctx, i, name=basename: reverse(f"{name}-list"),
+                     create_data, expected_status=201),
+        ]
+    scenarios += [
+        Scenario('table-set_status', 'post', lambda ctx, i: reverse('table-set-status', args=[ctx['tables'][0].pk]),
+                 lambda ctx, i: {'status': (Table.OCCUPIED, Table.FREE)[i % 2]}),
+        # Каждая итерация отменяет/завершает свою бронь и свой заказ: повторно действие вернуло бы 400
+        Scenario('reservation-cancel', 'post', _detail_url('reservation', 'cancel', 'cancel_reservations')),
+        Scenario('reservation-complete', 'post', _detail_url('reservation', 'complete', 'complete_reservations')),
+        Scenario('order-complete', 'post', _detail_url('order', 'complete', 'pending_orders')),
+    ]
+    return scenarios
+
+
+SCENARIOS = build_scenarios()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def measure(client, scenario, context, iterations):
+    """Прогревочный запрос (итерация 0) не учитывается; queries — максимум SQL-запросов за итерацию."""
+    queries = [0]
+
+    def count_query(execute, sql, params, many, query_context):
+        queries[0] += 1
+        return execute(sql, params, many, query_context)
+
+    timings, max_queries = [], 0
+    # Мусор предыдущих сценариев не должен собираться посреди замеров этого
+    gc.collect()
+    for iteration in range(iterations + 1):
+        queries[0] = 0
+        with connection.execute_wrapper(count_query):
+            start = time.perf_counter()
+            response = scenario.request(client, context, iteration)
+            elapsed = time.perf_counter() - start
+        if response.status_code != scenario.expected_status:
+            raise BenchmarkError(f"{scenario.name}: ответ {response.status_code} вместо {scenario.expected_status}: "
+                                 f"{response.content[:500]!r}")
+        if iteration:
+            timings.append(elapsed)
+            max_queries = max(max_queries, queries[0])
+    return {
+        'requests': iterations,
+        'throughput': iterations / sum(timings),
+        'p50_ms': percentile(timings, 0.5) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'queries': max_queries,
+    }
+
+
+def run(context, iterations, names=None):
+    """Замеры всех сценариев (или только names) с токеном пользователя из контекста."""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {context['token']}")
+    return {scenario.name: measure(client, scenario, context, iterations)
+            for scenario in SCENARIOS if names is None or scenario.name in names}
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    baseline = {name: {'queries': result['queries'], 'p50_ms': round(result['p50_ms'], 2),
+                       'p99_ms': round(result['p99_ms'], 2)} for name, result in sorted(results.items())}
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(baseline, file, ensure_ascii=False, indent=2)
+        file.write('\n')
+
+
+def regressions(results, baseline, check_latency=True):
+    """
+    Список нарушений: нет бюджета, SQL-запросов больше бюджета или (при check_latency) p50 вырос больше
+    чем в 1 + BENCHMARK_LATENCY_TOLERANCE раз с запасом BENCHMARK_LATENCY_SLACK_MS. p99 только выводится:
+    на десятках замеров это почти максимум, и паузы GC делают его слишком шумным для проверки.
+    """
+    problems = []
+    for name, result in results.items():
+        budget = baseline.get(name)
+        if budget is None:
+            problems.append(f"{name}: нет бюджета в {BASELINE_PATH.name}")
+            continue
+        if result['queries'] > budget['queries']:
+            problems.append(f"{name}: {result['queries']} SQL-запросов при бюджете {budget['queries']}")
+        limit = budget['p50_ms'] * (1 + settings.BENCHMARK_LATENCY_TOLERANCE) + settings.BENCHMARK_LATENCY_SLACK_MS
+        if check_latency and result['p50_ms'] > limit:
+            problems.append(f"{name}: p50 {result['p50_ms']:.2f} мс больше допустимых {limit:.2f} мс "
+                            f"(базовая линия {budget['p50_ms']:.2f} мс)")
+    return problems
+
+
+def format_report(results, baseline=None):
+    baseline = baseline or {}
+    lines = [f"{'endpoint':<24}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'base p50':>10}{'queries':>9}{'budget':>8}"]
+    for name, result in results.items():
+        budget = baseline.get(name, {})
+        base_p50 = f"{budget['p50_ms']:.2f}" if budget else '-'
+        lines.append(f"{name:<24}{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                     f"{base_p50:>10}{result['queries']:>9}{budget.get('queries', '-'):>8}")
+    return '\n'.join(lines)
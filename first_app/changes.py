@@ -0,0 +1,39 @@
+import time
+from django.core.cache import cache
+
+
+def counter_key(model):
+    return f"changes:{model._meta.label_lower}"
+
+
+def bump(*models):
+    """Увеличивает счётчики изменений моделей (для ETag у моделей без поля времени изменения)."""
+    for model in models:
+        try:
+            cache.incr(counter_key(model))
+        except ValueError:
+            # Начальное значение — текущее время: после вытеснения ключа старые ETag не совпадут с новыми
+            cache.add(counter_key(model), time.time_ns(), None)
+
+
+def counters(models):
+    keys = {counter_key(model): model for model in models}
+    values = cache.get_many(list(keys))
+    for key in keys.keys() - values.keys():
+        value = time.time_ns()
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+        values[key] = value
+    return [values[key] for key in sorted(keys)]
+
+
+async def acounters(models):
+    """counters через асинхронное API кэша."""
+    keys = {counter_key(model): model for model in models}
+    values = await cache.aget_many(list(keys))
+    for key in keys.keys() - values.keys():
+        value = time.time_ns()
+        if not await cache.aadd(key, value, None):
+            value = await cache.aget(key, value)
+        values[key] = value
+    return [values[key] for key in sorted(keys)]
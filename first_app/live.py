@@ -0,0 +1,223 @@
+"""
+Живая лента зала и кухни ресторана (Server-Sent Events): статусы столов и жизненный цикл заказов.
+Изменение публикуется один раз (Redis pub/sub или, без Redis, внутри процесса); каждый воркер держит
+одну подписку на все рестораны и раздаёт сообщение своим потокам SSE через очереди asyncio,
+поэтому стоимость изменения не зависит от числа экранов.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from .models import Order, Table
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'live:restaurant:'
+TABLE_FIELDS = ('id', 'slug', 'table_number', 'capacity', 'status')
+ORDER_FIELDS = ('id', 'slug', 'order_date', 'total_amount', 'status')
+# Через сколько миллисекунд EventSource переподключается после обрыва
+RETRY_MS = 3000
+# Поток закрывается: клиент переподключится и получит свежий снимок
+CLOSE = None
+
+_client = None
+
+
+def channel(restaurant_id):
+    return f"{CHANNEL_PREFIX}{restaurant_id}"
+
+
+def encode(event, data):
+    """Кадр SSE; JSON без переводов строк, поэтому data умещается в одну строку."""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n"
+
+
+def redis_client():
+    """Клиент для публикации: короткие таймауты, чтобы недоступный Redis не держал поток публикации."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.LIVE_EVENTS_REDIS_URL,
+                                       socket_timeout=settings.LIVE_EVENTS_REDIS_TIMEOUT,
+                                       socket_connect_timeout=settings.LIVE_EVENTS_REDIS_TIMEOUT)
+    return _client
+
+
+class Subscription:
+    """Поток SSE одного клиента: очередь в цикле событий, который его обслуживает."""
+
+    def __init__(self, restaurant_id, loop):
+        self.restaurant_id = restaurant_id
+        self.loop = loop
+        self.queue = asyncio.Queue(settings.LIVE_EVENTS_QUEUE_SIZE)
+
+    def deliver(self, message):
+        # Вызывается в цикле событий подписчика. Медленный клиент не копит события бесконечно:
+        # поток закрывается, после переподключения клиент получит снимок заново
+        if message is CLOSE or self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(CLOSE)
+        else:
+            self.queue.put_nowait(message)
+
+
+class Hub:
+    """Подписчики процесса по ресторанам; dispatch можно звать из любого потока."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+        self.listener = None
+
+    def subscribe(self, restaurant_id):
+        subscription = Subscription(restaurant_id, asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions[restaurant_id].add(subscription)
+            if settings.LIVE_EVENTS_BACKEND == 'redis' and self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='live-events', daemon=True)
+                self.listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.restaurant_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.restaurant_id]
+
+    def dispatch(self, restaurant_id, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(restaurant_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Цикл событий уже закрыт (воркер останавливается)
+                self.unsubscribe(subscription)
+
+    def close_all(self):
+        with self.lock:
+            restaurant_ids = list(self.subscriptions)
+        for restaurant_id in restaurant_ids:
+            self.dispatch(restaurant_id, CLOSE)
+
+    def listen(self):
+        """Поток-слушатель Redis: одна подписка по шаблону на все рестораны на весь процесс."""
+        connected_before = False
+        # Подписка ждёт сообщений сколько угодно долго, поэтому таймаут только на подключение
+        client = redis.Redis.from_url(settings.LIVE_EVENTS_REDIS_URL,
+                                      socket_connect_timeout=settings.LIVE_EVENTS_REDIS_TIMEOUT)
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                if connected_before:
+                    # Пока подписки не было, события терялись: клиенты переподключатся за свежим снимком
+                    self.close_all()
+                connected_before = True
+                for message in pubsub.listen():
+                    restaurant_id = int(message['channel'].decode()[len(CHANNEL_PREFIX):])
+                    self.dispatch(restaurant_id, message['data'].decode())
+            except redis.RedisError as e:
+                logger.warning(f"Подписка на события ленты прервана: {e}")
+                time.sleep(1)
+
+
+hub = Hub()
+
+
+class Publisher:
+    """
+    Публикация в Redis из фонового потока: запрос, изменивший стол или заказ, только ставит
+    сообщение в очередь и не ждёт Redis. Если Redis недоступен и очередь переполнилась,
+    событие отбрасывается.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = None
+        self.sender = None
+
+    def submit(self, restaurant_id, event, message):
+        with self.lock:
+            if self.sender is None:
+                self.queue = queue.Queue(settings.LIVE_EVENTS_PUBLISH_QUEUE_SIZE)
+                self.sender = threading.Thread(target=self.send, name='live-publisher', daemon=True)
+                self.sender.start()
+        try:
+            self.queue.put_nowait((restaurant_id, event, message))
+        except queue.Full:
+            logger.warning(f"Очередь публикации ленты переполнена, событие {event} ресторана {restaurant_id} отброшено")
+
+    def send(self):
+        while True:
+            restaurant_id, event, message = self.queue.get()
+            try:
+                redis_client().publish(channel(restaurant_id), message)
+            except redis.RedisError as e:
+                # Лента — не источник истины: экраны догонят состояние по снимку при переподключении
+                logger.warning(f"Событие {event} ресторана {restaurant_id} не опубликовано: {e}")
+            finally:
+                self.queue.task_done()
+
+
+publisher = Publisher()
+
+
+def publish(restaurant_id, event, data):
+    message = encode(event, data)
+    if settings.LIVE_EVENTS_BACKEND != 'redis':
+        hub.dispatch(restaurant_id, message)
+        return
+    publisher.submit(restaurant_id, event, message)
+
+
+def announce(restaurant_id, event, data):
+    """Публикует событие после коммита: изменения откаченной транзакции на экраны не попадут."""
+    transaction.on_commit(lambda: publish(restaurant_id, event, data))
+
+
+def table_data(table):
+    return {field: getattr(table, field) for field in TABLE_FIELDS}
+
+
+def order_data(order):
+    return {field: getattr(order, field) for field in ORDER_FIELDS}
+
+
+async def asnapshot(restaurant_id):
+    """Текущее состояние для только что подключившегося экрана: все столы и заказы в обработке."""
+    tables = Table.objects.filter(restaurant_id=restaurant_id).order_by('table_number').values(*TABLE_FIELDS)
+    orders = Order.objects.filter(restaurant_id=restaurant_id, status=Order.PENDING) \
+        .order_by('order_date', 'id').values(*ORDER_FIELDS)
+    return {'tables': [row async for row in tables], 'orders': [row async for row in orders]}
+
+
+async def stream(restaurant_id):
+    """
+    Тело ответа SSE. Подписка оформляется до чтения снимка, поэтому изменение между ними
+    придёт событием, а не потеряется. Пока событий нет, раз в LIVE_EVENTS_HEARTBEAT_SECONDS
+    уходит комментарий, чтобы прокси не закрыли простаивающее соединение.
+    """
+    subscription = hub.subscribe(restaurant_id)
+    try:
+        yield f"retry: {RETRY_MS}\n" + encode('snapshot', await asnapshot(restaurant_id))
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), settings.LIVE_EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if message is CLOSE:
+                return
+            yield message
+    finally:
+        hub.unsubscribe(subscription)
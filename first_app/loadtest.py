@@ -0,0 +1,139 @@
+"""
+Сравнение пропускной способности WSGI и ASGI под одновременными клиентами (manage.py loadtest).
+Модуль же служит конфигом gunicorn (-c python:first_app.loadtest): post_worker_init добавляет
+к каждому SQL-запросу задержку LOADTEST_QUERY_DELAY_MS, чтобы изобразить медленный PostgreSQL.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from statistics import quantiles
+
+QUERY_DELAY_ENV = 'LOADTEST_QUERY_DELAY_MS'
+SERVERS = {
+    # Как в docker-compose: синхронные воркеры gunicorn против воркеров uvicorn
+    'wsgi': ['api_django.wsgi:application'],
+    'asgi': ['api_django.asgi:application', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def post_worker_init(worker):
+    delay = float(os.environ.get(QUERY_DELAY_ENV) or 0) / 1000
+    if not delay:
+        return
+    from django.db.backends.signals import connection_created
+
+    def slow_query(execute, sql, params, many, context):
+        # Ждём в потоке, выполняющем запрос, как ждал бы драйвер базы
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if slow_query not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, slow_query)
+    connection_created.connect(install, weak=False)
+
+
+def start_server(kind, port, worker_count, query_delay_ms, base_dir):
+    env = {**os.environ, 'ASYNC_READ_VIEWS': '1' if kind == 'asgi' else '0', QUERY_DELAY_ENV: str(query_delay_ms)}
+    command = [sys.executable, '-m', 'gunicorn', *SERVERS[kind], '--bind', f'127.0.0.1:{port}',
+               '--workers', str(worker_count), '--config', 'python:first_app.loadtest', '--log-level', 'warning']
+    return subprocess.Popen(command, cwd=base_dir, env=env)
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Сервер завершился с кодом {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер не открыл порт {port} за {timeout} с")
+
+
+async def _request(port, path, connection):
+    """GET по keep-alive соединению; соединение открывается заново, если сервер его закрыл (sync-воркеры)."""
+    if connection is None:
+        connection = await asyncio.open_connection('127.0.0.1', port)
+    reader, writer = connection
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAccept: application/json\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = dict(line.split(':', 1) for line in lines[1:] if ':' in line)
+    headers = {name.strip().lower(): value.strip() for name, value in headers.items()}
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    if headers.get('connection', '').lower() == 'close':
+        writer.close()
+        connection = None
+    return int(lines[0].split()[1]), connection
+
+
+async def _client(port, paths, offset, deadline, latencies, errors):
+    connection = None
+    index = offset
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            status, connection = await _request(port, paths[index % len(paths)], connection)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, connection = None, None
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(status)
+        index += 1
+    if connection is not None:
+        connection[1].close()
+
+
+async def _load(port, paths, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[_client(port, paths, offset, deadline, latencies, errors)
+                           for offset in range(concurrency)])
+    return latencies, errors, time.perf_counter() - started
+
+
+def load(port, paths, concurrency, duration):
+    latencies, errors, elapsed = asyncio.run(_load(port, paths, concurrency, duration))
+    cuts = quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': cuts[49] * 1000,
+        'p99_ms': cuts[98] * 1000,
+    }
+
+
+def compare(paths, kinds, concurrency, duration, warmup, worker_count, query_delay_ms, base_dir, port):
+    results = {}
+    for kind in kinds:
+        process = start_server(kind, port, worker_count, query_delay_ms, base_dir)
+        try:
+            wait_for_port(port, process)
+            if warmup:
+                load(port, paths, concurrency, warmup)
+            results[kind] = load(port, paths, concurrency, duration)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return results
+
+
+def format_report(results, concurrency, query_delay_ms):
+    lines = [f"Одновременных клиентов: {concurrency}, задержка запроса к БД: {query_delay_ms} мс",
+             f"{'сервер':<8}{'запросов':>10}{'ошибок':>8}{'запр/с':>10}{'p50, мс':>10}{'p99, мс':>10}"]
+    for kind, result in results.items():
+        lines.append(f"{kind:<8}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10.1f}"
+                     f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}")
+    if {'wsgi', 'asgi'} <= results.keys() and results['wsgi']['rps']:
+        lines.append(f"ASGI / WSGI: {results['asgi']['rps'] / results['wsgi']['rps']:.2f}x")
+    return '\n'.join(lines)
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (override_settings, setup_databases, setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from first_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Замеряет list/detail/create и действия всех ресурсов на временной тестовой базе: пропускная "
+            "способность, p50/p99 и число SQL-запросов. С --check завершается ошибкой при регрессии, "
+            "с --update-baseline записывает результаты в first_app/benchmark_baseline.json")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=settings.BENCHMARK_ITERATIONS)
+        parser.add_argument('--scale', type=int, default=1)
+        parser.add_argument('--only', nargs='+', metavar='ENDPOINT', help="Например: order-list order-complete")
+        parser.add_argument('--check', action='store_true')
+        parser.add_argument('--update-baseline', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['scale'] < 1:
+            raise CommandError("--iterations и --scale должны быть положительными")
+        setup_test_environment()
+        # Внешние сервисы не нужны: база создаётся и удаляется как в тестах, кэш — в памяти процесса
+        with override_settings(CACHES={'default': {'BACKEND': 'first_app.metrics.CountingLocMemCache'}}):
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                context = benchmarks.seed(options['scale'], pool=options['iterations'] + 1)
+                results = benchmarks.run(context, options['iterations'], options['only'])
+            except benchmarks.BenchmarkError as exc:
+                raise CommandError(str(exc))
+            finally:
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        baseline = benchmarks.load_baseline()
+        self.stdout.write(benchmarks.format_report(results, baseline))
+        if options['update_baseline']:
+            # С --only остальные эндпоинты сохраняют прежние значения
+            benchmarks.save_baseline({**baseline, **results} if options['only'] else results)
+            self.stdout.write(self.style.SUCCESS(f"Базовая линия записана в {benchmarks.BASELINE_PATH}"))
+        elif options['check']:
+            problems = benchmarks.regressions(results, baseline)
+            if problems:
+                raise CommandError("Регрессии:\n" + '\n'.join(problems))
+            self.stdout.write(self.style.SUCCESS("Регрессий нет"))
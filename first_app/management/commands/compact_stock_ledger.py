@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from first_app import stock
+
+
+class Command(BaseCommand):
+    help = "Сохраняет снимок остатков по журналу движений, чтобы запросы остатков не читали всю историю"
+
+    def handle(self, *args, **options):
+        snapshots = stock.compact()
+        self.stdout.write(self.style.SUCCESS(f"Сохранено позиций в снимке: {snapshots}"))
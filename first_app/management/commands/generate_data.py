@@ -0,0 +1,34 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from first_app import rollups, synthetic
+
+
+class Command(BaseCommand):
+    help = ("Заполняет пустую базу детерминированными синтетическими данными: scale=1 — 10 ресторанов "
+            "и 100 тыс. заказов, scale=100 — 10 млн заказов")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=synthetic.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--rollups', action='store_true', help="Пересчитать дневные агрегаты продаж после загрузки")
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0 or options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--scale, --workers и --chunk-size должны быть положительными")
+        occupied = [model._meta.verbose_name_plural for model in synthetic.GENERATED_MODELS if model.objects.exists()]
+        if occupied:
+            # id и слаги вычисляются заранее, без проверки на совпадения с уже существующими строками
+            raise CommandError(f"Нужна пустая база, уже есть данные: {', '.join(map(str, occupied))}")
+
+        started = time.monotonic()
+        rows = synthetic.generate(options['scale'], options['seed'], options['workers'], options['chunk_size'],
+                                  log=self.stdout.write if options['verbosity'] > 1 else None)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Вставлено строк: {rows} за {elapsed:.1f} с "
+                                             f"({rows / elapsed:.0f} строк/с)"))
+        if options['rollups']:
+            days = rollups.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Пересчитано дней (ресторан, день): {days}"))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from first_app import loadtest
+from first_app.models import Restaurant, Table
+
+
+class Command(BaseCommand):
+    help = ("Поднимает по очереди gunicorn с синхронными воркерами (WSGI) и с воркерами uvicorn (ASGI, асинхронные "
+            "представления first_app.async_views) на текущей базе и нагружает меню, столы и доступность "
+            "одновременными клиентами. Базу заполняет manage.py generate_data")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=list(loadtest.SERVERS), default=list(loadtest.SERVERS))
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--warmup', type=float, default=2.0)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--query-delay-ms', type=float, default=0,
+                            help="Задержка каждого SQL-запроса на сервере: имитация медленной базы")
+        parser.add_argument('--restaurants', type=int, default=10)
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        if min(options['concurrency'], options['workers'], options['restaurants']) < 1 or options['duration'] <= 0:
+            raise CommandError("--concurrency, --workers, --restaurants и --duration должны быть положительными")
+        paths = self.hot_paths(options['restaurants'])
+        if not paths:
+            raise CommandError("В базе нет ресторанов со столами: заполните её manage.py generate_data")
+        results = loadtest.compare(paths, options['servers'], options['concurrency'], options['duration'],
+                                   options['warmup'], options['workers'], options['query_delay_ms'],
+                                   settings.BASE_DIR, options['port'])
+        self.stdout.write(loadtest.format_report(results, options['concurrency'], options['query_delay_ms']))
+
+    @staticmethod
+    def hot_paths(limit):
+        today = timezone.localdate().isoformat()
+        paths = []
+        for restaurant in Restaurant.objects.filter(tables__isnull=False).distinct().order_by('pk')[:limit]:
+            table = Table.objects.filter(restaurant=restaurant).order_by('table_number').first()
+            paths += [
+                f'/api/v1/restaurants/{restaurant.pk}/menu/',
+                f'/api/v1/tables/?restaurant__slug={restaurant.slug}',
+                f'/api/v1/tables/{table.pk}/',
+                f'/api/v1/tables/availability/?restaurant={restaurant.slug}&date={today}&time=19:00,20:00&guests=2',
+            ]
+        return paths
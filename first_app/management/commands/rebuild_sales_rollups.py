@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from first_app import rollups
+
+
+class Command(BaseCommand):
+    help = "Полностью пересчитывает дневные агрегаты продаж по ресторанам и блюдам"
+
+    def handle(self, *args, **options):
+        days = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано дней (ресторан, день): {days}"))
@@ -0,0 +1,156 @@
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from .models import Restaurant, Menu, MenuDetail, Dish, Modifier
+from .replicas import primary_reads
+
+
+def document_key(restaurant_id):
+    return f"menu:document:{restaurant_id}"
+
+
+def version_key(restaurant_id):
+    return f"menu:version:{restaurant_id}"
+
+
+def get_version(restaurant_id):
+    version = cache.get(version_key(restaurant_id))
+    if version is None:
+        # Начальное значение — текущее время, чтобы после вытеснения ключа версии не повторялись
+        cache.add(version_key(restaurant_id), time.time_ns(), None)
+        version = cache.get(version_key(restaurant_id))
+    return version
+
+
+async def aget_version(restaurant_id):
+    version = await cache.aget(version_key(restaurant_id))
+    if version is None:
+        await cache.aadd(version_key(restaurant_id), time.time_ns(), None)
+        version = await cache.aget(version_key(restaurant_id))
+    return version
+
+
+def bump_versions(restaurant_ids):
+    for restaurant_id in restaurant_ids:
+        try:
+            cache.incr(version_key(restaurant_id))
+        except ValueError:
+            cache.add(version_key(restaurant_id), time.time_ns(), None)
+    # Документ прошлой версии больше не отдадут; удаляем, чтобы не ждать истечения срока
+    cache.delete_many([document_key(restaurant_id) for restaurant_id in restaurant_ids])
+
+
+def _modifier(modifier):
+    return {'slug': modifier.slug, 'name': modifier.name, 'price_change': str(modifier.price_change)}
+
+
+def _active_menus(restaurant, today):
+    details = MenuDetail.objects.filter(is_available=True).select_related('dish').order_by('dish__name') \
+        .prefetch_related(Prefetch('dish__modifiers', queryset=Modifier.objects.order_by('name')))
+    return Menu.objects.filter(Q(end_date__isnull=True) | Q(end_date__gte=today), restaurant=restaurant,
+                               start_date__lte=today).order_by('start_date', 'name') \
+        .prefetch_related(Prefetch('details', queryset=details))
+
+
+def _generic_modifiers():
+    return Modifier.objects.filter(dish__isnull=True).order_by('name')
+
+
+def _render(restaurant, version, today, menus, generic_modifiers):
+    return {
+        'restaurant': restaurant.slug,
+        'version': version,
+        'date': today.isoformat(),
+        'menus': [{
+            'slug': menu.slug,
+            'name': menu.name,
+            'description': menu.description,
+            'start_date': menu.start_date.isoformat(),
+            'end_date': menu.end_date.isoformat() if menu.end_date else None,
+            'items': [{
+                'dish': detail.dish.slug,
+                'name': detail.dish.name,
+                'description': detail.dish.description,
+                'category': detail.dish.category,
+                'base_price': str(detail.dish.base_price),
+                'price': str(detail.price),
+                'modifiers': [_modifier(modifier) for modifier in detail.dish.modifiers.all()],
+            } for detail in menu.details.all()],
+        } for menu in menus],
+        'generic_modifiers': [_modifier(modifier) for modifier in generic_modifiers],
+    }
+
+
+def build_document(restaurant):
+    """
+    Полное меню ресторана (Menu -> MenuDetail -> Dish -> Modifier) из действующих меню.
+    Строится за четыре запроса независимо от числа блюд; читает с primary, потому что документ кэшируется.
+    """
+    today = timezone.localdate()
+    version = get_version(restaurant.pk)
+    with primary_reads():
+        return _render(restaurant, version, today, _active_menus(restaurant, today), _generic_modifiers())
+
+
+async def abuild_document(restaurant):
+    """build_document на асинхронном ORM: те же четыре запроса и тот же документ."""
+    today = timezone.localdate()
+    version = await aget_version(restaurant.pk)
+    with primary_reads():
+        menus = [menu async for menu in _active_menus(restaurant, today)]
+        generic_modifiers = [modifier async for modifier in _generic_modifiers()]
+    return _render(restaurant, version, today, menus, generic_modifiers)
+
+
+def _current_document(restaurant_id, found):
+    """
+    Документ из результата get_many, если он собран для текущей версии. Документ, собранный до правки
+    меню и сохранённый после неё, несёт старую версию и считается промахом.
+    """
+    version, document = found.get(version_key(restaurant_id)), found.get(document_key(restaurant_id))
+    if document is not None and version is not None and document['version'] == version:
+        return document
+    return None
+
+
+def get_document(restaurant_id):
+    # Версия и документ — одним обращением к кэшу (MGET в Redis)
+    return _current_document(restaurant_id, cache.get_many([version_key(restaurant_id), document_key(restaurant_id)]))
+
+
+async def aget_document(restaurant_id):
+    found = await cache.aget_many([version_key(restaurant_id), document_key(restaurant_id)])
+    return _current_document(restaurant_id, found)
+
+
+def _document_timeout():
+    # Набор действующих меню меняется в полночь, поэтому документ не живёт дольше текущих суток
+    now = timezone.localtime()
+    midnight = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+    return min(settings.MENU_CACHE_TIMEOUT, max(int((midnight - now).total_seconds()), 1))
+
+
+def store_document(restaurant_id, document):
+    # Документ хранит версию, прочитанную до сборки: get_document сверяет её с текущей
+    cache.set(document_key(restaurant_id), document, _document_timeout())
+
+
+async def astore_document(restaurant_id, document):
+    await cache.aset(document_key(restaurant_id), document, _document_timeout())
+
+
+def affected_restaurants(instance):
+    """Рестораны, чьи документы меню зависят от объекта."""
+    if isinstance(instance, Restaurant):
+        return {instance.pk}
+    if isinstance(instance, Menu):
+        return {instance.restaurant_id}
+    if isinstance(instance, MenuDetail):
+        return set(Menu.objects.filter(pk=instance.menu_id).values_list('restaurant_id', flat=True))
+    if isinstance(instance, Modifier) and instance.dish_id is None:
+        return set(Restaurant.objects.values_list('id', flat=True))
+    dish_id = instance.pk if isinstance(instance, Dish) else instance.dish_id
+    return set(Menu.objects.filter(details__dish_id=dish_id).values_list('restaurant_id', flat=True))
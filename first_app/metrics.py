@@ -0,0 +1,345 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Счётчики текущего запроса: их пополняют обёртка execute_wrapper и кэш-бэкенды ниже
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+def install_query_counter(connection, **kwargs):
+    """
+    Обработчик connection_created: счётчик ставится на каждое соединение один раз. Соединения у Django
+    свои в каждом потоке, а контекст запроса (_current) sync_to_async переносит в поток с ORM, поэтому
+    запросы считаются одинаково в синхронных и асинхронных представлениях. Обёртка ставится первой:
+    connection.execute_wrapper() снимает с конца списка только свою.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+def record_cache(hits, misses):
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class CountingLocMemCache(LocMemCache):
+    # get_many у LocMemCache вызывает get, поэтому считаем только здесь
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing_key, version)
+        record_cache(value is not self._missing_key, value is self._missing_key)
+        return default if value is self._missing_key else value
+
+
+class CountingRedisCache(RedisCache):
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        record_cache(value is not self._missing, value is self._missing)
+        return default if value is self._missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        record_cache(len(found), len(keys) - len(found))
+        return found
+
+
+def _empty_series():
+    return {
+        'count': 0, 'latency_sum': 0.0, 'latency_buckets': [0] * len(LATENCY_BUCKETS),
+        'queries_sum': 0, 'query_buckets': [0] * len(QUERY_BUCKETS), 'db_seconds': 0.0,
+        'cache_hits': 0, 'cache_misses': 0, 'response_bytes': 0,
+    }
+
+
+class Registry:
+    """
+    Агрегаты процесса по (маршрут, действие, метод, статус) и именованные счётчики других модулей
+    (increment). В режиме нескольких процессов (METRICS_MULTIPROC_DIR) каждый воркер gunicorn
+    периодически сбрасывает свой снимок в <pid>.json, а /metrics суммирует файлы всех воркеров.
+    """
+
+    def __init__(self):
+        self.series = {}
+        self.counters = {}
+        self.descriptions = {}
+        self.lock = threading.Lock()
+        self.flushed_at = 0.0
+
+    def describe(self, name, help_text):
+        """Регистрирует счётчик: он выводится в /metrics, даже пока ни разу не увеличен."""
+        self.descriptions[name] = help_text
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self.maybe_flush()
+
+    def observe(self, labels, latency, stats, response_bytes):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = _empty_series()
+            series['count'] += 1
+            series['latency_sum'] += latency
+            bucket = bisect_left(LATENCY_BUCKETS, latency)
+            if bucket < len(LATENCY_BUCKETS):
+                series['latency_buckets'][bucket] += 1
+            series['queries_sum'] += stats.queries
+            bucket = bisect_left(QUERY_BUCKETS, stats.queries)
+            if bucket < len(QUERY_BUCKETS):
+                series['query_buckets'][bucket] += 1
+            series['db_seconds'] += stats.db_seconds
+            series['cache_hits'] += stats.cache_hits
+            series['cache_misses'] += stats.cache_misses
+            series['response_bytes'] += response_bytes
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {labels: {key: list(value) if isinstance(value, list) else value for key, value in series.items()}
+                    for labels, series in self.series.items()}
+
+    def counters_snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+            self.counters.clear()
+
+    def maybe_flush(self, force=False):
+        directory = settings.METRICS_MULTIPROC_DIR
+        now = time.monotonic()
+        if not directory or (not force and now - self.flushed_at < settings.METRICS_FLUSH_SECONDS):
+            return
+        self.flushed_at = now
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        payload = {
+            'series': [[list(labels), series] for labels, series in self.snapshot().items()],
+            'counters': [[name, [list(pair) for pair in labels], value]
+                         for (name, labels), value in self.counters_snapshot().items()],
+        }
+        # Запись во временный файл и rename: читатель никогда не видит половину снимка
+        with open(f"{path}.tmp", 'w') as file:
+            json.dump(payload, file)
+        os.replace(f"{path}.tmp", path)
+
+    def worker_payloads(self):
+        """Снимки остальных воркеров из METRICS_MULTIPROC_DIR."""
+        directory = settings.METRICS_MULTIPROC_DIR
+        if not directory:
+            return
+        own = f"{os.getpid()}.json"
+        for name in os.listdir(directory):
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    yield json.load(file)
+            except (OSError, ValueError):
+                continue
+
+    def collect(self):
+        """Суммарные ряды: снимки всех воркеров из METRICS_MULTIPROC_DIR плюс живые данные этого процесса."""
+        totals = {}
+        for payload in self.worker_payloads():
+            for labels, series in payload['series']:
+                _merge(totals, tuple(labels), series)
+        for labels, series in self.snapshot().items():
+            _merge(totals, labels, series)
+        return totals
+
+    def collect_counters(self):
+        """Суммы именованных счётчиков по всем воркерам: {(имя, метки): значение}."""
+        totals = {}
+        for payload in self.worker_payloads():
+            for name, labels, value in payload['counters']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                totals[key] = totals.get(key, 0) + value
+        for key, value in self.counters_snapshot().items():
+            totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+def mark_process_dead(pid, directory=None):
+    """
+    Удаляет снимок завершившегося воркера, как mark_process_dead в prometheus_client: иначе его счётчики
+    навсегда остаются в суммах, а каталог растёт с каждым перезапуском. Вызывается из хука child_exit
+    gunicorn (gunicorn.conf.py) в мастер-процессе, где Django не настроен, поэтому каталог можно передать явно.
+    """
+    directory = directory or settings.METRICS_MULTIPROC_DIR
+    for suffix in ('.json', '.json.tmp'):
+        try:
+            os.remove(os.path.join(directory, f"{pid}{suffix}"))
+        except FileNotFoundError:
+            pass
+
+
+def _merge(totals, labels, series):
+    target = totals.get(labels)
+    if target is None:
+        totals[labels] = series
+        return
+    for key, value in series.items():
+        if isinstance(value, list):
+            target[key] = [a + b for a, b in zip(target[key], value)]
+        else:
+            target[key] += value
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels_text(labels, **extra):
+    pairs = list(zip(('route', 'action', 'method', 'status'), labels)) + list(extra.items())
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def _histogram(lines, name, labels, bounds, buckets, count, total):
+    cumulative = 0
+    for bound, value in zip(bounds, buckets):
+        cumulative += value
+        lines.append(f"{name}_bucket{{{_labels_text(labels, le=bound)}}} {cumulative}")
+    lines.append(f"{name}_bucket{{{_labels_text(labels, le='+Inf')}}} {count}")
+    lines.append(f"{name}_sum{{{_labels_text(labels)}}} {total}")
+    lines.append(f"{name}_count{{{_labels_text(labels)}}} {count}")
+
+
+def render_counters(lines, descriptions, counters):
+    for name, help_text in sorted(descriptions.items()):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (counter, labels), value in sorted(counters.items()):
+            if counter == name:
+                text = ','.join(f'{label}="{_escape(label_value)}"' for label, label_value in labels)
+                lines.append(f"{name}{{{text}}} {value}" if text else f"{name} {value}")
+
+
+def render_prometheus(totals, named=None):
+    lines = [
+        '# HELP http_request_duration_seconds Время обработки запроса',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for labels, series in sorted(totals.items()):
+        _histogram(lines, 'http_request_duration_seconds', labels, LATENCY_BUCKETS, series['latency_buckets'],
+                   series['count'], series['latency_sum'])
+    lines += ['# HELP http_request_db_queries Число SQL-запросов на HTTP-запрос',
+              '# TYPE http_request_db_queries histogram']
+    for labels, series in sorted(totals.items()):
+        _histogram(lines, 'http_request_db_queries', labels, QUERY_BUCKETS, series['query_buckets'],
+                   series['count'], series['queries_sum'])
+    counters = (
+        ('http_request_db_seconds_total', 'Время в БД', 'db_seconds'),
+        ('http_request_cache_hits_total', 'Попадания в кэш', 'cache_hits'),
+        ('http_request_cache_misses_total', 'Промахи кэша', 'cache_misses'),
+        ('http_response_bytes_total', 'Размер ответов', 'response_bytes'),
+    )
+    for name, help_text, key in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f"{name}{{{_labels_text(labels)}}} {series[key]}" for labels, series in sorted(totals.items())]
+    render_counters(lines, registry.descriptions, named or {})
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render_prometheus(registry.collect(), registry.collect_counters()), content_type=CONTENT_TYPE)
+
+
+def _labels_for(request, response):
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched', '', request.method, str(response.status_code)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return match.url_name or match.route, action, request.method, str(response.status_code)
+
+
+class MetricsMiddleware:
+    """
+    Задержка, число и время SQL-запросов, попадания/промахи кэша и размер ответа по каждому
+    маршруту и действию ViewSet. Сам /metrics не учитывается. Работает и под WSGI, и под ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path == settings.METRICS_PATH:
+            return self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.observe(request, response, stats, start)
+
+    async def __acall__(self, request):
+        if request.path == settings.METRICS_PATH:
+            return await self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.observe(request, response, stats, start)
+
+    @staticmethod
+    def observe(request, response, stats, start):
+        latency = time.perf_counter() - start
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(_labels_for(request, response), latency, stats, size)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_time', 'id'], name='first_app_p_payment_77225b_idx'),
+        ),
+    ]
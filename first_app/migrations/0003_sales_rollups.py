@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-18 12:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0002_payment_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('value', models.DateTimeField(verbose_name='Обработано до')),
+            ],
+            options={
+                'verbose_name': 'Отметка агрегации',
+                'verbose_name_plural': 'Отметки агрегации',
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Время изменения'),
+        ),
+        migrations.CreateModel(
+            name='DailyDishSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Заказов с блюдом')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Продано порций')),
+                ('cancelled_quantity', models.IntegerField(default=0, verbose_name='Порций в отменённых заказах')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка без отменённых заказов')),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='first_app.dish', verbose_name='Блюдо')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_dish_sales', to='first_app.restaurant', verbose_name='Ресторан')),
+            ],
+            options={
+                'verbose_name': 'Дневные продажи блюда',
+                'verbose_name_plural': 'Дневные продажи блюд',
+                'indexes': [models.Index(fields=['restaurant', 'day'], name='first_app_d_restaur_950307_idx'), models.Index(fields=['dish', 'day'], name='first_app_d_dish_id_e8e5a1_idx')],
+                'unique_together': {('restaurant', 'dish', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRestaurantSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Количество заказов')),
+                ('cancelled_count', models.IntegerField(default=0, verbose_name='Отменённых заказов')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка без отменённых заказов')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='first_app.restaurant', verbose_name='Ресторан')),
+            ],
+            options={
+                'verbose_name': 'Дневные продажи ресторана',
+                'verbose_name_plural': 'Дневные продажи ресторанов',
+                'indexes': [models.Index(fields=['restaurant', 'day'], name='first_app_d_restaur_a909d7_idx')],
+                'unique_together': {('restaurant', 'day')},
+            },
+        ),
+    ]
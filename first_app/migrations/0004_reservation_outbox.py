@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0003_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reservation_id', models.IntegerField(verbose_name='Бронирование')),
+                ('action', models.CharField(max_length=20, verbose_name='Действие')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время события')),
+            ],
+            options={
+                'verbose_name': 'Событие бронирования',
+                'verbose_name_plural': 'События бронирований',
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2 on 2026-10-18 13:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    # Текущие остатки переносятся в журнал как корректировки, чтобы сумма движений совпадала с Inventory
+    Inventory = apps.get_model('first_app', 'Inventory')
+    StockMovement = apps.get_model('first_app', 'StockMovement')
+    rows = Inventory.objects.exclude(quantity=0).values_list('warehouse_id', 'product_id', 'quantity', 'last_updated')
+    StockMovement.objects.bulk_create([
+        StockMovement(warehouse_id=warehouse_id, product_id=product_id, kind='ADJUSTMENT', quantity=quantity,
+                      reference='opening-balance', created_at=last_updated)
+        for warehouse_id, product_id, quantity, last_updated in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0004_reservation_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('RECEIPT', 'Поступление'), ('CONSUMPTION', 'Расход'), ('TRANSFER', 'Перемещение'), ('ADJUSTMENT', 'Корректировка')], max_length=20, verbose_name='Тип движения')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Изменение количества')),
+                ('reference', models.CharField(blank=True, default='', max_length=100, verbose_name='Основание')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время движения')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='first_app.product', verbose_name='Продукт')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='first_app.warehouse', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Движение по складу',
+                'verbose_name_plural': 'Движения по складу',
+                'indexes': [models.Index(fields=['warehouse', 'product', 'created_at'], name='first_app_s_warehou_3451b9_idx'), models.Index(fields=['created_at'], name='first_app_s_created_e426af_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True, verbose_name='Момент снимка')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Количество')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='first_app.product', verbose_name='Продукт')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='first_app.warehouse', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Снимок остатков',
+                'verbose_name_plural': 'Снимки остатков',
+                'indexes': [models.Index(fields=['warehouse', 'taken_at'], name='first_app_s_warehou_1e45da_idx')],
+                'unique_together': {('warehouse', 'product', 'taken_at')},
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
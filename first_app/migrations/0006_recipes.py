@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 13:20
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_history_deducted(apps, schema_editor):
+    # Уже завершённые заказы не списываются задним числом: рецептов на момент их приготовления не было
+    Order = apps.get_model('first_app', 'Order')
+    Order.objects.filter(status='COMPLETED').update(stock_deducted_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0005_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='restaurants', to='first_app.warehouse', verbose_name='Склад кухни'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stock_deducted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время списания ингредиентов'),
+        ),
+        migrations.RunPython(mark_history_deducted, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'COMPLETED'), ('stock_deducted_at__isnull', True)), fields=['updated_at'], name='order_stock_pending_idx'),
+        ),
+        migrations.CreateModel(
+            name='RecipeItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Количество на порцию')),
+                ('dish', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recipe_items', to='first_app.dish', verbose_name='Блюдо')),
+                ('modifier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recipe_items', to='first_app.modifier', verbose_name='Модификатор')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_items', to='first_app.product', verbose_name='Продукт')),
+            ],
+            options={
+                'verbose_name': 'Позиция рецепта',
+                'verbose_name_plural': 'Позиции рецептов',
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('dish__isnull', False), ('modifier__isnull', True)), models.Q(('dish__isnull', True), ('modifier__isnull', False)), _connector='OR'), name='recipe_item_dish_xor_modifier'), models.UniqueConstraint(fields=('dish', 'product'), name='recipe_item_unique_dish_product'), models.UniqueConstraint(fields=('modifier', 'product'), name='recipe_item_unique_modifier_product')],
+            },
+        ),
+    ]
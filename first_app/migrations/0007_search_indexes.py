@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 13:40
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+from first_app.search import SEARCH_INDEXES, postgres_indexes, sqlite_fts_drop_sql, sqlite_fts_sql
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for model_name in SEARCH_INDEXES:
+        model = apps.get_model('first_app', model_name)
+        if vendor == 'postgresql':
+            for index in postgres_indexes(model_name):
+                schema_editor.add_index(model, index)
+        elif vendor == 'sqlite':
+            for statement in sqlite_fts_sql(model_name, model._meta.db_table):
+                schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for model_name in SEARCH_INDEXES:
+        model = apps.get_model('first_app', model_name)
+        if vendor == 'postgresql':
+            for index in postgres_indexes(model_name):
+                schema_editor.remove_index(model, index)
+        elif vendor == 'sqlite':
+            for statement in sqlite_fts_drop_sql(model._meta.db_table):
+                schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0006_recipes'),
+    ]
+
+    operations = [
+        # Без расширения pg_trgm нет ни оператора <%, ни класса операторов gin_trgm_ops (на других СУБД не делает ничего)
+        TrigramExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0007_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservationoutbox',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Неудачных попыток'),
+        ),
+        migrations.AddField(
+            model_name='reservationoutbox',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Повторить не раньше'),
+        ),
+    ]
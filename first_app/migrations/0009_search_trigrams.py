@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 15:20
+
+from django.db import migrations
+from first_app.search import SEARCH_INDEXES, sqlite_fts_drop_sql, sqlite_trigram_sql, trigram_table
+
+
+def create_trigram_tables(apps, schema_editor):
+    # На PostgreSQL опечатки ищут триграммные индексы из 0007
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for model_name in SEARCH_INDEXES:
+        db_table = apps.get_model('first_app', model_name)._meta.db_table
+        for statement in sqlite_trigram_sql(model_name, db_table):
+            schema_editor.execute(statement)
+
+
+def drop_trigram_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for model_name in SEARCH_INDEXES:
+        db_table = apps.get_model('first_app', model_name)._meta.db_table
+        for statement in sqlite_fts_drop_sql(db_table, trigram_table(db_table)):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0008_reservation_outbox_retries'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_tables, drop_trigram_tables),
+    ]
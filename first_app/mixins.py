@@ -0,0 +1,307 @@
+import csv
+import hashlib
+import json
+from datetime import datetime
+from functools import lru_cache
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, SlugRelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from . import changes
+from .readers import reader_for_serializer
+from .serializers import SparseFieldsMixin
+
+
+class QuerysetPlan:
+    """
+    Набор select_related/prefetch_related/only(), который нужен сериализатору,
+    чтобы отрисовать страницу без дополнительных запросов на каждую строку.
+    """
+
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = []
+        self.models = set()
+        self.restrict_columns = True
+
+    def apply(self, queryset, restrict_columns=True):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if restrict_columns and self.restrict_columns:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def _get_model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _prefetch_for(field, model_field, path):
+    related_model = model_field.related_model
+    if isinstance(field, ListSerializer):
+        child_plan = build_plan(field.child.fields, related_model)
+        if model_field.one_to_many:
+            # Обратный внешний ключ нужен prefetch_related, чтобы разложить строки по родителям
+            child_plan.only.append(model_field.field.name)
+        return Prefetch(path, queryset=child_plan.apply(related_model._default_manager.all())), child_plan.models
+    return _prefetch_relation(field, related_model, path), {related_model}
+
+
+def _prefetch_relation(field, related_model, path):
+    child_relation = field.child_relation
+    if isinstance(child_relation, SlugRelatedField):
+        queryset = related_model._default_manager.only(related_model._meta.pk.name, child_relation.slug_field)
+        return Prefetch(path, queryset=queryset)
+    return path
+
+
+def build_plan(fields, model, prefix='', plan=None):
+    """
+    Строит QuerysetPlan по полям сериализатора. Вложенные сериализаторы для прямых
+    связей разворачиваются в select_related, для обратных и many-to-many — в prefetch_related.
+    """
+    plan = plan if plan is not None else QuerysetPlan()
+    plan.only.append(prefix + model._meta.pk.name)
+    plan.models.add(model)
+    for field in fields.values():
+        if field.write_only:
+            continue
+        model_field = _get_model_field(model, field.source) if len(field.source_attrs) == 1 else None
+        if model_field is None:
+            # source='*', свойства модели и т.п. — какие колонки нужны, заранее не известно
+            plan.restrict_columns = False
+            continue
+        path = prefix + model_field.name
+        if isinstance(field, (ListSerializer, ManyRelatedField)):
+            prefetch, models = _prefetch_for(field, model_field, path)
+            plan.prefetch_related.append(prefetch)
+            plan.models.update(models)
+        elif model_field.is_relation and model_field.concrete:
+            if isinstance(field, PrimaryKeyRelatedField):
+                plan.only.append(path)
+            elif isinstance(field, SlugRelatedField):
+                plan.select_related.append(path)
+                plan.only.append(f"{path}__{field.slug_field}")
+                plan.models.add(model_field.related_model)
+            elif isinstance(field, BaseSerializer):
+                plan.select_related.append(path)
+                build_plan(field.fields, model_field.related_model, f"{path}__", plan)
+            else:
+                plan.select_related.append(path)
+                plan.models.add(model_field.related_model)
+                plan.restrict_columns = False
+        elif model_field.is_relation:
+            plan.restrict_columns = False
+        else:
+            plan.only.append(path)
+    return plan
+
+
+@lru_cache(maxsize=512)
+def plan_for_serializer(serializer_class, fields=None, expand=None):
+    """План для serializer_class; fields/expand — нормализованные значения ?fields=/?expand= (SparseFieldsMixin)."""
+    serializer = serializer_class(fields=fields, expand=expand) if fields or expand else serializer_class()
+    return build_plan(serializer.fields, serializer.Meta.model)
+
+
+def _normalize_selection(value):
+    # Одинаковые наборы полей в разном порядке делят один план в кэше
+    return ','.join(sorted({item.strip() for item in value.split(',') if item.strip()})) if value else None
+
+
+class QuerysetPlanMixin:
+    """
+    Подгружает связанные объекты так, как их читает serializer_class: количество запросов
+    на список не зависит от размера страницы. На list/retrieve дополнительно ограничивает
+    выборку только нужными колонками. Для GET учитываются ?fields= и ?expand=: не запрошенные
+    связи не join'ятся и не prefetch'ятся, не запрошенные колонки не читаются.
+    """
+    column_restricted_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        plan = plan_for_serializer(self.get_serializer_class(), *self.get_sparse_selection())
+        return plan.apply(queryset, restrict_columns=self.action in self.column_restricted_actions)
+
+    def get_sparse_selection(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in ('GET', 'HEAD') or \
+                not issubclass(self.get_serializer_class(), SparseFieldsMixin):
+            return None, None
+        return (_normalize_selection(request.query_params.get('fields')),
+                _normalize_selection(request.query_params.get('expand')))
+
+
+class FastListMixin:
+    """
+    Быстрый list для горячих списков: строки читаются через values_list() и превращаются в словари
+    преобразователями RowReader без создания экземпляров моделей и сериализаторов. Ответ совпадает
+    с обычным list байт в байт. Нужна постраничная пагинация (keyset читает атрибуты экземпляров);
+    если сериализатор выводит поля, которые так не прочитать, используется обычный list.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = reader_for_serializer(self.get_serializer_class(), *self.get_sparse_selection())
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+        rows = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.render(page))
+        return Response(reader.render(rows))
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для list/retrieve. Валидатор считается до выборки строк и сериализации:
+    по MAX(conditional_timestamp_field) и COUNT(*), если у модели есть время изменения,
+    иначе по счётчикам изменений (first_app.changes) всех моделей, которые выводит сериализатор.
+    """
+    conditional_timestamp_field = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        not_modified = self.not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return self.add_validators(handler(request, *args, **kwargs), etag, last_modified)
+
+    async def aconditional_response(self, handler, request, *args, **kwargs):
+        """conditional_response для асинхронного handler."""
+        etag, last_modified = await self.aget_validators(request)
+        not_modified = self.not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return self.add_validators(await handler(request, *args, **kwargs), etag, last_modified)
+
+    @staticmethod
+    def not_modified_response(request, etag, last_modified):
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            patch_vary_headers(not_modified, ['Accept'])
+        return not_modified
+
+    @staticmethod
+    def add_validators(response, etag, last_modified):
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Тело зависит от выбранного по Accept рендерера (JSON, Browsable API), как и ETag
+            patch_vary_headers(response, ['Accept'])
+        return response
+
+    def get_validators(self, request):
+        stats = None
+        if self.conditional_timestamp_field:
+            stats = self.get_conditional_queryset().aggregate(**self.conditional_aggregates())
+        return self.make_validators(request, changes.counters(self.get_conditional_models()), stats)
+
+    async def aget_validators(self, request):
+        """get_validators для асинхронных представлений (first_app.async_views)."""
+        stats = None
+        if self.conditional_timestamp_field:
+            queryset = await sync_to_async(self.get_conditional_queryset)()
+            stats = await queryset.aaggregate(**self.conditional_aggregates())
+        return self.make_validators(request, await changes.acounters(self.get_conditional_models()), stats)
+
+    def get_conditional_models(self):
+        # ?expand= добавляет в ответ связанные модели: их изменения тоже должны менять ETag
+        return plan_for_serializer(self.get_serializer_class(), *self.get_sparse_selection()).models
+
+    def conditional_aggregates(self):
+        return {'last': Max(self.conditional_timestamp_field), 'count': Count('pk')}
+
+    @staticmethod
+    def make_validators(request, counters, stats=None):
+        parts = [request.get_full_path(), request.accepted_renderer.format, *counters]
+        last_modified = None
+        if stats is not None:
+            parts += [stats['last'], stats['count']]
+            if stats['last'] is not None:
+                last_modified = int(stats['last'].timestamp())
+        digest = hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+        return quote_etag(digest), last_modified
+
+    def get_conditional_queryset(self):
+        queryset = self.get_queryset().model._default_manager.all()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            return queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return self.filter_queryset(queryset)
+
+
+class _EchoBuffer:
+    def write(self, value):
+        return value
+
+
+class StreamingExportMixin:
+    """
+    Потоковая выгрузка всего отфильтрованного списка в CSV или NDJSON: ?export_format=csv|ndjson
+    плюс обычные параметры filterset_fields/search/ordering. Строки читаются через values_list()
+    и iterator(chunk_size), поэтому память не зависит от размера выгрузки.
+    """
+    export_fields = ()
+    export_chunk_size = 2000
+    export_format_query_param = 'export_format'
+    export_content_types = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        export_format = request.query_params.get(self.export_format_query_param, 'csv')
+        if export_format not in self.export_content_types:
+            return Response({'error': 'Неподдерживаемый формат выгрузки'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        headers = [header for header, _ in self.export_fields]
+        rows = queryset.values_list(*[lookup for _, lookup in self.export_fields]).iterator(
+            chunk_size=self.export_chunk_size)
+        lines = self.csv_lines(headers, rows) if export_format == 'csv' else self.ndjson_lines(headers, rows)
+        response = StreamingHttpResponse(lines, content_type=self.export_content_types[export_format])
+        filename = f"{queryset.model._meta.model_name}s.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @staticmethod
+    def export_value(value):
+        if isinstance(value, datetime):
+            return timezone.localtime(value).isoformat()
+        return value
+
+    def csv_lines(self, headers, rows):
+        writer = csv.writer(_EchoBuffer())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow([
+                json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else self.export_value(value)
+                for value in row
+            ])
+
+    def ndjson_lines(self, headers, rows):
+        for row in rows:
+            record = dict(zip(headers, map(self.export_value, row)))
+            yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
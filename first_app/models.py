@@ -1,11 +1,10 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
-from django.utils.text import slugify
 from datetime import date
 from django.utils import timezone
 from rest_framework.reverse import reverse_lazy
-from transliterate import translit
+from .slugs import unique_slug
 
 MINIMUM_SALARY = 24000.0
 
@@ -17,13 +16,20 @@ class Restaurant(models.Model):
     email = models.EmailField(verbose_name="Почта филиала", max_length=50, unique=True)
     manager = models.ForeignKey('Employee', verbose_name="Менеджер филиала", on_delete=models.SET_NULL,
                                 related_name='managed_restaurants', null=True, blank=True)
+    warehouse = models.ForeignKey('Warehouse', verbose_name="Склад кухни", on_delete=models.SET_NULL,
+                                  related_name='restaurants', null=True, blank=True)
     slug = models.SlugField(default='', null=False, unique=True)
 
     def __str__(self):
         return self.name
 
+    slug_related_paths = ()
+
+    def slug_source(self, related):
+        return self.name
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(self.name, 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Restaurant, self).save(*args, **kwargs)
 
     class Meta:
@@ -50,8 +56,13 @@ class Table(models.Model):
     def __str__(self):
         return f"Стол {self.table_number} в {self.restaurant.name}"
 
+    slug_related_paths = ('restaurant__name',)
+
+    def slug_source(self, related):
+        return f"{related(self, 'restaurant__name')}-{self.table_number}"
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(f"{self.restaurant.name}-{self.table_number}", 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Table, self).save(*args, **kwargs)
 
     class Meta:
@@ -71,8 +82,13 @@ class Warehouse(models.Model):
     def __str__(self):
         return self.name
 
+    slug_related_paths = ()
+
+    def slug_source(self, related):
+        return self.name
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(self.name, 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Warehouse, self).save(*args, **kwargs)
 
     class Meta:
@@ -97,15 +113,17 @@ class Employee(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    slug_related_paths = ('restaurant__name', 'warehouse__name')
+
+    def slug_source(self, related):
+        if self.restaurant_id:
+            return f"{self.first_name}-{self.last_name}-{related(self, 'restaurant__name')}"
+        if self.warehouse_id:
+            return f"{self.first_name}-{self.last_name}-{related(self, 'warehouse__name')}"
+        return f"{self.first_name}-{self.last_name}"
+
     def save(self, *args, **kwargs):
-        if self.restaurant:
-            self.slug = slugify(
-                translit(f"{self.first_name}-{self.last_name}-{self.restaurant.name}", 'ru', reversed=True))
-        elif self.warehouse:
-            self.slug = slugify(
-                translit(f"{self.first_name}-{self.last_name}-{self.warehouse.name}", 'ru', reversed=True))
-        else:
-            self.slug = slugify(translit(f"{self.first_name}-{self.last_name}", 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Employee, self).save(*args, **kwargs)
 
     def clean(self):
@@ -136,8 +154,13 @@ class Supplier(models.Model):
     def __str__(self):
         return self.name
 
+    slug_related_paths = ()
+
+    def slug_source(self, related):
+        return self.name
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(self.name, 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Supplier, self).save(*args, **kwargs)
 
     class Meta:
@@ -161,8 +184,13 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    slug_related_paths = ()
+
+    def slug_source(self, related):
+        return self.name
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(self.name, 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Product, self).save(*args, **kwargs)
 
     class Meta:
@@ -183,8 +211,13 @@ class Inventory(models.Model):
     def __str__(self):
         return f"{self.product.name} на {self.warehouse.name}"
 
+    slug_related_paths = ('product__name', 'warehouse__name')
+
+    def slug_source(self, related):
+        return f"{related(self, 'product__name')}-{related(self, 'warehouse__name')}"
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(f"{self.product.name}-{self.warehouse.name}", 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Inventory, self).save(*args, **kwargs)
 
     class Meta:
@@ -194,6 +227,54 @@ class Inventory(models.Model):
         verbose_name_plural = "Инвентарь"
 
 
+class StockMovement(models.Model):
+    """
+    Движение по складу (журнал только дописывается). quantity — изменение остатка со знаком:
+    приход положительный, расход отрицательный, перемещение — две строки с общей reference.
+    """
+    RECEIPT = 'RECEIPT'
+    CONSUMPTION = 'CONSUMPTION'
+    TRANSFER = 'TRANSFER'
+    ADJUSTMENT = 'ADJUSTMENT'
+    KIND_CHOICES = [(RECEIPT, 'Поступление'), (CONSUMPTION, 'Расход'), (TRANSFER, 'Перемещение'),
+                    (ADJUSTMENT, 'Корректировка')]
+    warehouse = models.ForeignKey(Warehouse, verbose_name="Склад", on_delete=models.CASCADE,
+                                  related_name='stock_movements', null=False, blank=False)
+    product = models.ForeignKey(Product, verbose_name="Продукт", on_delete=models.CASCADE,
+                                related_name='stock_movements', null=False, blank=False)
+    kind = models.CharField(verbose_name="Тип движения", max_length=20, choices=KIND_CHOICES)
+    quantity = models.DecimalField(verbose_name="Изменение количества", max_digits=12, decimal_places=2)
+    reference = models.CharField(verbose_name="Основание", max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(verbose_name="Время движения", default=timezone.now)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity} {self.product_id} на складе {self.warehouse_id}"
+
+    class Meta:
+        indexes = [models.Index(fields=['warehouse', 'product', 'created_at']), models.Index(fields=['created_at'])]
+        verbose_name = "Движение по складу"
+        verbose_name_plural = "Движения по складу"
+
+
+class StockSnapshot(models.Model):
+    """Остаток на момент taken_at: сумма всех движений с created_at <= taken_at."""
+    warehouse = models.ForeignKey(Warehouse, verbose_name="Склад", on_delete=models.CASCADE,
+                                  related_name='stock_snapshots', null=False, blank=False)
+    product = models.ForeignKey(Product, verbose_name="Продукт", on_delete=models.CASCADE,
+                                related_name='stock_snapshots', null=False, blank=False)
+    taken_at = models.DateTimeField(verbose_name="Момент снимка", db_index=True)
+    quantity = models.DecimalField(verbose_name="Количество", max_digits=14, decimal_places=2)
+
+    def __str__(self):
+        return f"Остаток {self.product_id} на складе {self.warehouse_id} на {self.taken_at}"
+
+    class Meta:
+        unique_together = ('warehouse', 'product', 'taken_at')
+        indexes = [models.Index(fields=['warehouse', 'taken_at'])]
+        verbose_name = "Снимок остатков"
+        verbose_name_plural = "Снимки остатков"
+
+
 class Menu(models.Model):
     restaurant = models.ForeignKey(Restaurant, verbose_name="Ресторан", on_delete=models.CASCADE, related_name="menus",
                                    null=False, blank=False)
@@ -206,8 +287,13 @@ class Menu(models.Model):
     def __str__(self):
         return f"{self.name} ({self.restaurant.name})"
 
+    slug_related_paths = ('restaurant__name',)
+
+    def slug_source(self, related):
+        return f"{self.name}-{related(self, 'restaurant__name')}"
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(f"{self.name}-{self.restaurant.name}", 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Menu, self).save(*args, **kwargs)
 
     class Meta:
@@ -228,8 +314,13 @@ class Dish(models.Model):
     def __str__(self):
         return self.name
 
+    slug_related_paths = ()
+
+    def slug_source(self, related):
+        return self.name
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(self.name, 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Dish, self).save(*args, **kwargs)
 
     class Meta:
@@ -265,8 +356,13 @@ class Modifier(models.Model):
     def __str__(self):
         return self.name
 
+    slug_related_paths = ('dish__name',)
+
+    def slug_source(self, related):
+        return f"{self.name}-{related(self, 'dish__name') if self.dish_id else 'generic'}"
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(translit(f"{self.name}-{self.dish.name if self.dish else 'generic'}", 'ru', reversed=True))
+        self.slug = unique_slug(self)
         super(Modifier, self).save(*args, **kwargs)
 
     class Meta:
@@ -275,6 +371,32 @@ class Modifier(models.Model):
         verbose_name_plural = "Модификаторы"
 
 
+class RecipeItem(models.Model):
+    """Расход продукта на одну порцию блюда или на одно применение модификатора."""
+    dish = models.ForeignKey(Dish, verbose_name="Блюдо", on_delete=models.CASCADE, related_name='recipe_items',
+                             null=True, blank=True)
+    modifier = models.ForeignKey(Modifier, verbose_name="Модификатор", on_delete=models.CASCADE,
+                                 related_name='recipe_items', null=True, blank=True)
+    product = models.ForeignKey(Product, verbose_name="Продукт", on_delete=models.CASCADE, related_name='recipe_items',
+                                null=False, blank=False)
+    quantity = models.DecimalField(verbose_name="Количество на порцию", max_digits=10, decimal_places=3,
+                                   validators=[MinValueValidator(0)])
+
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} для {self.dish_id or self.modifier_id}"
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(dish__isnull=False, modifier__isnull=True) |
+                                   models.Q(dish__isnull=True, modifier__isnull=False),
+                                   name='recipe_item_dish_xor_modifier'),
+            models.UniqueConstraint(fields=['dish', 'product'], name='recipe_item_unique_dish_product'),
+            models.UniqueConstraint(fields=['modifier', 'product'], name='recipe_item_unique_modifier_product'),
+        ]
+        verbose_name = "Позиция рецепта"
+        verbose_name_plural = "Позиции рецептов"
+
+
 class Customer(models.Model):
     first_name = models.CharField(verbose_name="Имя клиента", max_length=50, blank=True, null=True)
     last_name = models.CharField(verbose_name="Фамилия клиента", max_length=50, blank=True, null=True)
@@ -287,10 +409,14 @@ class Customer(models.Model):
         return f"{self.first_name} {self.last_name}" if self.first_name and self.last_name else (self.email
             or "Безымянный клиент")
 
-    def save(self, *args, **kwargs):
-        base = f"{self.first_name}-{self.last_name}" if self.first_name and self.last_name else (self.email
+    slug_related_paths = ()
+
+    def slug_source(self, related):
+        return f"{self.first_name}-{self.last_name}" if self.first_name and self.last_name else (self.email
             or f"customer-{self.id or 'new'}")
-        self.slug = slugify(translit(base, 'ru', reversed=True))
+
+    def save(self, *args, **kwargs):
+        self.slug = unique_slug(self)
         super(Customer, self).save(*args, **kwargs)
 
     class Meta:
@@ -317,10 +443,14 @@ class Reservation(models.Model):
     def __str__(self):
         return f"Бронирование на {self.reservation_date} {self.time} для {self.table}"
 
+    slug_related_paths = ('table__restaurant__name', 'table__table_number')
+
+    def slug_source(self, related):
+        return (f"{related(self, 'table__restaurant__name')}-{related(self, 'table__table_number')}-"
+                f"{self.reservation_date}")
+
     def save(self, *args, **kwargs):
-        self.slug = slugify(
-            translit(f"{self.table.restaurant.name}-{self.table.table_number}-{self.reservation_date}", 'ru',
-                     reversed=True))
+        self.slug = unique_slug(self)
         super(Reservation, self).save(*args, **kwargs)
 
     class Meta:
@@ -342,20 +472,30 @@ class Order(models.Model):
     total_amount = models.DecimalField(verbose_name="Общая сумма", max_digits=10, decimal_places=2, blank=False,
                                        null=False, validators=[MinValueValidator(0)])
     status = models.CharField(verbose_name="Статус", max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    updated_at = models.DateTimeField(verbose_name="Время изменения", auto_now=True, db_index=True)
+    stock_deducted_at = models.DateTimeField(verbose_name="Время списания ингредиентов", null=True, blank=True)
     slug = models.SlugField(default='', null=False, unique=True)
 
     def __str__(self):
         return f"Заказ #{self.id} от {self.order_date.strftime('%Y-%m-%d %H:%M')}"
 
+    slug_related_paths = ('restaurant__name',)
+
+    def slug_source(self, related):
+        return f"payment-{related(self, 'restaurant__name')}-{self.order_date.strftime('%Y%m%d%H%M%S')}"
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(
-                translit(f"payment-{self.restaurant.name}-{self.order_date.strftime('%Y%m%d%H%M%S')}", 'ru',
-                         reversed=True))
+            self.slug = unique_slug(self)
         super(Order, self).save(*args, **kwargs)
 
     class Meta:
-        indexes = [models.Index(fields=['restaurant', 'order_date'])]
+        indexes = [
+            models.Index(fields=['restaurant', 'order_date']),
+            # Завершённые заказы, ингредиенты которых ещё не списаны (очередь для пакетного списания)
+            models.Index(fields=['updated_at'], name='order_stock_pending_idx',
+                         condition=models.Q(status='COMPLETED', stock_deducted_at__isnull=True)),
+        ]
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
 
@@ -395,14 +535,84 @@ class Payment(models.Model):
     def __str__(self):
         return f"Платёж #{self.id} для заказа #{self.order.id}"
 
+    slug_related_paths = ('order__restaurant__name',)
+
+    def slug_source(self, related):
+        return f"payment-{related(self, 'order__restaurant__name')}-{self.payment_time.strftime('%Y%m%d%H%M%S')}"
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(
-                translit(f"payment-{self.order.restaurant.name}-{self.payment_time.strftime('%Y%m%d%H%M%S')}", 'ru',
-                         reversed=True))
+            self.slug = unique_slug(self)
         super(Payment, self).save(*args, **kwargs)
 
     class Meta:
-        indexes = [models.Index(fields=['order'])]
+        indexes = [models.Index(fields=['order']), models.Index(fields=['payment_time', 'id'])]
         verbose_name = "Платёж"
         verbose_name_plural = "Платежи"
+
+
+class DailyRestaurantSales(models.Model):
+    restaurant = models.ForeignKey(Restaurant, verbose_name="Ресторан", on_delete=models.CASCADE,
+                                   related_name='daily_sales', null=False, blank=False)
+    day = models.DateField(verbose_name="День", blank=False, null=False)
+    orders_count = models.IntegerField(verbose_name="Количество заказов", default=0)
+    cancelled_count = models.IntegerField(verbose_name="Отменённых заказов", default=0)
+    revenue = models.DecimalField(verbose_name="Выручка без отменённых заказов", max_digits=14, decimal_places=2,
+                                  default=0)
+
+    class Meta:
+        unique_together = ('restaurant', 'day')
+        indexes = [models.Index(fields=['restaurant', 'day'])]
+        verbose_name = "Дневные продажи ресторана"
+        verbose_name_plural = "Дневные продажи ресторанов"
+
+
+class DailyDishSales(models.Model):
+    restaurant = models.ForeignKey(Restaurant, verbose_name="Ресторан", on_delete=models.CASCADE,
+                                   related_name='daily_dish_sales', null=False, blank=False)
+    dish = models.ForeignKey(Dish, verbose_name="Блюдо", on_delete=models.CASCADE, related_name='daily_sales',
+                             null=False, blank=False)
+    day = models.DateField(verbose_name="День", blank=False, null=False)
+    orders_count = models.IntegerField(verbose_name="Заказов с блюдом", default=0)
+    quantity = models.IntegerField(verbose_name="Продано порций", default=0)
+    cancelled_quantity = models.IntegerField(verbose_name="Порций в отменённых заказах", default=0)
+    revenue = models.DecimalField(verbose_name="Выручка без отменённых заказов", max_digits=14, decimal_places=2,
+                                  default=0)
+
+    class Meta:
+        unique_together = ('restaurant', 'dish', 'day')
+        indexes = [models.Index(fields=['restaurant', 'day']), models.Index(fields=['dish', 'day'])]
+        verbose_name = "Дневные продажи блюда"
+        verbose_name_plural = "Дневные продажи блюд"
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(verbose_name="Название", max_length=50, unique=True)
+    value = models.DateTimeField(verbose_name="Обработано до")
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    class Meta:
+        verbose_name = "Отметка агрегации"
+        verbose_name_plural = "Отметки агрегации"
+
+
+class ReservationOutbox(models.Model):
+    """
+    Исходящие события по бронированиям. Запись делается в той же транзакции, что и изменение брони,
+    а письма отправляет диспетчер уже после коммита. Неотправленное событие остаётся в таблице
+    до следующей попытки и задерживает более поздние события той же брони.
+    """
+    reservation_id = models.IntegerField(verbose_name="Бронирование")
+    action = models.CharField(verbose_name="Действие", max_length=20)
+    created_at = models.DateTimeField(verbose_name="Время события", auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(verbose_name="Неудачных попыток", default=0)
+    retry_at = models.DateTimeField(verbose_name="Повторить не раньше", null=True, blank=True)
+
+    def __str__(self):
+        return f"Событие #{self.id}: бронирование {self.reservation_id} {self.action}"
+
+    class Meta:
+        verbose_name = "Событие бронирования"
+        verbose_name_plural = "События бронирований"
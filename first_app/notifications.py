@@ -0,0 +1,82 @@
+import logging
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from .models import Reservation
+
+logger = logging.getLogger(__name__)
+
+CONFIRMED = 'confirmed'
+CANCELLED = 'cancelled'
+
+
+def coalesce(events):
+    """Для каждой брони остаётся только последнее действие, порядок — по последнему событию."""
+    latest = {}
+    for reservation_id, action in events:
+        latest.pop(reservation_id, None)
+        latest[reservation_id] = action
+    return list(latest.items())
+
+
+def render(reservation, action):
+    customer = reservation.customer
+    table = reservation.table
+    subject = f"Статус бронирования #{reservation.id}"
+    if action == CONFIRMED:
+        message = (
+            f"Уважаемый {customer.first_name} {customer.last_name},\n\n"
+            f"Ваше бронирование стола #{table.table_number} в ресторане "
+            f"{table.restaurant.name} на {reservation.reservation_date} в "
+            f"{reservation.time} подтверждено.\n\n"
+            f"Количество гостей: {reservation.number_of_guests}\n"
+            f"Спасибо за выбор нашего ресторана!"
+        )
+    elif action == CANCELLED:
+        message = (
+            f"Уважаемый {customer.first_name} {customer.last_name},\n\n"
+            f"Ваше бронирование стола #{table.table_number} в ресторане "
+            f"{table.restaurant.name} на {reservation.reservation_date} в "
+            f"{reservation.time} было отменено.\n\n"
+            f"Если у вас есть вопросы, свяжитесь с нами."
+        )
+    else:
+        raise ValueError(f"Недопустимое действие: {action}")
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [customer.email])
+
+
+def deliver(events, connection=None):
+    """
+    Отправляет уведомления пачкой: брони читаются одним запросом с select_related,
+    письма уходят через одно соединение. Возвращает события, письма по которым не ушли.
+    """
+    reservations = Reservation.objects.select_related('customer', 'table__restaurant') \
+        .in_bulk([reservation_id for reservation_id, _ in events])
+
+    messages = []
+    for reservation_id, action in events:
+        reservation = reservations.get(reservation_id)
+        if reservation is None:
+            logger.error(f"Бронирование {reservation_id} не найдено")
+            continue
+        if reservation.customer is None or not reservation.customer.email:
+            logger.warning(f"Клиент {reservation.customer} не имеет email для бронирования {reservation_id}")
+            continue
+        try:
+            messages.append(((reservation_id, action), render(reservation, action)))
+        except ValueError as e:
+            logger.error(f"Ошибка при подготовке уведомления для бронирования {reservation_id}: {str(e)}")
+
+    failed = []
+    if not messages:
+        return failed
+    connection = connection or get_connection()
+    with connection:
+        for event, message in messages:
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                logger.error(f"Ошибка при отправке уведомления для бронирования {event[0]}: {str(e)}")
+                failed.append(event)
+            else:
+                logger.info(f"Уведомление о бронировании {event[0]} ({event[1]}) отправлено на {message.to[0]}")
+    return failed
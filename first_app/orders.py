@@ -0,0 +1,88 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import BigIntegerField, CharField, DecimalField, Q, Value
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from . import changes
+from .models import MenuDetail, Modifier, Order, OrderDetail
+from .slugs import slug_base, slug_for, taken_slugs
+
+CENTS = Decimal('0.01')
+
+
+def resolve_prices(restaurant, dish_slugs, modifier_slugs, day=None, slugs=None):
+    """
+    Цены блюд из действующих меню ресторана и надбавки модификаторов одним запросом (UNION ALL).
+    Возвращает {слаг блюда: (id, цена)}, {слаг модификатора: (надбавка, id блюда или None)}
+    и список слагов из queryset slugs (занятые слаги нового заказа), если он передан — тем же запросом.
+    """
+    day = day or timezone.localdate()
+    menu_prices = MenuDetail.objects.filter(
+        Q(menu__end_date__isnull=True) | Q(menu__end_date__gte=day),
+        menu__restaurant=restaurant, menu__start_date__lte=day, is_available=True, dish__slug__in=dish_slugs,
+    ).values_list(Value('dish', output_field=CharField()), 'dish__slug', 'price', 'dish_id',
+                  Value(None, output_field=BigIntegerField()))
+    modifier_prices = Modifier.objects.filter(slug__in=modifier_slugs).values_list(
+        Value('modifier', output_field=CharField()), 'slug', 'price_change', 'id', 'dish_id')
+
+    parts = [modifier_prices]
+    if slugs is not None:
+        parts.append(slugs.values_list(
+            Value('slug', output_field=CharField()), 'slug', Value(None, output_field=DecimalField()),
+            Value(None, output_field=BigIntegerField()), Value(None, output_field=BigIntegerField())))
+
+    dishes, modifiers, taken = {}, {}, []
+    for kind, slug, price, pk, dish_id in menu_prices.union(*parts, all=True):
+        if kind == 'dish':
+            # Блюдо может быть в нескольких действующих меню: берём меньшую цену
+            if slug not in dishes or price < dishes[slug][1]:
+                dishes[slug] = (pk, price)
+        elif kind == 'modifier':
+            modifiers[slug] = (price, dish_id)
+        else:
+            taken.append(slug)
+    return dishes, modifiers, taken
+
+
+def place_order(restaurant, customer, items):
+    """
+    Создаёт заказ со всеми позициями в одной транзакции. Цены считаются на сервере:
+    цена блюда в меню плюс надбавки модификаторов, умноженные на количество.
+    Всего три запроса: цены вместе с занятыми слагами (UNION ALL), INSERT заказа и один INSERT позиций.
+    """
+    dish_slugs = {item['dish'] for item in items}
+    modifier_slugs = {slug for item in items for slug in item['modifiers']}
+    order = Order(restaurant=restaurant, customer=customer)
+    base = slug_base(order)
+    dishes, modifiers, taken = resolve_prices(restaurant, dish_slugs, modifier_slugs,
+                                              slugs=taken_slugs(order, base))
+
+    errors, lines = [], []
+    for item in items:
+        item_errors = {}
+        dish = dishes.get(item['dish'])
+        if dish is None:
+            item_errors['dish'] = ['Блюдо недоступно в действующем меню ресторана']
+        unknown = [slug for slug in item['modifiers']
+                   if slug not in modifiers or modifiers[slug][1] not in (None, dish and dish[0])]
+        if unknown:
+            item_errors['modifiers'] = [f"Модификатор недоступен для этого блюда: {slug}" for slug in unknown]
+        errors.append(item_errors)
+        if not item_errors:
+            unit_price = dish[1] + sum((modifiers[slug][0] for slug in item['modifiers']), Decimal('0'))
+            lines.append((dish[0], item, unit_price.quantize(CENTS)))
+    if any(errors):
+        raise ValidationError({'items': errors})
+
+    total = sum((price * item['quantity'] for _, item, price in lines), Decimal('0')).quantize(CENTS)
+    # Слаг подобран по занятым слагам из того же запроса: save() не проверяет его ещё раз
+    order.total_amount, order.slug = total, slug_for(order, base, taken)
+    with transaction.atomic():
+        order.save()
+        OrderDetail.objects.bulk_create([
+            OrderDetail(order=order, dish_id=dish_id, quantity=item['quantity'], price=price,
+                        modifiers=item['modifiers'] or None)
+            for dish_id, item, price in lines
+        ])
+        transaction.on_commit(lambda: changes.bump(OrderDetail))
+    return order
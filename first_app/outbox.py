@@ -0,0 +1,135 @@
+import logging
+import secrets
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db.models import F
+from django.utils import timezone
+from .models import ReservationOutbox
+from .notifications import coalesce
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "outbox:reservations:lock"
+# Аренда диспетчера продлевается перед каждой пачкой, поэтому срок ограничивает одну пачку, а не весь проход
+LOCK_TIMEOUT = 60
+
+# Проверка владельца и продление/снятие аренды в Redis выполняются одним скриптом, то есть атомарно
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Локальный кэш живёт внутри процесса, там атомарность даёт обычная блокировка
+_local_lock = threading.Lock()
+
+
+def record(reservation_id, action):
+    """Записывает событие; вызывать внутри транзакции, меняющей бронь, — при откате событие исчезнет вместе с ней."""
+    return ReservationOutbox.objects.create(reservation_id=reservation_id, action=action)
+
+
+def _run_script(script, token, *args):
+    client = cache._cache.get_client(LOCK_KEY, write=True)
+    return bool(client.eval(script, 1, cache.make_and_validate_key(LOCK_KEY), token, *args))
+
+
+def acquire():
+    """Берёт аренду диспетчера; возвращает токен владельца или None, если аренда занята."""
+    # Целое число Redis-кэш Django хранит как есть, поэтому скрипты сравнивают токен строкой
+    token = secrets.randbits(62)
+    with _local_lock:
+        return token if cache.add(LOCK_KEY, token, LOCK_TIMEOUT) else None
+
+
+def renew(token):
+    """Продлевает аренду, если она всё ещё принадлежит token; False — аренду мог занять другой проход."""
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], RedisCache):
+        return _run_script(RENEW_SCRIPT, token, LOCK_TIMEOUT)
+    with _local_lock:
+        return cache.get(LOCK_KEY) == token and cache.touch(LOCK_KEY, LOCK_TIMEOUT)
+
+
+def release(token):
+    """Снимает аренду, только если она принадлежит token: после истечения ключ мог занять другой проход."""
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], RedisCache):
+        return _run_script(RELEASE_SCRIPT, token)
+    with _local_lock:
+        if cache.get(LOCK_KEY) != token:
+            return False
+        cache.delete(LOCK_KEY)
+        return True
+
+
+def dispatch(deliver, batch_size, max_batches=None):
+    """
+    Отправляет накопленные события пачками по batch_size в порядке записи; deliver(events)
+    возвращает события, которые не ушли. Строки удаляются только после отправки (доставка
+    «хотя бы один раз»). Не ушедшее событие остаётся в outbox с отсрочкой
+    RESERVATION_NOTIFY_RETRY_SECONDS, и до его повтора более поздние события той же брони
+    не отправляются, поэтому «отменено» не обгонит «подтверждено». После
+    RESERVATION_NOTIFY_MAX_ATTEMPTS неудач событие снимается с очереди.
+    Диспетчер работает в одном экземпляре: аренда продлевается перед каждой пачкой,
+    а если её всё же занял другой проход, этот проход останавливается.
+    Возвращает число отправленных событий или None, если другой проход ещё идёт.
+    """
+    token = acquire()
+    if token is None:
+        return None
+    sent = batches = last_id = 0
+    # Брони, у которых в этом проходе есть неотправленное или отложенное событие
+    blocked = set()
+    try:
+        while max_batches is None or batches < max_batches:
+            if batches and not renew(token):
+                logger.warning(f"Аренда диспетчера outbox истекла после {batches} пачек, проход остановлен")
+                break
+            rows = list(ReservationOutbox.objects.filter(id__gt=last_id).order_by('id')
+                        .values_list('id', 'reservation_id', 'action', 'retry_at')[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            now = timezone.now()
+            ready = []
+            for row_id, reservation_id, action, retry_at in rows:
+                if reservation_id in blocked or (retry_at is not None and retry_at > now):
+                    blocked.add(reservation_id)
+                else:
+                    ready.append((row_id, reservation_id, action))
+            if ready:
+                failed = {reservation_id for reservation_id, _ in
+                          deliver(coalesce((reservation_id, action) for _, reservation_id, action in ready))}
+                blocked |= failed
+                done = [row_id for row_id, reservation_id, _ in ready if reservation_id not in failed]
+                ReservationOutbox.objects.filter(id__in=done).delete()
+                if failed:
+                    postpone([row_id for row_id, reservation_id, _ in ready if reservation_id in failed])
+                sent += len(done)
+            batches += 1
+            if len(rows) < batch_size:
+                break
+    finally:
+        release(token)
+    return sent
+
+
+def postpone(row_ids):
+    """Откладывает повтор не ушедших событий; исчерпавшие попытки удаляются."""
+    ReservationOutbox.objects.filter(id__in=row_ids).update(
+        attempts=F('attempts') + 1,
+        retry_at=timezone.now() + timedelta(seconds=settings.RESERVATION_NOTIFY_RETRY_SECONDS))
+    exhausted = ReservationOutbox.objects.filter(id__in=row_ids, attempts__gte=settings.RESERVATION_NOTIFY_MAX_ATTEMPTS)
+    for reservation_id, action in exhausted.values_list('reservation_id', 'action'):
+        logger.error(f"Уведомление {action} для бронирования {reservation_id} не отправлено "
+                     f"после {settings.RESERVATION_NOTIFY_MAX_ATTEMPTS} попыток")
+    exhausted.delete()
@@ -0,0 +1,150 @@
+import base64
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset): страница выбирается условием WHERE по последней строке
+    предыдущей страницы, а не OFFSET, и без COUNT(*). Ключ берётся из view.keyset_ordering
+    и должен совпадать с индексом таблицы; в конец всегда добавляется id, чтобы ключ был уникальным.
+    """
+    page_size = StandardResultsSetPagination.page_size
+    page_size_query_param = StandardResultsSetPagination.page_size_query_param
+    max_page_size = StandardResultsSetPagination.max_page_size
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_key_fields(queryset.model, view)
+        values, self.reverse = self.decode_cursor(request)
+
+        ordering = [('' if descending == self.reverse else '-') + field.attname for field, descending in self.fields]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.get_key_filter(values))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_key_fields(self, model, view):
+        names = list(getattr(view, 'keyset_ordering', None) or ('id',))
+        if names[-1].lstrip('-') != 'id':
+            names.append('id')
+        return [(model._meta.get_field(name.lstrip('-')), name.startswith('-')) for name in names]
+
+    def get_key_filter(self, values):
+        key_filter = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != self.reverse else 'gt'
+            key_filter |= equal & Q(**{f"{field.attname}__{lookup}": value})
+            equal &= Q(**{field.attname: value})
+        return key_filter
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            raw_values = payload['k']
+            if len(raw_values) != len(self.fields):
+                raise ValueError
+            values = [field.to_python(value) for (field, _), value in zip(self.fields, raw_values)]
+            return values, bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        raw_values = []
+        for field, _ in self.fields:
+            value = getattr(row, field.attname)
+            raw_values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        token = base64.urlsafe_b64encode(json.dumps({'k': raw_values, 'r': int(reverse)}).encode('ascii'))
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, token.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class TimeOrderedPagination(StandardResultsSetPagination):
+    """
+    Постраничная пагинация с возможностью переключиться на KeysetPagination:
+    для всего ViewSet через pagination_mode = 'keyset' или для запроса через
+    ?pagination=keyset (переход по ссылке с ?cursor= тоже включает keyset).
+    """
+    mode_query_param = 'pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request, view):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def use_keyset(self, request, view):
+        if request.query_params.get(KeysetPagination.cursor_query_param):
+            return True
+        mode = request.query_params.get(self.mode_query_param) or getattr(view, 'pagination_mode', 'page')
+        return mode == 'keyset'
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
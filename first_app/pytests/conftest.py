@@ -0,0 +1,32 @@
+import time
+import pytest
+from django.core.cache import cache
+from first_app import authentication
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    # В тестах Redis не поднимается: кэш и события ленты держим в памяти процесса
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.LIVE_EVENTS_BACKEND = 'local'
+    cache.clear()
+    authentication.local_tokens.clear()
+
+
+@pytest.fixture(autouse=True)
+def primary_only(settings):
+    # django_db открывает тестам только default: реплики (DATABASE_REPLICA_URLS) включают сами тесты маршрутизации
+    settings.REPLICA_DATABASES = []
+
+
+@pytest.fixture
+def best_of():
+    """Лучшее время из runs вызовов func, в секундах; для тестов с меткой benchmark."""
+    def measure(runs, func):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+    return measure
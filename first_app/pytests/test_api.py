@@ -1,10 +1,16 @@
+import json
 import pytest
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
-from first_app.models import Restaurant, Employee, Table, Reservation, Order, Customer
-from datetime import date, time
+from first_app.models import (
+    Restaurant, Employee, Table, Reservation, Order, Customer, Warehouse, Product, Inventory, Menu, Dish, MenuDetail,
+    Modifier, OrderDetail, Payment, ReservationOutbox
+)
+from datetime import date, datetime, time, timedelta
 from django.utils import timezone
+from first_app import availability, menus, orders
 
 
 @pytest.fixture
@@ -195,26 +201,28 @@ def test_table_set_status_unauthenticated(api_client, create_table):
     assert response.status_code == 401
 
 
-# @pytest.mark.django_db
-# def test_reservation_cancel(create_authenticated_client, create_reservation, create_table):
-#     url = reverse('reservation-cancel', kwargs={'pk': create_reservation.pk})
-#     response = create_authenticated_client.post(url)
-#     assert response.status_code == 200
-#     assert response.data['status'] == Reservation.CANCELLED
-#     create_reservation.refresh_from_db()
-#     create_table.refresh_from_db()
-#     assert create_reservation.status == Reservation.CANCELLED
-#     assert create_table.status == Table.FREE
-#
-#
-# @pytest.mark.django_db
-# def test_reservation_cancel_invalid_status(create_authenticated_client, create_reservation):
-#     create_reservation.status = Reservation.CANCELLED
-#     create_reservation.save()
-#     url = reverse('reservation-cancel', kwargs={'pk': create_reservation.pk})
-#     response = create_authenticated_client.post(url)
-#     assert response.status_code == 400
-#     assert 'error' in response.data
+@pytest.mark.django_db
+def test_reservation_cancel(create_authenticated_client, create_reservation, create_table):
+    url = reverse('reservation-cancel', kwargs={'pk': create_reservation.pk})
+    response = create_authenticated_client.post(url)
+    assert response.status_code == 200
+    assert response.data['status'] == Reservation.CANCELLED
+    create_reservation.refresh_from_db()
+    create_table.refresh_from_db()
+    assert create_reservation.status == Reservation.CANCELLED
+    assert create_table.status == Table.FREE
+    assert list(ReservationOutbox.objects.values_list('reservation_id', 'action')) == [
+        (create_reservation.pk, 'cancelled')]
+
+
+@pytest.mark.django_db
+def test_reservation_cancel_invalid_status(create_authenticated_client, create_reservation):
+    create_reservation.status = Reservation.CANCELLED
+    create_reservation.save()
+    url = reverse('reservation-cancel', kwargs={'pk': create_reservation.pk})
+    response = create_authenticated_client.post(url)
+    assert response.status_code == 400
+    assert 'error' in response.data
 
 
 @pytest.mark.django_db
@@ -248,3 +256,328 @@ def test_token_login(api_client, create_user):
 def test_token_login_invalid_credentials(api_client):
     response = api_client.post('/auth/token/login/', {'username': 'wronguser', 'password': 'wrongpass'})
     assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_order_keyset_pagination(create_authenticated_client, create_restaurant, create_customer):
+    start = timezone.now()
+    for i in range(5):
+        Order.objects.create(restaurant=create_restaurant, customer=create_customer, total_amount=10,
+                             order_date=start + timedelta(minutes=i), slug=f"order-{i}")
+    url = reverse('order-list') + '?pagination=keyset&page_size=2'
+    seen = []
+    pages = 0
+    while url:
+        response = create_authenticated_client.get(url)
+        assert response.status_code == 200
+        assert 'count' not in response.data
+        seen.extend(order['slug'] for order in response.data['results'])
+        url = response.data['next']
+        pages += 1
+    assert seen == [f"order-{i}" for i in range(5)]
+    assert pages == 3
+
+    previous = create_authenticated_client.get(response.data['previous'])
+    assert [order['slug'] for order in previous.data['results']] == ["order-2", "order-3"]
+
+
+@pytest.mark.django_db
+def test_order_keyset_pagination_invalid_cursor(create_authenticated_client):
+    response = create_authenticated_client.get(reverse('order-list') + '?cursor=broken')
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_inventory_bulk_upsert(create_authenticated_client):
+    warehouse = Warehouse.objects.create(name="Main Warehouse", address="1 Storage St")
+    tomatoes = Product.objects.create(name="Tomatoes", unit=Product.UNIT_KG)
+    onions = Product.objects.create(name="Onions", unit=Product.UNIT_KG)
+    Inventory.objects.create(warehouse=warehouse, product=tomatoes, quantity=5)
+    data = [
+        {"warehouse": warehouse.slug, "product": tomatoes.slug, "quantity": "12.50"},
+        {"warehouse": warehouse.slug, "product": onions.slug, "quantity": "3"},
+        {"warehouse": warehouse.slug, "product": "unknown", "quantity": "1"},
+        {"warehouse": warehouse.slug, "product": onions.slug, "quantity": "-1"},
+    ]
+    response = create_authenticated_client.post(reverse('inventory-bulk'), data, format='json')
+    assert response.status_code == 200
+    assert response.data['upserted'] == 2
+    assert [error['index'] for error in response.data['errors']] == [2, 3]
+    assert 'product' in response.data['errors'][0]['errors']
+    assert Inventory.objects.get(warehouse=warehouse, product=tomatoes).quantity == 12.5
+    assert Inventory.objects.get(warehouse=warehouse, product=onions).quantity == 3
+    assert Inventory.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_inventory_bulk_requires_list(create_authenticated_client):
+    response = create_authenticated_client.post(reverse('inventory-bulk'), {"quantity": 1}, format='json')
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_table_availability(api_client, create_table, create_customer, django_assert_num_queries,
+                            django_capture_on_commit_callbacks):
+    big_table = Table.objects.create(restaurant=create_table.restaurant, table_number=2, capacity=8)
+    url = reverse('table-availability')
+    params = {'restaurant': 'test-restaurant', 'date': '2025-07-18', 'time': '18:00,21:00', 'guests': 2}
+
+    response = api_client.get(url, params)
+    assert response.status_code == 200
+    assert [len(slot['tables']) for slot in response.data['slots']] == [2, 2]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Reservation.objects.create(table=big_table, customer=create_customer, reservation_date=date(2025, 7, 18),
+                                   time=time(19, 0), number_of_guests=6)
+    # Брони дня пересобираются одним запросом, список столов остаётся в кэше
+    with django_assert_num_queries(1):
+        response = api_client.get(url, params)
+    slots = {slot['time']: [table['table_number'] for table in slot['tables']] for slot in response.data['slots']}
+    assert slots == {'18:00': [1], '21:00': [1, 2]}
+
+    with django_assert_num_queries(0):
+        response = api_client.get(url, {**params, 'guests': 6})
+    assert [len(slot['tables']) for slot in response.data['slots']] == [0, 1]
+
+
+@pytest.mark.django_db
+def test_availability_index_built_during_a_booking_is_not_kept(create_table, create_customer, monkeypatch,
+                                                               django_capture_on_commit_callbacks):
+    day = date(2025, 7, 18)
+    build_busy = availability._busy
+
+    def booking_commits_mid_build(reservations):
+        rows = list(reservations)
+        # Бронь коммитится, пока индекс строится по уже прочитанным строкам
+        with django_capture_on_commit_callbacks(execute=True):
+            Reservation.objects.create(table=create_table, customer=create_customer, reservation_date=day,
+                                       time=time(19, 0), number_of_guests=2)
+        return build_busy(rows)
+
+    monkeypatch.setattr(availability, '_busy', booking_commits_mid_build)
+    _, busy = availability.load_index('test-restaurant', day)
+    assert busy == {}
+    monkeypatch.setattr(availability, '_busy', build_busy)
+
+    _, busy = availability.load_index('test-restaurant', day)
+    assert list(busy.values()) == [(create_table.pk, 19 * 60)]
+
+
+@pytest.mark.django_db
+def test_reservation_overlap_is_rejected(create_authenticated_client, create_reservation):
+    data = {
+        "table": create_reservation.table.slug,
+        "customer": create_reservation.customer.slug,
+        "reservation_date": "2025-07-18",
+        "time": "19:00",
+        "number_of_guests": 2,
+    }
+    response = create_authenticated_client.post(reverse('reservation-list'), data, format='json')
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def create_menu(create_restaurant):
+    menu = Menu.objects.create(restaurant=create_restaurant, name="Main", start_date=date(2020, 1, 1))
+    soup = Dish.objects.create(name="Borscht", base_price=300)
+    MenuDetail.objects.create(menu=menu, dish=soup, price=350)
+    Modifier.objects.create(name="Sour cream", price_change=50, dish=soup)
+    Modifier.objects.create(name="Bread", price_change=20)
+    Dish.objects.create(name="Off menu", base_price=100)
+    return menu
+
+
+@pytest.mark.django_db
+def test_order_place(create_authenticated_client, create_menu, create_customer, django_assert_num_queries):
+    data = {
+        "restaurant": "test-restaurant",
+        "customer": create_customer.slug,
+        "items": [
+            {"dish": "borscht", "quantity": 2, "modifiers": ["sour-cream-borscht", "bread-generic"]},
+            {"dish": "borscht", "quantity": 1},
+        ],
+    }
+    # Токен, ресторан и клиент корзины, place_order (UNION, INSERT заказа и позиций плюс точка сохранения),
+    # затем заказ с позициями для ответа
+    with django_assert_num_queries(10):
+        response = create_authenticated_client.post(reverse('order-place'), data, format='json')
+    assert response.status_code == 201
+    assert response.data['total_amount'] == '1190.00'
+    assert [(detail['quantity'], detail['price']) for detail in response.data['details']] == [
+        (2, '420.00'), (1, '350.00')]
+    assert Order.objects.get(pk=response.data['id']).details.count() == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('lines', [1, 8])
+def test_place_order_query_count_does_not_grow_with_the_cart(create_menu, create_customer, lines,
+                                                             django_assert_num_queries):
+    items = [{"dish": "borscht", "quantity": line + 1, "modifiers": ["sour-cream-borscht"] if line % 2 else []}
+             for line in range(lines)]
+    # Цены и занятые слаги одним UNION, INSERT заказа и один bulk INSERT позиций; остальное — точка сохранения
+    with django_assert_num_queries(5) as captured:
+        order = orders.place_order(create_menu.restaurant, create_customer, items)
+    statements = [query['sql'] for query in captured.captured_queries if 'SAVEPOINT' not in query['sql']]
+    assert len(statements) == 3
+    assert order.details.count() == lines
+
+
+@pytest.mark.django_db
+def test_place_order_picks_a_free_slug(create_menu, create_customer, monkeypatch):
+    # Два заказа ресторана в одну секунду получают одинаковую базу слага
+    monkeypatch.setattr(orders, 'slug_base', lambda order: 'payment-test-restaurant-20250718120000')
+    Order.objects.create(restaurant=create_menu.restaurant, total_amount=0,
+                         slug='payment-test-restaurant-20250718120000')
+    order = orders.place_order(create_menu.restaurant, create_customer, [{"dish": "borscht", "quantity": 1,
+                                                                        "modifiers": []}])
+    assert order.slug == 'payment-test-restaurant-20250718120000-2'
+
+
+@pytest.mark.django_db
+def test_order_place_rejects_unknown_items(create_authenticated_client, create_menu):
+    data = {
+        "restaurant": "test-restaurant",
+        "items": [{"dish": "borscht", "quantity": 1}, {"dish": "off-menu", "quantity": 1, "modifiers": ["nope"]}],
+    }
+    response = create_authenticated_client.post(reverse('order-place'), data, format='json')
+    assert response.status_code == 400
+    assert response.data['items'][0] == {}
+    assert set(response.data['items'][1]) == {'dish', 'modifiers'}
+    assert not Order.objects.exists()
+
+
+@pytest.mark.django_db
+def test_restaurant_menu_document(api_client, create_menu, django_assert_num_queries,
+                                  django_capture_on_commit_callbacks):
+    url = reverse('restaurant-menu', kwargs={'pk': create_menu.restaurant.pk})
+    response = api_client.get(url)
+    assert response.status_code == 200
+    item = response.data['menus'][0]['items'][0]
+    assert (item['dish'], item['price']) == ('borscht', '350.00')
+    assert [modifier['slug'] for modifier in item['modifiers']] == ['sour-cream-borscht']
+    assert [modifier['slug'] for modifier in response.data['generic_modifiers']] == ['bread-generic']
+
+    with django_assert_num_queries(0):
+        assert api_client.get(url).data == response.data
+
+    with django_capture_on_commit_callbacks(execute=True):
+        detail = MenuDetail.objects.get(menu=create_menu)
+        detail.price = 400
+        detail.save()
+    updated = api_client.get(url).data
+    assert updated['version'] > response.data['version']
+    assert updated['menus'][0]['items'][0]['price'] == '400.00'
+
+
+@pytest.mark.django_db
+def test_cached_menu_document_is_one_cache_read(create_menu, monkeypatch):
+    restaurant_id = create_menu.restaurant.pk
+    menus.store_document(restaurant_id, menus.build_document(create_menu.restaurant))
+    calls = []
+
+    class RecordingCache:
+        def __getattr__(self, name):
+            calls.append(name)
+            return getattr(cache, name)
+
+    monkeypatch.setattr(menus, 'cache', RecordingCache())
+    assert menus.get_document(restaurant_id)['restaurant'] == create_menu.restaurant.slug
+    assert calls == ['get_many']
+
+
+@pytest.mark.django_db
+def test_menu_document_built_before_an_edit_is_not_served_after_it(api_client, create_menu,
+                                                                   django_capture_on_commit_callbacks):
+    restaurant = create_menu.restaurant
+    # Читатель промахнулся мимо кэша и собрал документ по старым строкам...
+    stale = menus.build_document(restaurant)
+    with django_capture_on_commit_callbacks(execute=True):
+        detail = MenuDetail.objects.get(menu=create_menu)
+        detail.price = 400
+        detail.save()
+    # ...и сохранил его уже после правки: под старой версией его никто не прочитает
+    menus.store_document(restaurant.pk, stale)
+    response = api_client.get(reverse('restaurant-menu', kwargs={'pk': restaurant.pk}))
+    assert response.data['menus'][0]['items'][0]['price'] == '400.00'
+
+
+@pytest.mark.django_db
+def test_restaurant_list_etag(api_client, create_restaurant, django_assert_num_queries,
+                              django_capture_on_commit_callbacks):
+    url = reverse('restaurant-list')
+    response = api_client.get(url)
+    etag = response['ETag']
+    with django_assert_num_queries(0):
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        create_restaurant.phone = "111"
+        create_restaurant.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_etag_depends_on_the_negotiated_renderer(api_client, create_restaurant):
+    url = reverse('restaurant-list')
+    response = api_client.get(url, HTTP_ACCEPT='application/json')
+    assert 'Accept' in response['Vary']
+    response = api_client.get(url, HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/html')
+    response = api_client.get(url, HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 304 and 'Accept' in response['Vary']
+
+
+@pytest.mark.django_db
+def test_payment_etag_covers_expanded_relations(create_authenticated_client, create_order, create_menu,
+                                                django_capture_on_commit_callbacks):
+    Payment.objects.create(order=create_order, amount=100, payment_method=Payment.CARD)
+    url = reverse('payment-list')
+    response = create_authenticated_client.get(url, {'expand': 'order'})
+    assert response.data['results'][0]['order']['details'] == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        OrderDetail.objects.create(order=create_order, dish=Dish.objects.get(slug='borscht'), quantity=1, price=350)
+    response = create_authenticated_client.get(url, {'expand': 'order'}, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 200
+    assert len(response.data['results'][0]['order']['details']) == 1
+
+
+@pytest.mark.django_db
+def test_inventory_last_modified(create_authenticated_client):
+    warehouse = Warehouse.objects.create(name="Main Warehouse", address="1 Storage St")
+    inventory = Inventory.objects.create(warehouse=warehouse, product=Product.objects.create(name="Salt", unit="KG"),
+                                         quantity=1)
+    url = reverse('inventory-detail', kwargs={'pk': inventory.pk})
+    response = create_authenticated_client.get(url)
+    assert response.status_code == 200
+    last_modified = response['Last-Modified']
+    response = create_authenticated_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 304
+    response = create_authenticated_client.get(reverse('inventory-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_payment_export(create_authenticated_client, create_order):
+    for day in (1, 2, 3):
+        Payment.objects.create(order=create_order, amount=100, payment_method=Payment.CARD,
+                               payment_time=timezone.make_aware(datetime(2025, 7, day, 12, 0)))
+    url = reverse('payment-export')
+    params = {'payment_time__gte': '2025-07-02T00:00:00+03:00'}
+    response = create_authenticated_client.get(url, params)
+    assert response.status_code == 200
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert lines[0] == 'id,order,amount,payment_method,transaction_id,payment_time,slug'
+    assert len(lines) == 3
+    assert lines[1].split(',')[1:3] == ['order-2025-07-18', '100.00']
+
+    response = create_authenticated_client.get(url, {**params, 'export_format': 'ndjson'})
+    records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert [record['payment_time'] for record in records] == ['2025-07-02T12:00:00+03:00', '2025-07-03T12:00:00+03:00']
+
+    response = create_authenticated_client.get(url, {'export_format': 'xml'})
+    assert response.status_code == 400
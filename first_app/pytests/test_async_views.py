@@ -0,0 +1,94 @@
+import json
+from datetime import date, time
+from decimal import Decimal
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from first_app import metrics
+from first_app.models import Restaurant, Table, Menu, Dish, MenuDetail, Modifier, Reservation
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def restaurant():
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1",
+                                           email="p@example.com")
+    tables = [Table.objects.create(restaurant=restaurant, table_number=number, capacity=2 + number % 3)
+              for number in range(1, 26)]
+    Reservation.objects.create(table=tables[0], reservation_date=date(2025, 7, 18), time=time(19, 0),
+                               number_of_guests=2)
+    menu = Menu.objects.create(restaurant=restaurant, name="Основное меню")
+    dish = Dish.objects.create(name="Борщ", category="Супы", base_price=Decimal('350.00'))
+    MenuDetail.objects.create(menu=menu, dish=dish, price=Decimal('390.00'))
+    Modifier.objects.create(name="Сметана", price_change=Decimal('40.00'), dish=dish)
+    Modifier.objects.create(name="Без лука", price_change=Decimal('0.00'))
+    return restaurant
+
+
+def get_both(settings, path, headers=None):
+    sync = APIClient().get(path, headers=headers)
+    settings.ROOT_URLCONF = 'first_app.async_urls'
+    try:
+        response = async_to_sync(AsyncClient().get)(path, headers=headers)
+    finally:
+        settings.ROOT_URLCONF = 'api_django.urls'
+    return sync, response
+
+
+def test_async_views_return_the_same_json(settings, restaurant):
+    table = Table.objects.get(restaurant=restaurant, table_number=3)
+    paths = [
+        f'/api/v1/restaurants/{restaurant.pk}/menu/',
+        '/api/v1/restaurants/999999/menu/',
+        f'/api/v1/tables/?restaurant__slug={restaurant.slug}&ordering=-capacity',
+        '/api/v1/tables/?page=2&page_size=10&status=FREE',
+        '/api/v1/tables/?fields=slug,capacity&expand=restaurant',
+        '/api/v1/tables/?page=9',
+        f'/api/v1/tables/{table.pk}/',
+        '/api/v1/tables/999999/',
+        f'/api/v1/tables/availability/?restaurant={restaurant.slug}&date=2025-07-18&time=18:00,21:30&guests=3',
+        '/api/v1/tables/availability/?restaurant=x&date=2025-07-18',
+    ]
+    for path in paths:
+        sync, response = get_both(settings, path)
+        # ViewSet вернул бы Response; обычный HttpResponse собирает только асинхронный путь
+        assert not isinstance(response, Response), path
+        assert response.status_code == sync.status_code, path
+        assert response['Content-Type'] == sync['Content-Type'], path
+        assert json.loads(response.content) == json.loads(sync.content), path
+
+
+def test_async_list_supports_conditional_get(settings, restaurant):
+    path = f'/api/v1/tables/?restaurant__slug={restaurant.slug}'
+    sync, response = get_both(settings, path)
+    assert response['ETag'] == sync['ETag']
+    _, cached = get_both(settings, path, {'If-None-Match': sync['ETag']})
+    assert cached.status_code == 304
+
+
+def test_writes_and_browsable_api_fall_back_to_the_viewset(settings, restaurant):
+    token = Token.objects.create(user=User.objects.create_user(username='host', password='secret'))
+    settings.ROOT_URLCONF = 'first_app.async_urls'
+    created = async_to_sync(AsyncClient().post)(
+        '/api/v1/tables/', {'restaurant': restaurant.slug, 'table_number': 40, 'capacity': 6},
+        content_type='application/json', headers={'Authorization': f'Token {token.key}'})
+    assert created.status_code == 201
+    assert Table.objects.filter(restaurant=restaurant, table_number=40).exists()
+
+    page = async_to_sync(AsyncClient().get)('/api/v1/tables/', headers={'Accept': 'text/html'})
+    assert page.status_code == 200 and page['Content-Type'].startswith('text/html')
+
+
+def test_async_requests_are_counted_in_metrics(settings, restaurant):
+    settings.METRICS_MULTIPROC_DIR = None
+    metrics.registry.reset()
+    get_both(settings, f'/api/v1/tables/?restaurant__slug={restaurant.slug}')
+    series = metrics.registry.snapshot()[('table-list', 'list', 'GET', '200')]
+    # Один синхронный запрос и один асинхронный, запросы к базе посчитаны у обоих
+    assert series['count'] == 2
+    assert series['queries_sum'] >= 4
@@ -0,0 +1,100 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from first_app import authentication, metrics
+
+
+@pytest.fixture
+def token(db):
+    return Token.objects.create(user=User.objects.create_user(username='waiter', password='pass'))
+
+
+@pytest.fixture
+def client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.mark.django_db
+def test_cached_token_skips_database(client, token, django_assert_max_num_queries):
+    url = reverse('inventory-list')
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.wsgi_request.auth_cache_tier == authentication.DATABASE
+
+    authentication.local_tokens.clear()
+    with django_assert_max_num_queries(3) as captured:
+        response = client.get(url)
+    assert response.wsgi_request.auth_cache_tier == authentication.SHARED
+    assert not [query for query in captured.captured_queries if 'authtoken_token' in query['sql']]
+    response = client.get(url)
+    assert response.wsgi_request.auth_cache_tier == authentication.LOCAL
+
+
+@pytest.mark.django_db
+def test_cache_hit_ratio_is_exported_to_metrics(client, settings):
+    settings.METRICS_MULTIPROC_DIR = None
+    metrics.registry.reset()
+    url = reverse('inventory-list')
+    client.get(url)
+    authentication.local_tokens.clear()
+    client.get(url)
+    client.get(url)
+    assert authentication.cache_stats() == {'local': 1, 'shared': 1, 'db': 1, 'total': 3, 'hit_ratio': 2 / 3}
+
+    body = client.get('/metrics').content.decode()
+    assert 'auth_token_cache_hits_total{tier="local"} 1' in body
+    assert 'auth_token_cache_hits_total{tier="shared"} 1' in body
+    assert 'auth_token_cache_misses_total 1' in body
+    metrics.registry.reset()
+
+
+@pytest.mark.django_db
+def test_shared_cache_holds_no_secrets(client, token, django_assert_num_queries):
+    assert client.get(reverse('inventory-list')).status_code == 200
+    cached = cache.get(authentication.token_key(token.key))
+    assert cached == {'id': token.user_id, 'username': 'waiter', 'is_active': True, 'is_staff': False,
+                      'is_superuser': False}
+
+    authentication.local_tokens.clear()
+    user, _ = authentication.CachedTokenAuthentication().authenticate_credentials(token.key)
+    assert (user.pk, user.is_authenticated, user.get_deferred_fields() >= {'password', 'email'}) == \
+        (token.user_id, True, True)
+    # Остальные поля дочитываются из БД при первом обращении
+    with django_assert_num_queries(1):
+        assert user.check_password('pass')
+
+
+@pytest.mark.django_db
+def test_logout_revokes_cached_token(client, token, django_capture_on_commit_callbacks):
+    assert client.get(reverse('inventory-list')).status_code == 200
+    with django_capture_on_commit_callbacks(execute=True):
+        assert client.post('/auth/token/logout/').status_code == 204
+    assert client.get(reverse('inventory-list')).status_code == 401
+
+
+@pytest.mark.django_db
+def test_deactivation_revokes_cached_token(client, token, django_capture_on_commit_callbacks):
+    assert client.get(reverse('inventory-list')).status_code == 200
+    with django_capture_on_commit_callbacks(execute=True):
+        User.objects.filter(pk=token.user_id).first().save(update_fields=['last_login'])
+    assert client.get(reverse('inventory-list')).wsgi_request.auth_cache_tier == authentication.LOCAL
+
+    user = token.user
+    user.is_active = False
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+    assert client.get(reverse('inventory-list')).status_code == 401
+
+
+def test_local_cache_is_bounded(settings):
+    settings.AUTH_TOKEN_LOCAL_SIZE = 2
+    tokens = authentication.LocalTokenCache()
+    for key in 'abc':
+        tokens.set(key, key.upper())
+    assert tokens.get('a') is None
+    assert tokens.get('c') == 'C'
@@ -0,0 +1,31 @@
+import pytest
+from django.conf import settings
+from first_app import benchmarks
+
+# Настоящие коммиты: обработчики transaction.on_commit выполняются и их запросы тоже попадают в бюджет
+pytestmark = pytest.mark.django_db(transaction=True)
+
+QUERY_ITERATIONS = 3
+
+
+def test_every_endpoint_has_a_budget():
+    baseline = benchmarks.load_baseline()
+    assert {scenario.name for scenario in benchmarks.SCENARIOS} <= baseline.keys()
+    assert len({name.split('-')[0] for name in baseline}) == 16
+
+
+def test_query_budgets():
+    context = benchmarks.seed(pool=QUERY_ITERATIONS + 1)
+    results = benchmarks.run(context, QUERY_ITERATIONS)
+    problems = benchmarks.regressions(results, benchmarks.load_baseline(), check_latency=False)
+    assert not problems, '\n'.join(problems)
+
+
+@pytest.mark.benchmark
+def test_latency_baselines():
+    context = benchmarks.seed(pool=settings.BENCHMARK_ITERATIONS + 1)
+    results = benchmarks.run(context, settings.BENCHMARK_ITERATIONS)
+    baseline = benchmarks.load_baseline()
+    print(benchmarks.format_report(results, baseline))
+    problems = benchmarks.regressions(results, baseline)
+    assert not problems, '\n'.join(problems)
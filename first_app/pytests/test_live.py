@@ -0,0 +1,151 @@
+import asyncio
+import json
+import threading
+from datetime import date, time
+from decimal import Decimal
+from time import monotonic
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from first_app import live
+from first_app.models import Restaurant, Table, Reservation, Order
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def restaurant():
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1",
+                                           email="p@example.com")
+    tables = [Table.objects.create(restaurant=restaurant, table_number=number, capacity=4) for number in (1, 2)]
+    Reservation.objects.create(table=tables[1], reservation_date=date(2025, 7, 18), time=time(19, 0),
+                               number_of_guests=2)
+    Order.objects.create(restaurant=restaurant, total_amount=Decimal('390.00'))
+    Order.objects.create(restaurant=restaurant, total_amount=Decimal('120.00'), status=Order.COMPLETED)
+    return restaurant
+
+
+@pytest.fixture
+def token():
+    return Token.objects.create(user=User.objects.create_user(username='host', password='secret')).key
+
+
+def parse(chunk):
+    chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+    fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n') if not line.startswith('retry'))
+    return fields['event'], json.loads(fields['data'])
+
+
+async def next_event(chunks):
+    return parse(await asyncio.wait_for(anext(chunks), 5))
+
+
+def test_stream_sends_snapshot_then_floor_and_kitchen_changes(settings, restaurant, token):
+    other = Restaurant.objects.create(name="Турандот", address="Тверской бульвар", phone="2", email="t@example.com")
+    other_table = Table.objects.create(restaurant=other, table_number=1, capacity=2)
+    table = Table.objects.get(restaurant=restaurant, table_number=1)
+    reservation = Reservation.objects.get()
+    order = Order.objects.get(status=Order.PENDING)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    async def scenario():
+        settings.ROOT_URLCONF = 'first_app.async_urls'
+        try:
+            response = await AsyncClient().get(
+                f'/api/v1/restaurants/{restaurant.pk}/live/',
+                headers={'Authorization': f'Token {token}', 'Accept': 'text/event-stream'})
+        finally:
+            settings.ROOT_URLCONF = 'api_django.urls'
+        assert response.status_code == 200 and response['Content-Type'] == 'text/event-stream'
+        chunks = aiter(response.streaming_content)
+        try:
+            event, snapshot = await next_event(chunks)
+            assert event == 'snapshot'
+            assert [row['table_number'] for row in snapshot['tables']] == [1, 2]
+            assert [row['id'] for row in snapshot['orders']] == [order.pk]
+
+            # Изменения чужого ресторана в поток не попадают
+            other_table.status = Table.OCCUPIED
+            await sync_to_async(other_table.save)()
+            await sync_to_async(client.post)(f'/api/v1/tables/{table.pk}/set_status/', {'status': Table.OCCUPIED},
+                                             format='json')
+            assert await next_event(chunks) == ('table.updated', {
+                'id': table.pk, 'slug': table.slug, 'table_number': 1, 'capacity': 4, 'status': Table.OCCUPIED})
+
+            await sync_to_async(client.post)(f'/api/v1/reservations/{reservation.pk}/cancel/')
+            event, data = await next_event(chunks)
+            assert (event, data['table_number'], data['status']) == ('table.updated', 2, Table.FREE)
+
+            created = await Order.objects.acreate(restaurant=restaurant, total_amount=Decimal('500.00'))
+            event, data = await next_event(chunks)
+            assert (event, data['id'], data['total_amount'], data['status']) == \
+                ('order.created', created.pk, '500.00', Order.PENDING)
+
+            await sync_to_async(client.post)(f'/api/v1/orders/{order.pk}/complete/')
+            event, data = await next_event(chunks)
+            assert (event, data['id'], data['status']) == ('order.updated', order.pk, Order.COMPLETED)
+        finally:
+            await chunks.aclose()
+
+    async_to_sync(scenario)()
+    # Отключившийся клиент снимает подписку
+    assert not live.hub.subscriptions
+
+
+def test_stream_requires_authentication(settings, restaurant):
+    settings.ROOT_URLCONF = 'first_app.async_urls'
+    response = async_to_sync(AsyncClient().get)(f'/api/v1/restaurants/{restaurant.pk}/live/',
+                                                headers={'Accept': 'text/event-stream'})
+    assert response.status_code == 401
+    assert parse(response.content)[0] == 'error'
+
+
+def test_idle_stream_pings_and_slow_client_is_disconnected(settings, restaurant):
+    settings.LIVE_EVENTS_HEARTBEAT_SECONDS = 0.01
+    settings.LIVE_EVENTS_QUEUE_SIZE = 2
+
+    async def scenario():
+        chunks = live.stream(restaurant.pk)
+        assert (await anext(chunks)).startswith('retry:')
+        assert await anext(chunks) == ': ping\n\n'
+        # Клиент не успевает читать: очередь переполнилась, поток закрывается, клиент переподключится
+        for number in range(3):
+            live.publish(restaurant.pk, 'table.updated', {'table_number': number})
+        await asyncio.sleep(0)
+        with pytest.raises(StopAsyncIteration):
+            await anext(chunks)
+        assert not live.hub.subscriptions
+
+    async_to_sync(scenario)()
+
+
+def test_redis_publish_does_not_block_the_request(settings, monkeypatch):
+    settings.LIVE_EVENTS_BACKEND = 'redis'
+    release = threading.Event()
+    published = []
+
+    class SlowRedis:
+        def publish(self, channel, message):
+            release.wait(5)
+            published.append(channel)
+
+    monkeypatch.setattr(live, 'redis_client', SlowRedis)
+    monkeypatch.setattr(live, 'publisher', live.Publisher())
+    start = monotonic()
+    for number in range(3):
+        live.publish(1, 'table.updated', {'table_number': number})
+    # Redis «завис», а изменивший стол запрос уже ответил
+    assert monotonic() - start < 1 and not published
+    release.set()
+    live.publisher.queue.join()
+    assert published == [live.channel(1)] * 3
+
+
+def test_publish_client_has_short_timeouts(settings, monkeypatch):
+    monkeypatch.setattr(live, '_client', None)
+    options = live.redis_client().connection_pool.connection_kwargs
+    assert options['socket_timeout'] == options['socket_connect_timeout'] == settings.LIVE_EVENTS_REDIS_TIMEOUT
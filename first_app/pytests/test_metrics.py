@@ -0,0 +1,93 @@
+import json
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from first_app import metrics
+from first_app.models import Restaurant
+
+
+@pytest.fixture(autouse=True)
+def registry(settings):
+    settings.METRICS_MULTIPROC_DIR = None
+    metrics.registry.reset()
+    yield metrics.registry
+    metrics.registry.reset()
+
+
+@pytest.mark.django_db
+def test_request_is_recorded_per_route_and_action():
+    Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1", email="p@example.com")
+    client = APIClient()
+    assert client.get(reverse('restaurant-list')).status_code == 200
+    assert client.get(reverse('restaurant-list')).status_code == 200
+
+    series = metrics.registry.snapshot()[('restaurant-list', 'list', 'GET', '200')]
+    assert series['count'] == 2
+    assert series['queries_sum'] >= 2
+    assert series['response_bytes'] > 0
+    assert sum(series['latency_buckets']) <= series['count']
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_renders_prometheus_text():
+    client = APIClient()
+    client.get(reverse('restaurant-list'))
+    response = client.get('/metrics')
+    assert response['Content-Type'].startswith('text/plain')
+    body = response.content.decode()
+    labels = 'route="restaurant-list",action="list",method="GET",status="200"'
+    assert f'http_request_duration_seconds_count{{{labels}}} 1' in body
+    assert f'http_request_db_queries_bucket{{{labels},le="+Inf"}} 1' in body
+    # Запрос к /metrics сам в метрики не попадает
+    assert 'route="metrics"' not in body
+
+
+def test_counting_cache_records_hits_and_misses(settings):
+    settings.CACHES = {'default': {'BACKEND': 'first_app.metrics.CountingLocMemCache'}}
+    stats = metrics.RequestStats()
+    token = metrics._current.set(stats)
+    try:
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        assert cache.get('b', 'default') == 'default'
+        assert cache.get_many(['a', 'b']) == {'a': 1}
+    finally:
+        metrics._current.reset(token)
+    assert (stats.cache_hits, stats.cache_misses) == (2, 2)
+
+
+def test_collect_merges_worker_snapshots(settings, tmp_path):
+    settings.METRICS_MULTIPROC_DIR = str(tmp_path)
+    labels = ('dish-list', 'list', 'GET', '200')
+    worker = metrics._empty_series()
+    worker.update(count=3, latency_sum=0.3, queries_sum=6)
+    worker['latency_buckets'][4] = 3
+    (tmp_path / '1.json').write_text(json.dumps({'series': [[list(labels), worker]], 'counters': []}))
+
+    stats = metrics.RequestStats()
+    stats.queries = 2
+    metrics.registry.observe(labels, 0.02, stats, 100)
+
+    total = metrics.registry.collect()[labels]
+    assert total['count'] == 4
+    assert total['queries_sum'] == 8
+    assert total['latency_buckets'][2] == 1 and total['latency_buckets'][4] == 3
+    assert any(path.name.endswith('.json') and path.name != '1.json' for path in tmp_path.iterdir())
+
+
+def test_metrics_route_follows_setting(settings):
+    assert reverse('metrics') == settings.METRICS_PATH
+
+
+def test_dead_worker_snapshot_is_removed(settings, tmp_path):
+    settings.METRICS_MULTIPROC_DIR = str(tmp_path)
+    labels = ['dish-list', 'list', 'GET', '200']
+    worker = metrics._empty_series()
+    worker['count'] = 3
+    (tmp_path / '1.json').write_text(json.dumps({'series': [[labels, worker]], 'counters': []}))
+    assert metrics.registry.collect()[tuple(labels)]['count'] == 3
+
+    metrics.mark_process_dead(1)
+    assert not metrics.registry.collect()
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,176 @@
+import pytest
+from datetime import date, time, timedelta
+from django.core import mail
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.core.mail.backends.locmem import EmailBackend
+from first_app import notifications, outbox
+from first_app.models import Restaurant, Table, Customer, Reservation, ReservationOutbox
+from first_app.tasks import send_reservation_notifications
+
+
+class FlakyBackend(EmailBackend):
+    """Отклоняет письма на заданные адреса и считает открытые соединения."""
+    opened = 0
+
+    def __init__(self, *args, broken=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.broken = set(broken)
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any(message.to[0] in self.broken for message in messages):
+            raise ConnectionError("Отказ сервера")
+        return super().send_messages(messages)
+
+
+@pytest.fixture
+def reservations(db):
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1", email="p@example.com")
+    table = Table.objects.create(restaurant=restaurant, table_number=1, capacity=4)
+    result = []
+    for number in range(3):
+        customer = Customer.objects.create(first_name="Гость", last_name=str(number), phone=str(number),
+                                           email=f"guest{number}@example.com")
+        result.append(Reservation.objects.create(table=table, customer=customer, reservation_date=date(2025, 7, 18),
+                                                 time=time(12 + number * 3), number_of_guests=2))
+    return result
+
+
+@pytest.mark.django_db
+def test_outbox_record_rolls_back_with_transaction(reservations):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            outbox.record(reservations[0].id, 'cancelled')
+            raise RuntimeError
+    outbox.record(reservations[1].id, 'cancelled')
+    assert list(ReservationOutbox.objects.values_list('reservation_id', flat=True)) == [reservations[1].id]
+
+
+def sender(sent, failing=()):
+    """deliver для dispatch: запоминает пачки, события броней из failing «не уходят»."""
+    def deliver(events):
+        sent.append(events)
+        return [event for event in events if event[0] in failing]
+    return deliver
+
+
+@pytest.mark.django_db
+def test_outbox_dispatch_keeps_order_and_coalesces():
+    for event in [(1, 'confirmed'), (2, 'confirmed'), (1, 'cancelled'), (3, 'confirmed'), (4, 'confirmed')]:
+        outbox.record(*event)
+    published = []
+    assert outbox.dispatch(sender(published), batch_size=3, max_batches=1) == 3
+    assert published == [[(2, 'confirmed'), (1, 'cancelled')]]
+    assert outbox.dispatch(sender(published), batch_size=3) == 2
+    assert published[1] == [(3, 'confirmed'), (4, 'confirmed')]
+    assert not ReservationOutbox.objects.exists()
+
+
+@pytest.mark.django_db
+def test_outbox_keeps_events_when_publish_fails():
+    outbox.record(1, 'confirmed')
+
+    def deliver(events):
+        raise ConnectionError("Почтовый сервер недоступен")
+
+    with pytest.raises(ConnectionError):
+        outbox.dispatch(deliver, batch_size=10)
+    assert ReservationOutbox.objects.count() == 1
+    published = []
+    assert outbox.dispatch(sender(published), batch_size=10) == 1
+    assert published == [[(1, 'confirmed')]]
+
+
+@pytest.mark.django_db
+def test_outbox_failed_event_holds_back_later_events_of_its_reservation(settings):
+    settings.RESERVATION_NOTIFY_RETRY_SECONDS = 60
+    for event in [(1, 'confirmed'), (2, 'confirmed'), (1, 'cancelled'), (3, 'confirmed')]:
+        outbox.record(*event)
+    published = []
+    # Письмо брони 1 не ушло: её «отменено» из следующей пачки остаётся ждать повтора
+    assert outbox.dispatch(sender(published, failing={1}), batch_size=2) == 2
+    assert published == [[(1, 'confirmed'), (2, 'confirmed')], [(3, 'confirmed')]]
+    assert list(ReservationOutbox.objects.values_list('reservation_id', 'action', 'attempts')) == [
+        (1, 'confirmed', 1), (1, 'cancelled', 0)]
+
+    # До срока повтора бронь 1 не отправляется вовсе
+    assert outbox.dispatch(sender(published), batch_size=2) == 0
+    assert len(published) == 2
+
+    ReservationOutbox.objects.update(retry_at=timezone.now() - timedelta(seconds=1))
+    assert outbox.dispatch(sender(published), batch_size=2) == 2
+    assert published[2] == [(1, 'cancelled')]
+    assert not ReservationOutbox.objects.exists()
+
+
+@pytest.mark.django_db
+def test_outbox_drops_event_after_max_attempts(settings):
+    settings.RESERVATION_NOTIFY_MAX_ATTEMPTS = 2
+    outbox.record(1, 'confirmed')
+    for attempt in range(2):
+        ReservationOutbox.objects.update(retry_at=None)
+        assert outbox.dispatch(sender([], failing={1}), batch_size=10) == 0
+    assert not ReservationOutbox.objects.exists()
+
+
+@pytest.mark.django_db
+def test_outbox_dispatch_stops_when_its_lease_is_taken_over():
+    for reservation_id in range(1, 6):
+        outbox.record(reservation_id, 'confirmed')
+    published = []
+
+    def deliver(events):
+        published.append(events)
+        # Пачка шла дольше LOCK_TIMEOUT: аренда истекла, и её занял другой проход
+        cache.set(outbox.LOCK_KEY, 42, outbox.LOCK_TIMEOUT)
+        return []
+
+    assert outbox.dispatch(deliver, batch_size=2) == 2
+    assert published == [[(1, 'confirmed'), (2, 'confirmed')]]
+    assert cache.get(outbox.LOCK_KEY) == 42
+    assert ReservationOutbox.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_outbox_dispatch_renews_its_lease_for_every_batch(monkeypatch):
+    for reservation_id in range(1, 6):
+        outbox.record(reservation_id, 'confirmed')
+    renewed = []
+    monkeypatch.setattr(outbox, 'renew', lambda token: renewed.append(token) or True)
+    assert outbox.dispatch(sender([]), batch_size=2) == 5
+    assert len(renewed) == 2 and len(set(renewed)) == 1
+    assert cache.get(outbox.LOCK_KEY) is None
+
+
+def test_outbox_lease_is_renewed_and_released_only_by_its_owner():
+    token = outbox.acquire()
+    assert token is not None and outbox.acquire() is None
+    assert not outbox.renew(token + 1) and not outbox.release(token + 1)
+    assert outbox.renew(token)
+    assert outbox.release(token)
+    assert cache.get(outbox.LOCK_KEY) is None
+
+
+@pytest.mark.django_db
+def test_deliver_batch_over_one_connection(reservations, django_assert_num_queries):
+    FlakyBackend.opened = 0
+    events = [(reservation.id, 'confirmed') for reservation in reservations] + [(0, 'confirmed')]
+    with django_assert_num_queries(1):
+        failed = notifications.deliver(events, connection=FlakyBackend(broken=['guest1@example.com']))
+    assert failed == [(reservations[1].id, 'confirmed')]
+    assert FlakyBackend.opened == 1
+    assert sorted(message.to[0] for message in mail.outbox) == ['guest0@example.com', 'guest2@example.com']
+    assert 'подтверждено' in mail.outbox[0].body
+
+
+@pytest.mark.django_db
+def test_queued_batch_task_returns_events_to_outbox(reservations):
+    events = [(reservation.id, 'cancelled') for reservation in reservations]
+    send_reservation_notifications.apply(args=(events,))
+    assert list(ReservationOutbox.objects.order_by('id').values_list('reservation_id', 'action')) == events
+    assert not mail.outbox
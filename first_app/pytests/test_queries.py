@@ -0,0 +1,111 @@
+import pytest
+from datetime import date, time
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from first_app.models import (
+    Restaurant, Table, Warehouse, Employee, Supplier, Product, Inventory,
+    Menu, Dish, MenuDetail, Modifier, Customer, Reservation, Order, OrderDetail, Payment
+)
+
+RESOURCES = [
+    'restaurant', 'table', 'warehouse', 'employee', 'supplier', 'product', 'inventory', 'menu',
+    'dish', 'menudetail', 'modifier', 'customer', 'reservation', 'order', 'orderdetail', 'payment',
+]
+
+
+def seed(start, count):
+    for i in range(start, start + count):
+        warehouse_manager = Employee.objects.create(first_name=f"Ware{i}", last_name="Boss", role="Manager",
+                                                    salary=30000)
+        restaurant = Restaurant.objects.create(name=f"Restaurant {i}", address="Street", phone="1",
+                                               email=f"r{i}@example.com")
+        restaurant.manager = Employee.objects.create(first_name=f"Boss{i}", last_name="Boss", role="Manager",
+                                                     restaurant=restaurant, salary=30000)
+        restaurant.save()
+        warehouse = Warehouse.objects.create(name=f"Warehouse {i}", address="Street", manager=warehouse_manager)
+        Employee.objects.create(first_name=f"Cook{i}", last_name="Cook", role="Cook", warehouse=warehouse,
+                                salary=30000)
+        table = Table.objects.create(restaurant=restaurant, table_number=1, capacity=4)
+        supplier = Supplier.objects.create(name=f"Supplier {i}", contact_person="Person", phone="1",
+                                           email=f"s{i}@example.com", address="Street")
+        product = Product.objects.create(name=f"Product {i}", unit=Product.UNIT_KG, supplier=supplier)
+        Inventory.objects.create(warehouse=warehouse, product=product, quantity=Decimal('10.00'))
+        menu = Menu.objects.create(restaurant=restaurant, name=f"Menu {i}")
+        dish = Dish.objects.create(name=f"Dish {i}", base_price=Decimal('100.00'))
+        MenuDetail.objects.create(menu=menu, dish=dish, price=Decimal('120.00'))
+        Modifier.objects.create(name=f"Sauce {i}", price_change=Decimal('10.00'), dish=dish)
+        customer = Customer.objects.create(first_name=f"Customer{i}", last_name="Smith", email=f"c{i}@example.com")
+        Reservation.objects.create(table=table, customer=customer, reservation_date=date(2025, 7, 18),
+                                   time=time(18, 0), number_of_guests=2)
+        order = Order.objects.create(restaurant=restaurant, customer=customer, total_amount=Decimal('240.00'))
+        for _ in range(2):
+            OrderDetail.objects.create(order=order, dish=dish, quantity=1, price=Decimal('120.00'))
+        Payment.objects.create(order=order, amount=Decimal('240.00'), payment_method=Payment.CARD)
+
+
+@pytest.fixture
+def staff_client(db):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='planner', password='testpass'))
+    return client
+
+
+def count_list_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, {'page_size': 100})
+    assert response.status_code == 200
+    return len(context.captured_queries), len(response.data['results'])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('resource', RESOURCES)
+def test_list_query_count_does_not_depend_on_page_size(staff_client, resource):
+    url = reverse(f'{resource}-list')
+    seed(0, 1)
+    queries_small, rows_small = count_list_queries(staff_client, url)
+    seed(1, 4)
+    queries_large, rows_large = count_list_queries(staff_client, url)
+    assert rows_large > rows_small
+    assert queries_large == queries_small
+
+
+@pytest.mark.django_db
+def test_order_list_renders_nested_details(staff_client):
+    seed(0, 2)
+    response = staff_client.get(reverse('order-list'))
+    assert response.status_code == 200
+    details = response.data['results'][0]['details']
+    assert len(details) == 2
+    assert details[0]['dish'] == Dish.objects.get(pk=OrderDetail.objects.get(pk=details[0]['id']).dish_id).slug
+
+
+@pytest.mark.django_db
+def test_sparse_fields_skip_unrequested_relations(staff_client):
+    seed(0, 2)
+    url = reverse('order-list')
+    with CaptureQueriesContext(connection) as context:
+        response = staff_client.get(url, {'fields': 'id,status'})
+    assert set(response.data['results'][0]) == {'id', 'status'}
+    sql = [query['sql'] for query in context.captured_queries]
+    assert not [query for query in sql if 'first_app_orderdetail' in query or 'first_app_customer' in query]
+    assert not [query for query in sql if '"first_app_order"."total_amount"' in query]
+
+    response = staff_client.get(url, {'fields': 'id,details.dish'})
+    assert [set(detail) for detail in response.data['results'][0]['details']] == [{'dish'}, {'dish'}]
+
+
+@pytest.mark.django_db
+def test_expand_nests_related_objects(staff_client):
+    seed(0, 1)
+    queries_small, _ = count_list_queries(staff_client, reverse('order-list') + '?expand=customer,details.dish')
+    seed(1, 3)
+    url = reverse('order-list') + '?expand=customer,details.dish'
+    queries_large, _ = count_list_queries(staff_client, url)
+    assert queries_large == queries_small
+    order = staff_client.get(url).data['results'][0]
+    assert order['customer']['email'] == Customer.objects.get(orders__id=order['id']).email
+    assert order['details'][0]['dish']['name'].startswith('Dish')
@@ -0,0 +1,69 @@
+import json
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db.models import Model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from first_app.models import Restaurant, Table, Menu, Dish, MenuDetail
+from first_app.readers import reader_for_serializer
+from first_app.serializers import DishSerializer, MenuDetailSerializer, TableSerializer
+
+
+@pytest.fixture
+def menu_rows(db):
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1", email="p@example.com")
+    menu = Menu.objects.create(restaurant=restaurant, name="Основное")
+    for i in range(300):
+        Table.objects.create(restaurant=restaurant, table_number=i + 1, capacity=2 + i % 4,
+                             status=Table.STATUS_CHOICES[i % 2][0])
+        dish = Dish.objects.create(name=f"Блюдо {i}", description=None if i % 3 else "Описание",
+                                   category="Суп" if i % 2 else None, base_price=Decimal('99.9') + i)
+        MenuDetail.objects.create(menu=menu, dish=dish, price=Decimal('120.5'), is_available=bool(i % 2))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('resource, params', [
+    ('dish', {}), ('table', {'ordering': 'capacity'}), ('menudetail', {'ordering': '-price'}),
+    ('dish', {'fields': 'name,base_price'}),
+])
+def test_fast_list_matches_model_serializer(menu_rows, resource, params, monkeypatch):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='reader', password='pass'))
+    url = reverse(f'{resource}-list')
+    params = {**params, 'page_size': 100, 'page': 2}
+    fast = client.get(url, params).content
+    monkeypatch.setattr('first_app.mixins.reader_for_serializer', lambda *args: None)
+    slow = client.get(url, params).content
+    assert fast == slow
+    assert len(json.loads(fast)['results']) == 100
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('serializer_class', [DishSerializer, TableSerializer, MenuDetailSerializer])
+def test_fast_list_reads_rows_without_model_instances(menu_rows, serializer_class, monkeypatch,
+                                                      django_assert_num_queries):
+    queryset = serializer_class.Meta.model.objects.order_by('pk')
+    reader = reader_for_serializer(serializer_class)
+    created = []
+    init = Model.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created.append(type(self))
+        init(self, *args, **kwargs)
+    monkeypatch.setattr(Model, '__init__', counting_init)
+    with django_assert_num_queries(1):
+        rows = reader.render(reader.values(queryset))
+    assert len(rows) == 300 and created == []
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('serializer_class', [DishSerializer, TableSerializer, MenuDetailSerializer])
+def test_fast_list_is_faster(menu_rows, serializer_class, best_of):
+    queryset = serializer_class.Meta.model.objects.order_by('pk')
+    reader = reader_for_serializer(serializer_class)
+    related = [name for name in ('restaurant', 'menu', 'dish') if name in serializer_class().fields]
+    slow = best_of(5, lambda: serializer_class(queryset.select_related(*related), many=True).data)
+    fast = best_of(5, lambda: reader.render(reader.values(queryset)))
+    assert fast * 2 < slow
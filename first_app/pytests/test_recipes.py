@@ -0,0 +1,89 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+from first_app import recipes
+from first_app.models import (
+    Restaurant, Warehouse, Product, Inventory, Dish, Modifier, RecipeItem, Order, OrderDetail, StockMovement
+)
+
+
+@pytest.fixture
+def client(db):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='cook', password='pass'))
+    return client
+
+
+@pytest.fixture
+def kitchen(db):
+    warehouse = Warehouse.objects.create(name="Кухня", address="Тверская, 5")
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1",
+                                           email="p@example.com", warehouse=warehouse)
+    return restaurant, warehouse
+
+
+@pytest.fixture
+def recipe(db):
+    beets = Product.objects.create(name="Свёкла", unit=Product.UNIT_KG)
+    cream = Product.objects.create(name="Сметана", unit=Product.UNIT_KG)
+    borscht = Dish.objects.create(name="Борщ", base_price=300)
+    extra_cream = Modifier.objects.create(name="Двойная сметана", dish=borscht, price_change=50)
+    RecipeItem.objects.create(dish=borscht, product=beets, quantity=Decimal('0.150'))
+    RecipeItem.objects.create(dish=borscht, product=cream, quantity=Decimal('0.030'))
+    RecipeItem.objects.create(modifier=extra_cream, product=cream, quantity=Decimal('0.030'))
+    return borscht, extra_cream, beets, cream
+
+
+def make_order(restaurant, dish, lines, status=Order.PENDING):
+    order = Order.objects.create(restaurant=restaurant, total_amount=0, status=status)
+    for quantity, modifiers in lines:
+        OrderDetail.objects.create(order=order, dish=dish, quantity=quantity, price=300, modifiers=modifiers)
+    return order
+
+
+@pytest.mark.django_db
+def test_complete_deducts_ingredients(client, kitchen, recipe):
+    restaurant, warehouse = kitchen
+    borscht, extra_cream, beets, cream = recipe
+    order = make_order(restaurant, borscht, [(2, None), (1, [extra_cream.slug]), (3, None)])
+
+    response = client.post(reverse('order-complete', kwargs={'pk': order.pk}))
+    assert response.status_code == 200
+    assert Inventory.objects.get(warehouse=warehouse, product=beets).quantity == Decimal('-0.90')
+    assert Inventory.objects.get(warehouse=warehouse, product=cream).quantity == Decimal('-0.21')
+    assert StockMovement.objects.filter(reference=f"order:{order.pk}").count() == 2
+
+    order.refresh_from_db()
+    assert order.stock_deducted_at is not None
+    assert recipes.deduct_orders([order.pk]) == 0
+
+
+@pytest.mark.django_db
+def test_deferred_deduction_runs_in_batches(client, kitchen, recipe, settings):
+    settings.STOCK_DEDUCTION_DEFERRED = True
+    restaurant, warehouse = kitchen
+    borscht, _, beets, _ = recipe
+    orders = [make_order(restaurant, borscht, [(1, None)]) for _ in range(3)]
+    for order in orders:
+        client.post(reverse('order-complete', kwargs={'pk': order.pk}))
+    assert not Inventory.objects.exists()
+
+    assert recipes.deduct_pending(batch_size=2, max_batches=5) == 3
+    assert Inventory.objects.get(warehouse=warehouse, product=beets).quantity == Decimal('-0.45')
+    assert recipes.deduct_pending(batch_size=2, max_batches=5) == 0
+
+
+@pytest.mark.django_db
+def test_recipe_item_requires_dish_or_modifier(client, recipe):
+    borscht, extra_cream, beets, _ = recipe
+    url = reverse('recipeitem-list')
+    response = client.post(url, {'dish': borscht.slug, 'modifier': extra_cream.slug, 'product': beets.slug,
+                                 'quantity': '0.1'}, format='json')
+    assert response.status_code == 400
+    response = client.post(url, {'dish': borscht.slug, 'product': beets.slug, 'quantity': '0.1'}, format='json')
+    assert response.status_code == 400
+    response = client.post(url, {'modifier': extra_cream.slug, 'product': beets.slug, 'quantity': '0.1'},
+                           format='json')
+    assert response.status_code == 201
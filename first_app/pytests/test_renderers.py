@@ -0,0 +1,73 @@
+import datetime
+import io
+import pytest
+from decimal import Decimal
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from first_app import renderers
+from first_app.models import Restaurant, Dish, Order, OrderDetail, Payment
+from first_app.renderers import ORJSONParser, ORJSONRenderer
+from first_app.serializers import OrderSerializer, PaymentSerializer
+
+MIXED = {
+    'price': Decimal('120.50'),
+    'day': datetime.date(2025, 7, 18),
+    'utc': datetime.datetime(2025, 7, 18, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+    'local': timezone.make_aware(datetime.datetime(2025, 7, 18, 21, 30)),
+    'naive': datetime.datetime(2025, 7, 18, 21, 30),
+    'time': datetime.time(18, 0),
+    'text': "Борщ со сметаной",
+    1: [None, True, 1.5],
+}
+
+
+@pytest.fixture
+def payloads(db):
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1", email="p@example.com")
+    dish = Dish.objects.create(name="Борщ", base_price=300)
+    for i in range(200):
+        order = Order.objects.create(restaurant=restaurant, total_amount=Decimal('740.50') + i)
+        OrderDetail.objects.bulk_create([OrderDetail(order=order, dish=dish, quantity=j + 1, price=Decimal('370.25'),
+                                                     modifiers=['extra'] if j else None) for j in range(3)])
+        Payment.objects.create(order=order, amount=order.total_amount, payment_method=Payment.CARD,
+                               transaction_id=f"tx-{i}")
+    orders = OrderSerializer(Order.objects.prefetch_related('details__dish').select_related('restaurant'),
+                             many=True).data
+    payments = PaymentSerializer(Payment.objects.select_related('order'), many=True).data
+    return {'orders': orders, 'payments': payments}
+
+
+@pytest.mark.parametrize('data', [MIXED, [MIXED, {'nested': MIXED}], {}])
+def test_renderer_matches_json_renderer(data):
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_renderer_falls_back_without_orjson(monkeypatch):
+    monkeypatch.setattr(renderers, 'orjson', None)
+    assert ORJSONRenderer().render(MIXED) == JSONRenderer().render(MIXED)
+    assert ORJSONParser().parse(io.BytesIO(b'{"a": [1, 2]}')) == {'a': [1, 2]}
+
+
+def test_parser_matches_json_parser():
+    body = '{"price": "120.50", "items": [{"dish": "борщ", "quantity": 2}], "ratio": 0.1}'.encode()
+    assert ORJSONParser().parse(io.BytesIO(body)) == JSONParser().parse(io.BytesIO(body))
+    with pytest.raises(ParseError):
+        ORJSONParser().parse(io.BytesIO(b'{"price": NaN}'))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', ['orders', 'payments'])
+def test_renderer_matches_on_list_payloads(payloads, name):
+    pytest.importorskip('orjson')
+    assert ORJSONRenderer().render(payloads[name]) == JSONRenderer().render(payloads[name])
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', ['orders', 'payments'])
+def test_renderer_benchmark(payloads, name, best_of):
+    pytest.importorskip('orjson')
+    data = payloads[name]
+    assert best_of(5, lambda: ORJSONRenderer().render(data)) * 2 < best_of(5, lambda: JSONRenderer().render(data))
@@ -0,0 +1,146 @@
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+import pytest
+from django.conf import settings as django_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from django.utils import timezone
+from first_app import replicas, rollups, tasks
+from first_app.models import DailyRestaurantSales, Order, OrderDetail, Restaurant, RollupWatermark, Table
+
+
+@pytest.fixture
+def replica(settings):
+    settings.REPLICA_DATABASES = ['replica1']
+
+
+def write(sql='UPDATE "first_app_table" SET "status" = %s'):
+    # Как если бы primary выполнил запрос: сами соединения тестам без базы не нужны
+    replicas.track_writes(lambda *args: None, sql, [], False, {'connection': connections['default']})
+
+
+def serve(request, sql=None):
+    seen = {}
+
+    def view(request):
+        seen['read'] = router.db_for_read(Table)
+        if sql:
+            write(sql)
+            seen['after_write'] = router.db_for_read(Table)
+        return HttpResponse()
+    replicas.ReplicaRoutingMiddleware(view)(request)
+    return seen
+
+
+def test_safe_requests_read_from_replica_until_the_client_writes(replica):
+    factory = RequestFactory()
+    token = {'HTTP_AUTHORIZATION': 'Token first'}
+    assert serve(factory.get('/api/v1/tables/', **token))['read'] == 'replica1'
+    assert serve(factory.post('/api/v1/tables/', **token))['read'] == 'default'
+    # Запрос без записи (например, 400 на валидации) липкость не включает
+    assert serve(factory.get('/api/v1/tables/', **token))['read'] == 'replica1'
+    serve(factory.post('/api/v1/tables/', **token), sql='INSERT INTO "first_app_table" VALUES (%s)')
+
+    # Тот же токен читает свои записи с primary, остальные клиенты — по-прежнему с реплики
+    assert serve(factory.get('/api/v1/tables/', **token))['read'] == 'default'
+    assert serve(factory.get('/api/v1/tables/', HTTP_AUTHORIZATION='Token second'))['read'] == 'replica1'
+    assert serve(factory.get('/api/v1/tables/'))['read'] == 'replica1'
+
+    # Окно read-your-writes истекло
+    cache.clear()
+    assert serve(factory.get('/api/v1/tables/', **token))['read'] == 'replica1'
+
+
+def test_session_clients_and_writes_inside_get_stick_to_primary(replica):
+    factory = RequestFactory()
+    request = factory.get('/api/v1/tables/')
+    request.COOKIES[django_settings.SESSION_COOKIE_NAME] = 'session-key'
+    seen = serve(request, sql='SELECT "id" FROM "first_app_table" FOR UPDATE')
+    assert (seen['read'], seen['after_write']) == ('replica1', 'default')
+
+    request = factory.get('/api/v1/tables/')
+    request.COOKIES[django_settings.SESSION_COOKIE_NAME] = 'session-key'
+    assert serve(request)['read'] == 'default'
+
+
+def test_replica_and_primary_reads_blocks(replica):
+    assert router.db_for_read(Table) == 'default'
+    with replicas.replica_reads():
+        assert router.db_for_read(Table) == 'replica1'
+        with replicas.primary_reads():
+            assert router.db_for_read(Table) == 'default'
+        assert router.db_for_read(Table) == 'replica1'
+        assert router.db_for_write(Table) == 'default'
+        # Задачи аналитики остаются на реплике и после собственных записей
+        write()
+        assert router.db_for_read(Table) == 'replica1'
+    assert router.db_for_read(Table) == 'default'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sales_rollups_read_every_chunk_from_the_replica(replica, monkeypatch):
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1",
+                                           email="p@example.com")
+    start = timezone.make_aware(datetime(2025, 7, 18, 12, 0))
+    for day in range(5):
+        Order.objects.create(restaurant=restaurant, order_date=start + timedelta(days=day), total_amount=100)
+    RollupWatermark.objects.create(name=rollups.WATERMARK_NAME, value=start - timedelta(days=1))
+    # Пять пар (ресторан, день) на чанки по две: после DELETE первого чанка чтения не должны уйти на primary
+    monkeypatch.setattr(rollups, 'REFRESH_CHUNK', 2)
+    routed = []
+    db_for_read = replicas.ReplicaRouter.db_for_read
+
+    def spy(self, model, **hints):
+        routed.append((model, db_for_read(self, model, **hints)))
+        # Реплики в тестовой базе нет: решение роутера записываем, а читаем с default
+        return None
+    monkeypatch.setattr(replicas.ReplicaRouter, 'db_for_read', spy)
+
+    assert tasks.refresh_sales_rollups() == 5
+    order_reads = [alias for model, alias in routed if model in (Order, OrderDetail)]
+    assert len(order_reads) >= 6 and set(order_reads) == {'replica1'}
+    assert DailyRestaurantSales.objects.count() == 5
+
+
+def test_without_replicas_everything_uses_primary():
+    assert serve(RequestFactory().get('/api/v1/tables/'))['read'] == 'default'
+    with replicas.replica_reads():
+        assert router.db_for_read(Table) == 'default'
+
+
+REPLICAS = list(django_settings.REPLICA_DATABASES)
+
+
+@pytest.mark.skipif(not REPLICAS,
+                    reason="Нужны DATABASE_REPLICA_URLS, например sqlite:////tmp/replica.sqlite3")
+@pytest.mark.django_db(transaction=True, databases='__all__')
+def test_requests_are_served_by_replica_connections(settings):
+    settings.REPLICA_DATABASES = REPLICAS
+    token = Token.objects.create(user=User.objects.create_user(username='host', password='secret'))
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1",
+                                           email="p@example.com")
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def run(method, *args, **kwargs):
+        with ExitStack() as stack:
+            contexts = {alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                        for alias in ['default', *REPLICAS]}
+            response = getattr(client, method)(*args, **kwargs)
+        used = {alias for alias, context in contexts.items()
+                if any('first_app_table' in query['sql'] for query in context.captured_queries)}
+        return response, used
+
+    response, used = run('get', '/api/v1/tables/')
+    assert response.status_code == 200 and used and 'default' not in used
+    response, used = run('post', '/api/v1/tables/', {'restaurant': restaurant.slug, 'table_number': 1,
+                                                     'capacity': 4}, format='json')
+    assert response.status_code == 201 and used == {'default'}
+    response, used = run('get', '/api/v1/tables/')
+    assert response.data['count'] == 1 and used == {'default'}
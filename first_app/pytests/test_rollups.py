@@ -0,0 +1,112 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from first_app import rollups
+from first_app.models import (
+    Restaurant, Dish, Order, OrderDetail, DailyRestaurantSales, DailyDishSales, RollupWatermark
+)
+
+
+@pytest.fixture
+def restaurant(db):
+    return Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1", email="p@example.com")
+
+
+@pytest.fixture
+def dish(db):
+    return Dish.objects.create(name="Борщ", base_price=300)
+
+
+def make_order(restaurant, dish, when, quantity, price, status=Order.COMPLETED):
+    order = Order.objects.create(restaurant=restaurant, order_date=when, total_amount=quantity * price, status=status)
+    OrderDetail.objects.create(order=order, dish=dish, quantity=quantity, price=price)
+    return order
+
+
+@pytest.fixture
+def orders(restaurant, dish):
+    day = timezone.make_aware(datetime(2025, 7, 18, 12, 0))
+    return [
+        make_order(restaurant, dish, day, 2, 300),
+        make_order(restaurant, dish, day + timedelta(hours=3), 1, 300),
+        make_order(restaurant, dish, day + timedelta(hours=5), 4, 300, status=Order.CANCELLED),
+        make_order(restaurant, dish, day + timedelta(days=1), 1, 350),
+    ]
+
+
+@pytest.mark.django_db
+def test_rebuild_aggregates_days(orders, restaurant, dish):
+    call_command('rebuild_sales_rollups')
+    first, second = DailyRestaurantSales.objects.order_by('day')
+    assert (first.orders_count, first.cancelled_count, first.revenue) == (3, 1, Decimal('900.00'))
+    assert (second.orders_count, second.cancelled_count, second.revenue) == (1, 0, Decimal('350.00'))
+
+    dish_day = DailyDishSales.objects.get(dish=dish, day=first.day)
+    assert (dish_day.orders_count, dish_day.quantity, dish_day.cancelled_quantity, dish_day.revenue) == (
+        2, 3, 4, Decimal('900.00'))
+    assert RollupWatermark.objects.filter(name=rollups.WATERMARK_NAME).exists()
+
+
+@pytest.mark.django_db
+def test_refresh_changed_touches_only_changed_days(orders, restaurant, dish):
+    rollups.rebuild()
+    RollupWatermark.objects.update(value=timezone.now() + timedelta(hours=1))
+    assert rollups.refresh_changed() == 0
+
+    RollupWatermark.objects.update(value=timezone.now())
+    orders[0].status = Order.CANCELLED
+    orders[0].save()
+    OrderDetail.objects.create(order=orders[3], dish=dish, quantity=1, price=350)
+    assert rollups.refresh_changed() == 2
+
+    first, second = DailyRestaurantSales.objects.order_by('day')
+    assert (first.orders_count, first.cancelled_count, first.revenue) == (3, 2, Decimal('300.00'))
+    assert DailyDishSales.objects.get(day=second.day).quantity == 2
+
+
+@pytest.mark.django_db
+def test_order_delete_refreshes_its_day(orders, django_capture_on_commit_callbacks):
+    rollups.rebuild()
+    with django_capture_on_commit_callbacks(execute=True):
+        orders[3].delete()
+    assert DailyRestaurantSales.objects.count() == 1
+    assert DailyDishSales.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_moved_order_leaves_its_old_day(orders, django_capture_on_commit_callbacks):
+    rollups.rebuild()
+    RollupWatermark.objects.update(value=timezone.now())
+    with django_capture_on_commit_callbacks(execute=True):
+        orders[3].order_date -= timedelta(days=1)
+        orders[3].save()
+    # Старый день пересчитан сразу, новый — инкрементальным проходом
+    assert list(DailyRestaurantSales.objects.values_list('orders_count', flat=True)) == [3]
+    assert rollups.refresh_changed() == 1
+    day = DailyRestaurantSales.objects.get()
+    assert (day.orders_count, day.revenue) == (4, Decimal('1250.00'))
+    assert DailyDishSales.objects.get().quantity == 4
+
+
+@pytest.mark.django_db
+def test_analytics_endpoints(orders, restaurant, dish, django_assert_max_num_queries):
+    rollups.rebuild()
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='analyst', password='pass'))
+
+    with django_assert_max_num_queries(3):
+        response = client.get(reverse('dailyrestaurantsales-list'), {'restaurant__slug': restaurant.slug})
+    assert response.status_code == 200
+    assert [row['revenue'] for row in response.data['results']] == ['350.00', '900.00']
+
+    response = client.get(reverse('dailyrestaurantsales-summary'), {'day__lte': '2025-07-18'})
+    assert response.data == {'orders_count': 3, 'cancelled_count': 1, 'revenue': Decimal('900.00')}
+
+    response = client.get(reverse('dailydishsales-summary'))
+    assert response.data == [{'dish': dish.slug, 'orders_count': 3, 'quantity': 4, 'cancelled_quantity': 4,
+                              'revenue': Decimal('1250.00')}]
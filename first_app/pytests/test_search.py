@@ -0,0 +1,56 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+from first_app.models import Customer, Dish, Order, Restaurant
+from first_app.search import RankedSearchFilter
+
+
+@pytest.fixture
+def client(db):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='host', password='pass'))
+    return client
+
+
+@pytest.mark.django_db
+def test_dish_search_is_ranked(client):
+    Dish.objects.create(name="Суп дня", description="Борщ или солянка", base_price=250)
+    Dish.objects.create(name="Борщ", description="Со сметаной", base_price=300)
+    Dish.objects.create(name="Пельмени", base_price=350)
+    response = client.get(reverse('dish-list'), {'search': 'борщ'})
+    assert [dish['name'] for dish in response.data['results']] == ["Борщ", "Суп дня"]
+
+
+@pytest.mark.django_db
+def test_search_tolerates_typos(client):
+    Customer.objects.create(first_name="Екатерина", last_name="Смирнова", phone="1", email="k@example.com")
+    Customer.objects.create(first_name="Мирон", last_name="Смит", phone="2", email="m@example.com")
+    response = client.get(reverse('customer-list'), {'search': 'Смирнава'})
+    assert [customer['last_name'] for customer in response.data['results']] == ["Смирнова"]
+
+
+@pytest.mark.django_db
+def test_search_counts_every_match(client):
+    Dish.objects.bulk_create([Dish(name=f"Борщ {number}", slug=f"borsch-{number}", base_price=300)
+                              for number in range(1100)])
+    Dish.objects.create(name="Пельмени", base_price=350)
+    response = client.get(reverse('dish-list'), {'search': 'борщ'})
+    assert response.data['count'] == 1100
+
+
+@pytest.mark.django_db
+def test_search_through_foreign_key(client):
+    restaurant = Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1", email="p@example.com")
+    alice = Customer.objects.create(first_name="Алиса", last_name="Иванова", phone="1", email="a@example.com")
+    bob = Customer.objects.create(first_name="Борис", last_name="Петров", phone="2", email="b@example.com")
+    order = Order.objects.create(restaurant=restaurant, customer=alice, total_amount=100)
+    Order.objects.create(restaurant=restaurant, customer=bob, total_amount=200)
+    response = client.get(reverse('order-list'), {'search': 'Алиса'})
+    assert [row['id'] for row in response.data['results']] == [order.id]
+
+
+def test_unindexed_fields_fall_back_to_search_filter():
+    assert RankedSearchFilter.get_index_target(Dish, ['name', 'category']) is None
+    assert RankedSearchFilter.get_index_target(Order, ['customer__first_name', 'customer__last_name'])[0] == \
+        'customer__'
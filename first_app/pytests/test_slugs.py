@@ -0,0 +1,56 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from first_app.models import Restaurant, Employee, Table
+from first_app.slugs import bulk_create_with_slugs, transliterate_slug
+
+
+@pytest.fixture
+def restaurant(db):
+    return Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1", email="p@example.com")
+
+
+def test_transliteration_is_cached():
+    transliterate_slug.cache_clear()
+    assert transliterate_slug("Пушкин") == "pushkin"
+    transliterate_slug("Пушкин")
+    assert transliterate_slug.cache_info().hits == 1
+
+
+@pytest.mark.django_db
+def test_duplicate_names_get_numbered_slugs(restaurant):
+    first = Employee.objects.create(first_name="Иван", last_name="Петров", role="Повар", restaurant=restaurant,
+                                    salary=30000)
+    second = Employee.objects.create(first_name="Иван", last_name="Петров", role="Повар", restaurant=restaurant,
+                                     salary=30000)
+    assert first.slug == "ivan-petrov-pushkin"
+    assert second.slug == "ivan-petrov-pushkin-2"
+
+    first.role = "Шеф"
+    first.save()
+    assert first.slug == "ivan-petrov-pushkin"
+
+
+@pytest.mark.django_db
+def test_save_uses_loaded_foreign_key(restaurant):
+    table = Table(restaurant=restaurant, table_number=1, capacity=4)
+    with CaptureQueriesContext(connection) as context:
+        table.save()
+    assert table.slug == "pushkin-1"
+    assert not any('"first_app_restaurant"' in query['sql'] for query in context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_bulk_create_with_slugs(restaurant):
+    Table.objects.create(restaurant=restaurant, table_number=1, capacity=4)
+    tables = [Table(restaurant_id=restaurant.id, table_number=number, capacity=2) for number in (2, 3)]
+    employees = [Employee(first_name="Анна", last_name="Смирнова", role="Официант", restaurant_id=restaurant.id,
+                          salary=30000) for _ in range(3)]
+    with CaptureQueriesContext(connection) as context:
+        bulk_create_with_slugs(tables)
+        bulk_create_with_slugs(employees)
+    # по одному запросу на имена ресторанов, на занятые слаги и на вставку для каждой модели
+    assert len(context.captured_queries) == 6
+    assert [table.slug for table in tables] == ["pushkin-2", "pushkin-3"]
+    assert [employee.slug for employee in employees] == [
+        "anna-smirnova-pushkin", "anna-smirnova-pushkin-2", "anna-smirnova-pushkin-3"]
@@ -0,0 +1,97 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from first_app import stock
+from first_app.models import Warehouse, Product, Inventory, StockMovement, StockSnapshot
+
+
+@pytest.fixture
+def client(db):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='storekeeper', password='pass'))
+    return client
+
+
+@pytest.fixture
+def warehouses(db):
+    return (Warehouse.objects.create(name="Главный склад", address="Складская, 1"),
+            Warehouse.objects.create(name="Кухня", address="Тверская, 5"))
+
+
+@pytest.fixture
+def flour(db):
+    return Product.objects.create(name="Мука", unit=Product.UNIT_KG)
+
+
+def ledger_total(warehouse, product):
+    return StockMovement.objects.filter(warehouse=warehouse, product=product).aggregate(Sum('quantity'))[
+        'quantity__sum']
+
+
+@pytest.mark.django_db
+def test_movements_apply_increments(client, warehouses, flour):
+    main, kitchen = warehouses
+    data = [
+        {'kind': StockMovement.RECEIPT, 'warehouse': main.slug, 'product': flour.slug, 'quantity': '10'},
+        {'kind': StockMovement.TRANSFER, 'warehouse': main.slug, 'to_warehouse': kitchen.slug,
+         'product': flour.slug, 'quantity': '4'},
+        {'kind': StockMovement.CONSUMPTION, 'warehouse': kitchen.slug, 'product': flour.slug, 'quantity': '1.5'},
+    ]
+    response = client.post(reverse('inventory-movements'), data, format='json')
+    assert response.status_code == 201
+    assert len(response.data) == 4
+    assert Inventory.objects.get(warehouse=main, product=flour).quantity == Decimal('6.00')
+    assert Inventory.objects.get(warehouse=kitchen, product=flour).quantity == Decimal('2.50')
+    assert ledger_total(kitchen, flour) == Decimal('2.50')
+
+
+@pytest.mark.django_db
+def test_consumption_below_zero_is_rolled_back(client, warehouses, flour):
+    main, _ = warehouses
+    stock.record_movements(stock.movements_for(StockMovement.RECEIPT, main, flour, Decimal('1')))
+    data = [{'kind': StockMovement.CONSUMPTION, 'warehouse': main.slug, 'product': flour.slug, 'quantity': '2'}]
+    response = client.post(reverse('inventory-movements'), data, format='json')
+    assert response.status_code == 400
+    assert Inventory.objects.get(warehouse=main, product=flour).quantity == Decimal('1.00')
+    assert StockMovement.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_inventory_writes_are_journaled(client, warehouses, flour):
+    main, _ = warehouses
+    response = client.post(reverse('inventory-list'),
+                           {'warehouse': main.slug, 'product': flour.slug, 'quantity': '5'}, format='json')
+    assert response.status_code == 201
+    url = reverse('inventory-detail', kwargs={'pk': response.data['id']})
+    client.patch(url, {'quantity': '3'}, format='json')
+    assert ledger_total(main, flour) == Decimal('3.00')
+    client.post(reverse('inventory-bulk'), [{'warehouse': main.slug, 'product': flour.slug, 'quantity': '7'}],
+                format='json')
+    assert ledger_total(main, flour) == Decimal('7.00')
+    client.delete(url)
+    assert ledger_total(main, flour) == 0
+
+
+@pytest.mark.django_db
+def test_compaction_keeps_stock_at(client, warehouses, flour):
+    main, _ = warehouses
+    start = timezone.now() - timedelta(days=2)
+    for hours, quantity in ((0, 10), (1, -3), (30, 5)):
+        StockMovement.objects.create(warehouse=main, product=flour, kind=StockMovement.ADJUSTMENT,
+                                     quantity=quantity, created_at=start + timedelta(hours=hours))
+
+    assert stock.compact(start + timedelta(hours=2)) == 1
+    assert stock.compact(start + timedelta(hours=2)) == 0
+    call_command('compact_stock_ledger')
+    assert StockSnapshot.objects.order_by('taken_at').last().quantity == Decimal('12.00')
+
+    assert stock.stock_at(main.id, start + timedelta(hours=1)) == {flour.id: Decimal('7.00')}
+    assert stock.stock_at(main.id, start + timedelta(hours=3)) == {flour.id: Decimal('7.00')}
+    response = client.get(reverse('inventory-at'), {'warehouse': main.slug})
+    assert response.data['stock'] == {flour.slug: Decimal('12.00')}
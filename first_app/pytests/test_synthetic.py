@@ -0,0 +1,53 @@
+import pytest
+from datetime import date
+from django.core.management import CommandError, call_command
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from first_app import synthetic
+from first_app.models import Customer, Order, OrderDetail, Payment, Reservation, Restaurant
+
+TODAY = date(2025, 7, 18)
+
+
+def fingerprint():
+    return {
+        'counts': [model.objects.count() for model in synthetic.GENERATED_MODELS],
+        'orders': list(Order.objects.order_by('id').values_list('restaurant_id', 'customer_id', 'order_date',
+                                                                'total_amount', 'status', 'slug')),
+        'reservations': list(Reservation.objects.order_by('id').values_list('table_id', 'reservation_date', 'time',
+                                                                            'status')),
+    }
+
+
+@pytest.mark.django_db
+def test_generate_is_deterministic():
+    synthetic.generate(scale=0.01, seed=3, chunk_size=150, today=TODAY)
+    first = fingerprint()
+    for model in reversed(synthetic.GENERATED_MODELS):
+        model.objects.all().delete()
+    synthetic.generate(scale=0.01, seed=3, chunk_size=150, today=TODAY)
+    assert fingerprint() == first
+    assert first['counts'][synthetic.GENERATED_MODELS.index(Order)] == 1000
+
+
+@pytest.mark.django_db
+def test_generated_data_is_consistent():
+    synthetic.generate(scale=0.01, seed=5, chunk_size=400, today=TODAY)
+    for model in (Restaurant, Customer, Reservation, Order, Payment):
+        assert model.objects.values('slug').distinct().count() == model.objects.count()
+    line_total = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField())
+    totals = dict(OrderDetail.objects.values_list('order_id').annotate(total=Sum(line_total)))
+    assert all(totals[pk] == total for pk, total in Order.objects.values_list('id', 'total_amount'))
+    completed = Order.objects.filter(status=Order.COMPLETED)
+    assert Payment.objects.count() == completed.count()
+    assert not completed.filter(stock_deducted_at__isnull=True).exists()
+    # Вечерний пик загруженнее утренних часов
+    evening = Order.objects.filter(order_date__hour__in=[19, 20]).count()
+    assert evening > Order.objects.filter(order_date__hour__in=[11, 12]).count() * 2
+    assert Customer.objects.create(first_name="Новый", last_name="Гость").pk == Customer.objects.count()
+
+
+@pytest.mark.django_db
+def test_command_requires_empty_database():
+    Restaurant.objects.create(name="Пушкин", address="Тверской бульвар", phone="1", email="p@example.com")
+    with pytest.raises(CommandError):
+        call_command('generate_data', scale=0.01)
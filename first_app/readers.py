@@ -0,0 +1,107 @@
+import decimal
+from functools import lru_cache
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields as api_fields
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField, RelatedField, SlugRelatedField
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnList
+
+
+def _identity(value):
+    return value
+
+
+def _decimal_converter(field):
+    # Повторяет DecimalField.to_representation/quantize с заранее посчитанными экспонентой и контекстом
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is not None and output_format.lower() == api_fields.ISO_8601:
+        return lambda value: value.isoformat() if value else None
+    return field.to_representation
+
+
+def _converter(field):
+    if type(field) in (api_fields.IntegerField,):
+        return int
+    if type(field) in (api_fields.CharField, api_fields.SlugField, api_fields.EmailField):
+        return str
+    if type(field) is api_fields.BooleanField:
+        return field.to_representation
+    if type(field) is api_fields.DecimalField and field.decimal_places is not None and not field.localize and \
+            getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) and \
+            not getattr(field, 'normalize_output', False):
+        return _decimal_converter(field)
+    if type(field) is api_fields.DateField:
+        return _date_converter(field)
+    return field.to_representation
+
+
+def _compile_field(field, model):
+    """Путь для values_list() и функция преобразования значения либо None, если поле так не прочитать."""
+    if isinstance(field, (BaseSerializer, ManyRelatedField)) or len(field.source_attrs) != 1:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return None
+    if isinstance(field, SlugRelatedField):
+        return f"{model_field.name}__{field.slug_field}", _identity
+    if isinstance(field, PrimaryKeyRelatedField):
+        return (model_field.attname, _identity) if field.pk_field is None else None
+    if isinstance(field, RelatedField) or model_field.is_relation or not model_field.concrete:
+        return None
+    return model_field.attname, _converter(field)
+
+
+class RowReader:
+    """
+    Чтение списка без ModelSerializer: строки приходят из values_list() кортежами и превращаются
+    в словари заранее скомпилированными преобразователями. Результат совпадает с serializer.data.
+    """
+
+    def __init__(self, names, lookups, converters):
+        self.names = names
+        self.lookups = lookups
+        self.converters = converters
+
+    def values(self, queryset):
+        return queryset.values_list(*self.lookups)
+
+    def render(self, rows):
+        columns = list(zip(self.names, self.converters))
+        return ReturnList([
+            {name: None if value is None else convert(value) for (name, convert), value in zip(columns, row)}
+            for row in rows
+        ], serializer=None)
+
+
+@lru_cache(maxsize=256)
+def reader_for_serializer(serializer_class, fields=None, expand=None):
+    """RowReader для serializer_class (с учётом ?fields=/?expand=) или None, если есть поля, которые так не читаются."""
+    serializer = serializer_class(fields=fields, expand=expand) if fields or expand else serializer_class()
+    model = serializer.Meta.model
+    names, lookups, converters = [], [], []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        compiled = _compile_field(field, model)
+        if compiled is None:
+            return None
+        names.append(name)
+        lookups.append(compiled[0])
+        converters.append(compiled[1])
+    return RowReader(tuple(names), tuple(lookups), tuple(converters))
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+from . import stock
+from .models import Order, OrderDetail, RecipeItem, StockMovement
+
+CENTS = Decimal('0.01')
+
+
+def order_consumption(order_ids):
+    """
+    Расход продуктов по заказам: {(заказ, склад ресторана, продукт): количество}.
+    Рецепты блюд суммируются в SQL по всем позициям заказов, модификаторы (слаги в JSON) — в Python.
+    """
+    totals = defaultdict(Decimal)
+    dish_rows = RecipeItem.objects.filter(dish__order_details__order_id__in=order_ids).values_list(
+        'dish__order_details__order_id', 'dish__order_details__order__restaurant__warehouse_id', 'product_id',
+    ).annotate(total=Sum(F('quantity') * F('dish__order_details__quantity'),
+                         output_field=DecimalField(max_digits=14, decimal_places=3))).order_by()
+    for order_id, warehouse_id, product_id, total in dish_rows:
+        totals[order_id, warehouse_id, product_id] += total
+
+    lines = list(OrderDetail.objects.filter(order_id__in=order_ids, modifiers__isnull=False)
+                 .values_list('order_id', 'order__restaurant__warehouse_id', 'quantity', 'modifiers'))
+    slugs = {slug for *_, modifiers in lines for slug in modifiers}
+    recipes = defaultdict(list)
+    if slugs:
+        for slug, product_id, quantity in RecipeItem.objects.filter(modifier__slug__in=slugs) \
+                .values_list('modifier__slug', 'product_id', 'quantity'):
+            recipes[slug].append((product_id, quantity))
+    for order_id, warehouse_id, quantity, modifiers in lines:
+        for slug in modifiers:
+            for product_id, per_portion in recipes[slug]:
+                totals[order_id, warehouse_id, product_id] += per_portion * quantity
+    return totals
+
+
+def deduct_orders(order_ids=None, limit=None):
+    """
+    Списывает ингредиенты завершённых заказов (все или только order_ids) со складов их ресторанов.
+    Вся пачка уходит в журнал одним bulk_create и в Inventory одним UPDATE на 500 пар (склад, продукт).
+    Заказы блокируются с SKIP LOCKED и помечаются stock_deducted_at, поэтому повторно не списываются.
+    Заказы ресторанов без склада остаются в очереди до его назначения.
+    """
+    with transaction.atomic():
+        pending = Order.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+            status=Order.COMPLETED, stock_deducted_at__isnull=True, restaurant__warehouse__isnull=False)
+        if order_ids is not None:
+            pending = pending.filter(id__in=order_ids)
+        ids = list(pending.order_by('updated_at').values_list('id', flat=True)[:limit])
+        if not ids:
+            return 0
+        now = timezone.now()
+        movements = []
+        for (order_id, warehouse_id, product_id), total in sorted(order_consumption(ids).items()):
+            quantity = total.quantize(CENTS)
+            if quantity:
+                movements.append(StockMovement(warehouse_id=warehouse_id, product_id=product_id,
+                                               kind=StockMovement.CONSUMPTION, quantity=-quantity,
+                                               reference=f"order:{order_id}", created_at=now))
+        # Блюда уже приготовлены: расход фиксируется, даже если учётный остаток уходит в минус
+        stock.record_movements(movements, allow_negative=True)
+        Order.objects.filter(id__in=ids).update(stock_deducted_at=now)
+    return len(ids)
+
+
+def deduct_pending(batch_size, max_batches):
+    deducted = 0
+    for _ in range(max_batches):
+        batch = deduct_orders(limit=batch_size)
+        deducted += batch
+        if batch < batch_size:
+            break
+    return deducted
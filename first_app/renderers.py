@@ -0,0 +1,68 @@
+import json
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson не установлен — работают обычные JSONRenderer/JSONParser
+    orjson = None
+
+# Даты и время orjson отдаёт в default: формат (Z вместо +00:00, ошибка на aware time) как у DRF
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. Всё, что orjson не кодирует сам (Decimal, даты, lazy-строки, QuerySet),
+    проходит через JSONEncoder.default из DRF, поэтому ответ совпадает с JSONRenderer байт в байт.
+    С отступами (?indent / Accept: ...; indent=) и без orjson работает как JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if orjson is None or data is None or self.ensure_ascii or \
+                self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        # Как и JSONRenderer, экранируем разделители строк, которые ломают JSONP/JS
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser на orjson; без orjson работает как JSONParser."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            body = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    text/event-stream для потоков SSE (first_app.live). Сам поток отдаёт StreamingHttpResponse, через
+    рендерер проходят только ошибки до его начала (401, 404) — кадром event: error.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return f"event: error\ndata: {json.dumps(data, cls=JSONEncoder, ensure_ascii=False)}\n\n".encode()
@@ -0,0 +1,178 @@
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Куда читать в текущем запросе или задаче; вне их (миграции, shell, обычные задачи) всё идёт на primary
+_state = contextvars.ContextVar('database_routing', default=None)
+
+
+class RoutingState:
+    __slots__ = ('replica', 'primary', 'wrote', 'sticky')
+
+    def __init__(self, replica, sticky=True):
+        self.replica = replica
+        self.primary = replica is None
+        self.wrote = False
+        # Переходить ли на primary после первой записи (read-your-writes)
+        self.sticky = sticky
+
+
+def _pick_replica():
+    replicas = settings.REPLICA_DATABASES
+    return random.choice(replicas) if replicas else None
+
+
+def is_write(sql):
+    return sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE') or ' FOR UPDATE' in sql \
+        or ' FOR NO KEY UPDATE' in sql
+
+
+def track_writes(execute, sql, params, many, context):
+    # Признак записи — сам SQL на primary: db_for_write Django вызывает и без записи (например, в __init__ модели)
+    state = _state.get()
+    if state is not None and not state.wrote and context['connection'].alias == DEFAULT_DB_ALIAS and is_write(sql):
+        state.wrote = True
+    return execute(sql, params, many, context)
+
+
+def install_write_tracker(connection, **kwargs):
+    """Обработчик connection_created; как и счётчик first_app.metrics, ставится первым в execute_wrappers."""
+    if track_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, track_writes)
+
+
+class ReplicaRouter:
+    """
+    Чтения запроса или задачи — на реплику, выбранную в ReplicaRoutingMiddleware/replica_reads,
+    запись — всегда на primary. Внутри транзакции и (в запросе) после первой записи primary читает тоже:
+    иначе запрос не увидел бы собственные изменения. Миграции на реплики не выполняются.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.primary or (state.wrote and state.sticky) or \
+                connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплики приносит репликация
+        return False if db in settings.REPLICA_DATABASES else None
+
+
+@contextmanager
+def replica_reads():
+    """
+    Чтения внутри блока — с реплики (для фоновых задач аналитики, которым не нужна свежесть до секунды),
+    в том числе после записей блока: такие задачи не перечитывают то, что записали сами.
+    """
+    token = _state.set(RoutingState(_pick_replica(), sticky=False))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Чтения внутри блока — с primary. Для всего, что кладёт прочитанное в общий кэш (меню, индекс
+    доступности, токены): данные с отстающей реплики остались бы в кэше надолго.
+    """
+    state = _state.get()
+    if state is None or state.primary:
+        yield
+        return
+    state.primary = True
+    try:
+        yield
+    finally:
+        state.primary = False
+
+
+def sticky_key(credentials):
+    return f"replicas:sticky:{hashlib.sha256(credentials.encode()).hexdigest()}"
+
+
+def client_keys(request, response=None):
+    """Ключи клиента для read-your-writes: токен (заголовок Authorization) и/или cookie сессии."""
+    keys = []
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        keys.append(sticky_key(authorization))
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        keys.append(sticky_key(session))
+    # После входа сессия получает новый ключ: липкость нужна и ему
+    cookie = response.cookies.get(settings.SESSION_COOKIE_NAME) if response is not None else None
+    if cookie is not None and cookie.value and cookie.value != session:
+        keys.append(sticky_key(cookie.value))
+    return keys
+
+
+class ReplicaRoutingMiddleware:
+    """
+    GET/HEAD/OPTIONS читают с реплики из REPLICA_DATABASES, остальные методы — с primary. Клиент, чей запрос
+    что-то записал, ещё READ_YOUR_WRITES_SECONDS читает с primary (отметка в общем кэше по токену или
+    сессии, поэтому её видят все воркеры). Без реплик ничего не делает.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        keys = client_keys(request)
+        sticky = request.method in SAFE_METHODS and keys and cache.get_many(keys)
+        state = RoutingState(None if request.method not in SAFE_METHODS or sticky else _pick_replica())
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            keys = client_keys(request, response)
+            if keys:
+                cache.set_many(dict.fromkeys(keys, 1), settings.READ_YOUR_WRITES_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return await self.get_response(request)
+        keys = client_keys(request)
+        sticky = request.method in SAFE_METHODS and keys and await cache.aget_many(keys)
+        state = RoutingState(None if request.method not in SAFE_METHODS or sticky else _pick_replica())
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            keys = client_keys(request, response)
+            if keys:
+                await cache.aset_many(dict.fromkeys(keys, 1), settings.READ_YOUR_WRITES_SECONDS)
+        return response
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from . import changes
+from .models import Order, OrderDetail, DailyRestaurantSales, DailyDishSales, RollupWatermark
+
+WATERMARK_NAME = 'sales'
+# Сколько пар (ресторан, день) пересчитывать за один проход
+REFRESH_CHUNK = 200
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+
+
+def _orders_filter(pairs, prefix=''):
+    lookup = Q()
+    for restaurant_id, day in pairs:
+        start, end = _day_bounds(day)
+        lookup |= Q(**{f"{prefix}restaurant_id": restaurant_id, f"{prefix}order_date__gte": start,
+                       f"{prefix}order_date__lt": end})
+    return lookup
+
+
+def refresh_days(pairs):
+    """
+    Пересчитывает агрегаты за пары (ресторан, день) целиком из заказов этих дней.
+    Дни считаются в часовом поясе проекта (TIME_ZONE).
+    """
+    pairs = sorted(set(pairs))
+    for start in range(0, len(pairs), REFRESH_CHUNK):
+        _refresh_chunk(pairs[start:start + REFRESH_CHUNK])
+    transaction.on_commit(lambda: changes.bump(DailyRestaurantSales, DailyDishSales))
+
+
+def _refresh_chunk(pairs):
+    # Агрегаты читаются до транзакции: внутри неё ReplicaRouter отправил бы чтение на primary
+    cancelled = Q(status=Order.CANCELLED)
+    restaurant_rows = list(Order.objects.filter(_orders_filter(pairs))
+                           .annotate(day=TruncDate('order_date')).values('restaurant_id', 'day')
+                           .annotate(orders_count=Count('id'), cancelled_count=Count('id', filter=cancelled),
+                                     revenue=Sum('total_amount', filter=~cancelled)).order_by())
+
+    cancelled = Q(order__status=Order.CANCELLED)
+    dish_rows = list(OrderDetail.objects.filter(_orders_filter(pairs, prefix='order__'))
+                     .annotate(day=TruncDate('order__order_date')).values('order__restaurant_id', 'dish_id', 'day')
+                     .annotate(orders_count=Count('order_id', distinct=True, filter=~cancelled),
+                               sold=Sum('quantity', filter=~cancelled), returned=Sum('quantity', filter=cancelled),
+                               revenue=Sum(F('quantity') * F('price'), filter=~cancelled)).order_by())
+
+    days = Q()
+    for restaurant_id, day in pairs:
+        days |= Q(restaurant_id=restaurant_id, day=day)
+    with transaction.atomic():
+        # Удаляем и вставляем заново: день, где не осталось заказов, тоже должен исчезнуть
+        DailyRestaurantSales.objects.filter(days).delete()
+        DailyDishSales.objects.filter(days).delete()
+        DailyRestaurantSales.objects.bulk_create([
+            DailyRestaurantSales(restaurant_id=row['restaurant_id'], day=row['day'],
+                                 orders_count=row['orders_count'], cancelled_count=row['cancelled_count'],
+                                 revenue=row['revenue'] or 0)
+            for row in restaurant_rows
+        ])
+        DailyDishSales.objects.bulk_create([
+            DailyDishSales(restaurant_id=row['order__restaurant_id'], dish_id=row['dish_id'], day=row['day'],
+                           orders_count=row['orders_count'], quantity=row['sold'] or 0,
+                           cancelled_quantity=row['returned'] or 0, revenue=row['revenue'] or 0)
+            for row in dish_rows
+        ])
+
+
+def changed_days(since, until):
+    return Order.objects.filter(updated_at__gt=since, updated_at__lte=until) \
+        .annotate(day=TruncDate('order_date')).values_list('restaurant_id', 'day').distinct().order_by()
+
+
+def refresh_changed():
+    """
+    Инкрементальное обновление: пересчитываются только дни, в которых менялись заказы
+    после отметки. Отметка сдвигается назад на SALES_ROLLUP_OVERLAP_SECONDS, чтобы не потерять
+    заказы из транзакций, которые закоммитились позже, чем было записано их updated_at.
+    """
+    now = timezone.now()
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+    if watermark is None:
+        return rebuild()
+    since = watermark.value - timedelta(seconds=settings.SALES_ROLLUP_OVERLAP_SECONDS)
+    pairs = list(changed_days(since, now))
+    refresh_days(pairs)
+    watermark.value = now
+    watermark.save(update_fields=['value'])
+    return len(pairs)
+
+
+def rebuild():
+    now = timezone.now()
+    with transaction.atomic():
+        DailyRestaurantSales.objects.all().delete()
+        DailyDishSales.objects.all().delete()
+        pairs = list(Order.objects.annotate(day=TruncDate('order_date')).values_list('restaurant_id', 'day')
+                     .distinct().order_by())
+        refresh_days(pairs)
+        RollupWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'value': now})
+    return len(pairs)
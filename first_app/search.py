@@ -0,0 +1,215 @@
+import re
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Expression, F, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest
+from rest_framework.filters import SearchFilter
+
+# Наборы полей поиска, для которых есть индексы: {модель: [поля, ...]}. Ключ — model_name,
+# чтобы тем же списком пользовались миграции с историческими моделями
+SEARCH_INDEXES = {
+    'restaurant': [('name', 'address')],
+    'warehouse': [('name', 'address')],
+    'employee': [('first_name', 'last_name', 'role')],
+    'supplier': [('name', 'contact_person')],
+    'product': [('name',)],
+    'menu': [('name', 'description')],
+    'dish': [('name', 'description', 'category'), ('name',)],
+    'modifier': [('name',)],
+    'customer': [('first_name', 'last_name', 'email'), ('first_name', 'last_name')],
+    'payment': [('transaction_id',)],
+}
+
+
+def search_columns(model_name):
+    columns = []
+    for fields in SEARCH_INDEXES.get(model_name, ()):
+        columns += [field for field in fields if field not in columns]
+    return columns
+
+
+def search_vector(*fields):
+    return SearchVector(*fields, config=settings.SEARCH_CONFIG)
+
+
+def postgres_indexes(model_name):
+    """GIN-индексы по тем же выражениям to_tsvector, что строит фильтр, и триграммные индексы по колонкам."""
+    indexes = [GinIndex(search_vector(*fields), name=f"{model_name}_{'_'.join(f[:4] for f in fields)}_fts")
+               for fields in SEARCH_INDEXES[model_name]]
+    indexes += [GinIndex(fields=[column], opclasses=['gin_trgm_ops'], name=f"{model_name}_{column}_trgm")
+                for column in search_columns(model_name)]
+    return indexes
+
+
+def fts_table(db_table):
+    return f"{db_table}_fts"
+
+
+def trigram_table(db_table):
+    return f"{db_table}_trgm"
+
+
+FTS_TOKENIZE = 'unicode61 remove_diacritics 2'
+# Слова и их триграммы для поиска с опечатками на SQLite — по тем же правилам, что у pg_trgm:
+# слово дополняется двумя пробелами слева и одним справа
+WORD = re.compile(r'\w+')
+
+
+def trigrams(word):
+    padded = f"  {word.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def word_similarity(query, text):
+    """
+    Приближение word_similarity из pg_trgm: для каждого слова запроса — доля его триграмм,
+    найденных в самом похожем слове text; результат — среднее по словам запроса.
+    """
+    if not query or not text:
+        return 0.0
+    words = [trigrams(word) for word in WORD.findall(text)]
+    scores = []
+    for term in WORD.findall(query):
+        wanted = trigrams(term)
+        scores.append(max((len(wanted & word) / len(wanted) for word in words), default=0.0))
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def install_sqlite_functions(connection, **kwargs):
+    """Обработчик connection_created: word_similarity для триграммного поиска на SQLite."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('word_similarity', 2, word_similarity, deterministic=True)
+
+
+def sqlite_fts_sql(model_name, db_table, table=None, tokenize=FTS_TOKENIZE):
+    """FTS5-таблица с внешним содержимым и триггеры, которые держат её в согласии с таблицей модели."""
+    table, columns = table or fts_table(db_table), search_columns(model_name)
+    names = ', '.join(columns)
+    new = ', '.join(f"new.{column}" for column in columns)
+    old = ', '.join(f"old.{column}" for column in columns)
+    delete = f"INSERT INTO {table}({table}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE {table} USING fts5({names}, content='{db_table}', content_rowid='id', "
+        f"tokenize='{tokenize}')",
+        f"CREATE TRIGGER {table}_ai AFTER INSERT ON {db_table} BEGIN {insert} END",
+        f"CREATE TRIGGER {table}_ad AFTER DELETE ON {db_table} BEGIN {delete} END",
+        f"CREATE TRIGGER {table}_au AFTER UPDATE ON {db_table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {table}({table}) VALUES ('rebuild')",
+    ]
+
+
+def sqlite_fts_drop_sql(db_table, table=None):
+    table = table or fts_table(db_table)
+    return [f"DROP TRIGGER IF EXISTS {table}_{suffix}" for suffix in ('ai', 'ad', 'au')] + \
+        [f"DROP TABLE IF EXISTS {table}"]
+
+
+def sqlite_trigram_sql(model_name, db_table):
+    """Триграммная FTS5-таблица: по ней на SQLite отбираются кандидаты для поиска с опечатками."""
+    return sqlite_fts_sql(model_name, db_table, trigram_table(db_table), 'trigram')
+
+
+class FtsRank(Expression):
+    """-bm25 строки в FTS5-таблице (чем больше, тем лучше) или NULL, если строка не совпала."""
+    output_field = FloatField()
+
+    def __init__(self, table, match, pk):
+        super().__init__()
+        self.table, self.match, self.pk = table, match, pk
+
+    def get_source_expressions(self):
+        return [self.pk]
+
+    def set_source_expressions(self, exprs):
+        self.pk, = exprs
+
+    def as_sql(self, compiler, connection):
+        pk_sql, pk_params = compiler.compile(self.pk)
+        table = self.table
+        return f"(SELECT -bm25({table}) FROM {table} WHERE {table} MATCH %s AND rowid = {pk_sql})", \
+            [self.match, *pk_params]
+
+
+class RankedSearchFilter(SearchFilter):
+    """
+    Замена SearchFilter: вместо ILIKE '%q%' по каждому полю — полнотекстовый поиск по индексированному
+    to_tsvector плюс триграммное сходство слов (опечатки, части слов) на PostgreSQL; на SQLite — FTS5
+    с префиксным поиском и сходство слов по триграммам, кандидаты для которого отбирает триграммная FTS5-таблица.
+    Результаты упорядочены по релевантности (аннотация search_rank), ?ordering= её переопределяет.
+    Поля должны лежать в одной модели (своей или связанной через внешний ключ) и быть в SEARCH_INDEXES,
+    иначе используется обычный SearchFilter.
+    """
+    rank_annotation = 'search_rank'
+    # Порог сходства для опечаток на SQLite, как pg_trgm.word_similarity_threshold по умолчанию
+    sqlite_similarity_threshold = 0.6
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = self.get_search_terms(request)
+        if not search_fields or not terms:
+            return queryset
+        target = self.get_index_target(queryset.model, search_fields)
+        vendor = connections[queryset.db].vendor
+        if target is None or self.must_call_distinct(queryset, search_fields) or \
+                vendor not in ('postgresql', 'sqlite'):
+            return super().filter_queryset(request, queryset, view)
+        prefix, model, fields = target
+        if vendor == 'postgresql':
+            return self.postgres_search(queryset, prefix, fields, terms)
+        return self.sqlite_search(queryset, prefix, model, fields, terms)
+
+    @staticmethod
+    def get_index_target(model, search_fields):
+        paths = {field.rpartition('__')[0] for field in search_fields}
+        if len(paths) != 1 or any(field[0] in '^=@$' for field in search_fields):
+            return None
+        path = paths.pop()
+        for name in path.split('__') if path else ():
+            model = model._meta.get_field(name).related_model
+        fields = tuple(field.rpartition('__')[2] for field in search_fields)
+        if fields not in SEARCH_INDEXES.get(model._meta.model_name, ()):
+            return None
+        return (f"{path}__" if path else ''), model, fields
+
+    def postgres_search(self, queryset, prefix, fields, terms):
+        paths = [prefix + field for field in fields]
+        text = ' '.join(terms)
+        query = SearchQuery(text, search_type='websearch', config=settings.SEARCH_CONFIG)
+        similarities = [TrigramWordSimilarity(text, path) for path in paths]
+        similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        matches = Q(search_vector=query)
+        for path in paths:
+            matches |= Q(**{f"{path}__trigram_word_similar": text})
+        return queryset.alias(search_vector=search_vector(*paths)).filter(matches).annotate(
+            **{self.rank_annotation: SearchRank(search_vector(*paths), query) + similarity}
+        ).order_by(f"-{self.rank_annotation}", 'pk')
+
+    def sqlite_search(self, queryset, prefix, model, fields, terms):
+        db_table = model._meta.db_table
+        table, trigram = fts_table(db_table), trigram_table(db_table)
+        columns = f"{{{' '.join(fields)}}}"
+        # Каждое слово — префиксный запрос FTS5; кавычки экранируются удвоением
+        match = ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+        match = f"{columns} : ({match})"
+        pk = f"{prefix}pk"
+        # Совпадения отбираются и ранжируются подзапросами к FTS5, без выгрузки id в Python
+        matches = Q(**{f"{pk}__in": RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match])})
+        text = ' '.join(terms)
+        similarities = [Func(Value(text), F(prefix + field), function='word_similarity', output_field=FloatField())
+                        for field in fields]
+        similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        # Кандидаты с опечатками — строки, где встречается хотя бы одна триграмма слова запроса
+        candidates = sorted({gram for term in terms for word in WORD.findall(term.lower())
+                             for gram in (word[i:i + 3] for i in range(len(word) - 2))})
+        if candidates:
+            fuzzy = ' OR '.join(f'"{gram}"' for gram in candidates)
+            fuzzy = f"{columns} : ({fuzzy})"
+            matches |= Q(**{f"{pk}__in": RawSQL(f"SELECT rowid FROM {trigram} WHERE {trigram} MATCH %s", [fuzzy]),
+                            'search_similarity__gte': self.sqlite_similarity_threshold})
+        rank = Coalesce(FtsRank(table, match, F(pk)), Value(0.0)) + similarity
+        return queryset.alias(search_similarity=similarity).filter(matches) \
+            .annotate(**{self.rank_annotation: rank}).order_by(f"-{self.rank_annotation}", 'pk')
@@ -1,42 +1,99 @@
 from rest_framework import serializers
 from .models import (
     Restaurant, Table, Warehouse, Employee, Supplier, Product, Inventory,
-    Menu, Dish, MenuDetail, Modifier, Customer, Reservation, Order, OrderDetail, Payment
+    Menu, Dish, MenuDetail, Modifier, Customer, Reservation, Order, OrderDetail, Payment,
+    DailyRestaurantSales, DailyDishSales, StockMovement, RecipeItem
 )
 from rest_framework.serializers import (
     ModelSerializer, CharField, SlugRelatedField, PrimaryKeyRelatedField,
-    DecimalField, IntegerField, DateField, TimeField, DateTimeField, JSONField, BooleanField
+    DecimalField, IntegerField, DateField, TimeField, DateTimeField, JSONField, BooleanField, ListSerializer
 )
 from django.core.exceptions import ValidationError
+from .availability import has_conflict
+
+
+def parse_selection(value):
+    """'id,details.dish' -> {'id': {}, 'details': {'dish': {}}}; уже разобранное дерево возвращается как есть."""
+    if not value or isinstance(value, dict):
+        return value or None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class SparseFieldsMixin:
+    """
+    Выбор полей ответа: ?fields=id,status,details.dish оставляет только перечисленные поля
+    (вложенные — через точку), ?expand=customer,details.dish заменяет слаг связи вложенным объектом
+    из Meta.expandable_fields. Параметры читает сериализатор верхнего уровня и только на GET/HEAD;
+    QuerysetPlanMixin строит запрос по уже урезанному набору полей.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.selected_fields = parse_selection(fields)
+        self.expanded_fields = parse_selection(expand)
+        super().__init__(*args, **kwargs)
+
+    def get_selection(self):
+        if self.selected_fields is not None or self.expanded_fields is not None:
+            return self.selected_fields, self.expanded_fields or {}
+        top_level = self.parent is None or (isinstance(self.parent, ListSerializer) and self.parent.parent is None)
+        request = self.context.get('request') if top_level else None
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None, {}
+        return parse_selection(request.query_params.get('fields')), \
+            parse_selection(request.query_params.get('expand')) or {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected, expanded = self.get_selection()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in expanded.keys() & expandable.keys():
+            fields[name] = expandable[name](read_only=True)
+        if selected is not None:
+            fields = {name: field for name, field in fields.items() if name in selected or name in expanded}
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(nested, SparseFieldsMixin):
+                nested.selected_fields = (selected or {}).get(name) or None
+                nested.expanded_fields = expanded.get(name) or {}
+        return fields
+
+
+class RestaurantSerializer(SparseFieldsMixin, ModelSerializer):
+    warehouse = SlugRelatedField(slug_field='slug', queryset=Warehouse.objects.all(), required=False, allow_null=True)
 
-
-class RestaurantSerializer(ModelSerializer):
     class Meta:
         model = Restaurant
-        fields = ['id', 'name', 'address', 'phone', 'email', 'manager', 'slug']
+        fields = ['id', 'name', 'address', 'phone', 'email', 'manager', 'warehouse', 'slug']
 
 
-class TableSerializer(ModelSerializer):
+class TableSerializer(SparseFieldsMixin, ModelSerializer):
     restaurant = SlugRelatedField(slug_field='slug', queryset=Restaurant.objects.all())
 
     class Meta:
         model = Table
         fields = ['id', 'restaurant', 'table_number', 'capacity', 'status', 'slug']
+        expandable_fields = {'restaurant': RestaurantSerializer}
 
 
-class WarehouseSerializer(ModelSerializer):
+class WarehouseSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Warehouse
         fields = ['id', 'name', 'address', 'manager', 'slug']
 
 
-class EmployeeSerializer(ModelSerializer):
+class EmployeeSerializer(SparseFieldsMixin, ModelSerializer):
     restaurant = SlugRelatedField(slug_field='slug', queryset=Restaurant.objects.all(), required=False, allow_null=True)
     warehouse = SlugRelatedField(slug_field='slug', queryset=Warehouse.objects.all(), required=False, allow_null=True)
 
     class Meta:
         model = Employee
         fields = ['id', 'first_name', 'last_name', 'role', 'restaurant', 'warehouse', 'hire_date', 'salary', 'slug']
+        expandable_fields = {'restaurant': RestaurantSerializer, 'warehouse': WarehouseSerializer}
 
     def validate(self, data):
         if data.get('restaurant') and data.get('warehouse'):
@@ -44,99 +101,178 @@ class EmployeeSerializer(ModelSerializer):
         return data
 
 
-class SupplierSerializer(ModelSerializer):
+class SupplierSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Supplier
         fields = ['id', 'name', 'contact_person', 'phone', 'email', 'address', 'slug']
 
 
-class ProductSerializer(ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, ModelSerializer):
     supplier = SlugRelatedField(slug_field='slug', queryset=Supplier.objects.all(), allow_null=True)
 
     class Meta:
         model = Product
         fields = ['id', 'name', 'unit', 'supplier', 'slug']
+        expandable_fields = {'supplier': SupplierSerializer}
 
 
-class InventorySerializer(ModelSerializer):
+class InventorySerializer(SparseFieldsMixin, ModelSerializer):
     warehouse = SlugRelatedField(slug_field='slug', queryset=Warehouse.objects.all())
     product = SlugRelatedField(slug_field='slug', queryset=Product.objects.all())
 
     class Meta:
         model = Inventory
         fields = ['id', 'warehouse', 'product', 'quantity', 'last_updated', 'slug']
+        expandable_fields = {'warehouse': WarehouseSerializer, 'product': ProductSerializer}
+
+
+class InventoryBulkItemSerializer(serializers.Serializer):
+    warehouse = serializers.SlugField()
+    product = serializers.SlugField()
+    quantity = DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
 
+class StockMovementSerializer(SparseFieldsMixin, ModelSerializer):
+    warehouse = SlugRelatedField(slug_field='slug', read_only=True)
+    product = SlugRelatedField(slug_field='slug', read_only=True)
 
-class MenuSerializer(ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'warehouse', 'product', 'kind', 'quantity', 'reference', 'created_at']
+        expandable_fields = {'warehouse': WarehouseSerializer, 'product': ProductSerializer}
+
+
+class StockMovementItemSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=StockMovement.KIND_CHOICES)
+    warehouse = serializers.SlugField()
+    product = serializers.SlugField()
+    to_warehouse = serializers.SlugField(required=False)
+    quantity = DecimalField(max_digits=10, decimal_places=2)
+    reference = CharField(max_length=100, required=False, allow_blank=True, default='')
+
+    def validate(self, data):
+        if data['kind'] == StockMovement.ADJUSTMENT:
+            if not data['quantity']:
+                raise serializers.ValidationError({'quantity': "Корректировка не может быть нулевой"})
+        elif data['quantity'] <= 0:
+            raise serializers.ValidationError({'quantity': "Количество должно быть положительным"})
+        if data['kind'] == StockMovement.TRANSFER:
+            if data.get('to_warehouse') in (None, data['warehouse']):
+                raise serializers.ValidationError({'to_warehouse': "Укажите другой склад назначения"})
+        elif 'to_warehouse' in data:
+            raise serializers.ValidationError({'to_warehouse': "Склад назначения нужен только для перемещения"})
+        return data
+
+
+class StockAtQuerySerializer(serializers.Serializer):
+    warehouse = serializers.SlugField()
+    at = DateTimeField(required=False)
+
+
+class MenuSerializer(SparseFieldsMixin, ModelSerializer):
     restaurant = SlugRelatedField(slug_field='slug', queryset=Restaurant.objects.all())
 
     class Meta:
         model = Menu
         fields = ['id', 'restaurant', 'name', 'description', 'start_date', 'end_date', 'slug']
+        expandable_fields = {'restaurant': RestaurantSerializer}
 
 
-class DishSerializer(ModelSerializer):
+class DishSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Dish
         fields = ['id', 'name', 'description', 'category', 'base_price', 'slug']
 
 
-class MenuDetailSerializer(ModelSerializer):
+class MenuDetailSerializer(SparseFieldsMixin, ModelSerializer):
     menu = SlugRelatedField(slug_field='slug', queryset=Menu.objects.all())
     dish = SlugRelatedField(slug_field='slug', queryset=Dish.objects.all())
 
     class Meta:
         model = MenuDetail
         fields = ['id', 'menu', 'dish', 'price', 'is_available']
+        expandable_fields = {'menu': MenuSerializer, 'dish': DishSerializer}
 
 
-class ModifierSerializer(ModelSerializer):
+class ModifierSerializer(SparseFieldsMixin, ModelSerializer):
     dish = SlugRelatedField(slug_field='slug', queryset=Dish.objects.all(), allow_null=True)
 
     class Meta:
         model = Modifier
         fields = ['id', 'name', 'price_change', 'dish', 'slug']
+        expandable_fields = {'dish': DishSerializer}
+
+
+class RecipeItemSerializer(SparseFieldsMixin, ModelSerializer):
+    dish = SlugRelatedField(slug_field='slug', queryset=Dish.objects.all(), required=False, allow_null=True)
+    modifier = SlugRelatedField(slug_field='slug', queryset=Modifier.objects.all(), required=False, allow_null=True)
+    product = SlugRelatedField(slug_field='slug', queryset=Product.objects.all())
+
+    class Meta:
+        model = RecipeItem
+        fields = ['id', 'dish', 'modifier', 'product', 'quantity']
+        expandable_fields = {'dish': DishSerializer, 'modifier': ModifierSerializer, 'product': ProductSerializer}
+        # Уникальность (блюдо или модификатор, продукт) проверяется в validate: одно из полей всегда пустое
+        validators = []
 
+    def validate(self, data):
+        dish = data.get('dish', self.instance.dish if self.instance else None)
+        modifier = data.get('modifier', self.instance.modifier if self.instance else None)
+        product = data.get('product', self.instance.product if self.instance else None)
+        if (dish is None) == (modifier is None):
+            raise ValidationError("Позиция рецепта относится либо к блюду, либо к модификатору.")
+        duplicates = RecipeItem.objects.filter(dish=dish, modifier=modifier, product=product)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise ValidationError("Этот продукт уже есть в рецепте.")
+        return data
 
-class CustomerSerializer(ModelSerializer):
+
+class CustomerSerializer(SparseFieldsMixin, ModelSerializer):
     class Meta:
         model = Customer
         fields = ['id', 'first_name', 'last_name', 'email', 'phone', 'address', 'slug']
 
 
-class ReservationSerializer(ModelSerializer):
+class ReservationSerializer(SparseFieldsMixin, ModelSerializer):
     table = SlugRelatedField(slug_field='slug', queryset=Table.objects.all())
     customer = SlugRelatedField(slug_field='slug', queryset=Customer.objects.all(), allow_null=True)
 
     class Meta:
         model = Reservation
         fields = ['id', 'table', 'customer', 'reservation_date', 'time', 'number_of_guests', 'status', 'slug']
+        expandable_fields = {'table': TableSerializer, 'customer': CustomerSerializer}
 
     def validate(self, data):
         table = data.get('table')
         reservation_date = data.get('reservation_date')
         time = data.get('time')
         if table and reservation_date and time:
-            conflicting_reservations = Reservation.objects.filter(
-                table=table,
-                reservation_date=reservation_date,
-                time=time,
-                status=Reservation.CONFIRMED
-            ).exclude(pk=self.instance.pk if self.instance else None)
-            if conflicting_reservations.exists():
+            # Конфликтом считается любая бронь, которая пересекается по времени рассадки
+            if has_conflict(table, reservation_date, time, exclude_pk=self.instance.pk if self.instance else None):
                 raise ValidationError("Стол уже забронирован на это время.")
         return data
 
 
-class OrderDetailSerializer(ModelSerializer):
+class AvailabilityQuerySerializer(serializers.Serializer):
+    restaurant = serializers.SlugField()
+    date = DateField()
+    time = serializers.ListField(child=TimeField(), min_length=1)
+    guests = IntegerField(min_value=1, default=1)
+    duration = IntegerField(min_value=1, required=False)
+
+
+class OrderDetailSerializer(SparseFieldsMixin, ModelSerializer):
     dish = SlugRelatedField(slug_field='slug', queryset=Dish.objects.all())
 
     class Meta:
         model = OrderDetail
         fields = ['id', 'order', 'dish', 'quantity', 'price', 'modifiers']
+        expandable_fields = {'dish': DishSerializer}
 
 
-class OrderSerializer(ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, ModelSerializer):
     restaurant = SlugRelatedField(slug_field='slug', queryset=Restaurant.objects.all())
     customer = SlugRelatedField(slug_field='slug', queryset=Customer.objects.all(), allow_null=True)
     details = OrderDetailSerializer(many=True, read_only=True)
@@ -144,14 +280,47 @@ class OrderSerializer(ModelSerializer):
     class Meta:
         model = Order
         fields = ['id', 'restaurant', 'customer', 'order_date', 'total_amount', 'status', 'slug', 'details']
+        expandable_fields = {'restaurant': RestaurantSerializer, 'customer': CustomerSerializer}
+
+
+class CartItemSerializer(serializers.Serializer):
+    dish = serializers.SlugField()
+    quantity = IntegerField(min_value=1)
+    modifiers = serializers.ListField(child=serializers.SlugField(), required=False, default=list)
 
 
-class PaymentSerializer(ModelSerializer):
+class PlaceOrderSerializer(serializers.Serializer):
+    restaurant = SlugRelatedField(slug_field='slug', queryset=Restaurant.objects.all())
+    customer = SlugRelatedField(slug_field='slug', queryset=Customer.objects.all(), allow_null=True, required=False)
+    items = CartItemSerializer(many=True, allow_empty=False)
+
+
+class PaymentSerializer(SparseFieldsMixin, ModelSerializer):
     order = SlugRelatedField(slug_field='slug', queryset=Order.objects.all())
 
     class Meta:
         model = Payment
         fields = ['id', 'order', 'amount', 'payment_method', 'transaction_id', 'payment_time', 'slug']
+        expandable_fields = {'order': OrderSerializer}
+
+
+class DailyRestaurantSalesSerializer(SparseFieldsMixin, ModelSerializer):
+    restaurant = SlugRelatedField(slug_field='slug', read_only=True)
+
+    class Meta:
+        model = DailyRestaurantSales
+        fields = ['restaurant', 'day', 'orders_count', 'cancelled_count', 'revenue']
+        expandable_fields = {'restaurant': RestaurantSerializer}
+
+
+class DailyDishSalesSerializer(SparseFieldsMixin, ModelSerializer):
+    restaurant = SlugRelatedField(slug_field='slug', read_only=True)
+    dish = SlugRelatedField(slug_field='slug', read_only=True)
+
+    class Meta:
+        model = DailyDishSales
+        fields = ['restaurant', 'dish', 'day', 'orders_count', 'quantity', 'cancelled_quantity', 'revenue']
+        expandable_fields = {'restaurant': RestaurantSerializer, 'dish': DishSerializer}
 
 
 """
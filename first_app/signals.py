@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from . import authentication, availability, changes, live, menus, rollups
+from .models import Restaurant, Table, Menu, Dish, MenuDetail, Modifier, Reservation, Order, OrderDetail
+from .slugs import RelatedValues
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_reservation_origin(sender, instance, **kwargs):
+    instance._availability_origin = None
+    if instance.pk is not None:
+        instance._availability_origin = Reservation.objects.filter(pk=instance.pk) \
+            .values_list('table__restaurant__slug', 'reservation_date').first()
+
+
+@receiver(post_save, sender=Reservation)
+def update_availability_on_save(sender, instance, **kwargs):
+    restaurant_slug = RelatedValues()(instance, 'table__restaurant__slug')
+    origin = getattr(instance, '_availability_origin', None)
+    day = instance.reservation_date
+
+    def apply():
+        if origin and origin != (restaurant_slug, day):
+            availability.invalidate_day(*origin)
+        availability.invalidate_day(restaurant_slug, day)
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Reservation)
+def update_availability_on_delete(sender, instance, **kwargs):
+    restaurant_slug = RelatedValues()(instance, 'table__restaurant__slug')
+    day = instance.reservation_date
+    transaction.on_commit(lambda: availability.invalidate_day(restaurant_slug, day))
+
+
+@receiver([post_save, post_delete], sender=Table)
+def invalidate_availability_tables(sender, instance, **kwargs):
+    restaurant_slug = RelatedValues()(instance, 'restaurant__slug')
+    transaction.on_commit(lambda: availability.invalidate_tables(restaurant_slug))
+
+
+def remember_menu_restaurants(sender, instance, **kwargs):
+    # При переносе блюда/меню в другой ресторан устаревает и старый документ
+    previous = sender._default_manager.filter(pk=instance.pk).first() if instance.pk is not None else None
+    instance._menu_restaurants = menus.affected_restaurants(previous) if previous else set()
+
+
+def bump_menu_versions_on_save(sender, instance, **kwargs):
+    restaurant_ids = menus.affected_restaurants(instance) | getattr(instance, '_menu_restaurants', set())
+    transaction.on_commit(lambda: menus.bump_versions(restaurant_ids))
+
+
+def bump_menu_versions_on_delete(sender, instance, **kwargs):
+    # pre_delete: после удаления блюда связи с меню уже не найти
+    restaurant_ids = menus.affected_restaurants(instance)
+    transaction.on_commit(lambda: menus.bump_versions(restaurant_ids))
+
+
+for menu_model in (Restaurant, Menu, MenuDetail, Dish, Modifier):
+    if menu_model is not Restaurant:
+        pre_save.connect(remember_menu_restaurants, sender=menu_model)
+    post_save.connect(bump_menu_versions_on_save, sender=menu_model)
+    pre_delete.connect(bump_menu_versions_on_delete, sender=menu_model)
+
+
+@receiver([post_save, post_delete])
+def bump_change_counter(sender, **kwargs):
+    if sender._meta.app_label == 'first_app':
+        transaction.on_commit(lambda: changes.bump(sender))
+
+
+@receiver([post_save, post_delete], sender=OrderDetail)
+def touch_order_for_rollups(sender, instance, **kwargs):
+    # Агрегаты продаж пересчитываются по Order.updated_at, поэтому правка позиции сдвигает время заказа
+    Order.objects.filter(pk=instance.order_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Table)
+def announce_table(sender, instance, **kwargs):
+    # set_status, отмена и завершение брони освобождают стол через save()
+    live.announce(instance.restaurant_id, 'table.updated', live.table_data(instance))
+
+
+@receiver(post_delete, sender=Table)
+def announce_table_delete(sender, instance, **kwargs):
+    live.announce(instance.restaurant_id, 'table.deleted', {'id': instance.pk})
+
+
+@receiver(post_save, sender=Order)
+def announce_order(sender, instance, created, **kwargs):
+    live.announce(instance.restaurant_id, 'order.created' if created else 'order.updated', live.order_data(instance))
+
+
+@receiver(post_delete, sender=Order)
+def announce_order_delete(sender, instance, **kwargs):
+    live.announce(instance.restaurant_id, 'order.deleted', {'id': instance.pk})
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_day(sender, instance, update_fields=None, **kwargs):
+    instance._rollup_origin = None
+    if instance.pk is not None and (update_fields is None or {'restaurant', 'order_date'} & set(update_fields)):
+        instance._rollup_origin = Order.objects.filter(pk=instance.pk) \
+            .values_list('restaurant_id', 'order_date').first()
+
+
+@receiver(post_save, sender=Order)
+def refresh_rollups_on_order_move(sender, instance, **kwargs):
+    # Перенесённый заказ инкрементальный проход найдёт только в новом дне — старый пересчитываем сразу
+    origin = getattr(instance, '_rollup_origin', None)
+    if origin is None:
+        return
+    day = (origin[0], timezone.localdate(origin[1]))
+    if day != (instance.restaurant_id, timezone.localdate(instance.order_date)):
+        transaction.on_commit(lambda: rollups.refresh_days([day]))
+
+
+@receiver(post_delete, sender=Order)
+def refresh_rollups_on_order_delete(sender, instance, **kwargs):
+    # Удалённый заказ инкрементальный проход уже не найдёт — пересчитываем его день сразу
+    day = (instance.restaurant_id, timezone.localdate(instance.order_date))
+    transaction.on_commit(lambda: rollups.refresh_days([day]))
+
+
+@receiver(post_delete, sender=Token)
+def revoke_cached_token(sender, instance, **kwargs):
+    # Выход через djoser удаляет токен; отзываем сразу и ещё раз после коммита, когда строки уже нет
+    authentication.invalidate([instance.key])
+    transaction.on_commit(lambda: authentication.invalidate([instance.key]))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_cached_user_tokens(sender, instance, update_fields=None, **kwargs):
+    # Вход обновляет только last_login — кэш от этого не устаревает
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    keys = list(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
+    authentication.invalidate(keys)
+    transaction.on_commit(lambda: authentication.invalidate(keys))
@@ -0,0 +1,152 @@
+import re
+from functools import lru_cache
+from django.db.models import Q
+from django.utils.text import slugify
+from transliterate import translit
+
+# Сколько базовых слагов проверять одним запросом при пакетном создании
+COLLISION_LOOKUP_CHUNK = 500
+
+
+@lru_cache(maxsize=4096)
+def transliterate_slug(text):
+    return slugify(translit(text, 'ru', reversed=True))
+
+
+class RelatedValues:
+    """
+    Значения полей связанных моделей для построения слагов (например 'table__restaurant__name').
+    Уже загруженные связи читаются из кэша объекта, остальные подгружаются пачкой через preload()
+    или одним запросом с join'ами, а не цепочкой ленивых загрузок.
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def __call__(self, obj, path):
+        name, _, rest = path.partition('__')
+        if not rest:
+            return getattr(obj, name)
+        field = obj._meta.get_field(name)
+        if field.is_cached(obj):
+            related = getattr(obj, name)
+            return None if related is None else self(related, rest)
+        pk = getattr(obj, field.attname)
+        if pk is None:
+            return None
+        known = self.values.setdefault((type(obj), path), {})
+        if pk not in known:
+            known[pk] = field.related_model._default_manager.filter(pk=pk).values_list(rest, flat=True).first()
+        return known[pk]
+
+    def preload(self, objs, paths):
+        for path in paths:
+            self._preload_path(objs, path)
+
+    def _preload_path(self, objs, path):
+        name, _, rest = path.partition('__')
+        if not rest or not objs:
+            return
+        model = type(objs[0])
+        field = model._meta.get_field(name)
+        cached, missing = [], set()
+        for obj in objs:
+            if field.is_cached(obj):
+                related = getattr(obj, name)
+                if related is not None:
+                    cached.append(related)
+            elif getattr(obj, field.attname) is not None:
+                missing.add(getattr(obj, field.attname))
+        self._preload_path(cached, rest)
+        known = self.values.setdefault((model, path), {})
+        missing -= known.keys()
+        if missing:
+            rows = field.related_model._default_manager.filter(pk__in=missing).values_list('pk', rest)
+            known.update(rows)
+
+
+def _slug_base(instance, related):
+    model = type(instance)
+    max_length = model._meta.get_field('slug').max_length
+    base = transliterate_slug(str(instance.slug_source(related)))
+    return base[:max_length].strip('-') or model._meta.model_name
+
+
+def _is_variant(slug, base):
+    return slug == base or re.fullmatch(rf"{re.escape(base)}-\d+", slug or '') is not None
+
+
+def _pick_slug(base, taken, max_length):
+    if base not in taken:
+        return base
+    number = 2
+    while True:
+        suffix = f"-{number}"
+        candidate = base[:max_length - len(suffix)] + suffix
+        if candidate not in taken:
+            return candidate
+        number += 1
+
+
+def taken_slugs(instance, base):
+    """
+    Занятые слаги, с которыми может совпасть base. Это queryset: его можно выполнить отдельно
+    или присоединить к другому запросу через UNION (см. orders.place_order).
+    """
+    return type(instance)._default_manager.filter(slug__startswith=base).exclude(pk=instance.pk)
+
+
+def slug_for(instance, base, taken):
+    """Уникальный слаг из base по уже прочитанному набору занятых слагов."""
+    return _pick_slug(base, set(taken), type(instance)._meta.get_field('slug').max_length)
+
+
+def unique_slug(instance, related=None):
+    """
+    Уникальный слаг для сохраняемого объекта. При совпадении с чужим слагом добавляет
+    суффикс -2, -3 и т.д. Если текущий слаг уже построен от тех же данных, база не проверяется.
+    """
+    base = _slug_base(instance, related or RelatedValues())
+    if instance.pk is not None and _is_variant(instance.slug, base):
+        return instance.slug
+    return slug_for(instance, base, taken_slugs(instance, base).values_list('slug', flat=True))
+
+
+def slug_base(instance, related=None):
+    return _slug_base(instance, related or RelatedValues())
+
+
+def assign_slugs(objs):
+    """
+    Проставляет уникальные слаги пачке новых объектов одной модели (для bulk_create).
+    Имена связанных объектов подгружаются пачкой, занятые слаги — одним запросом на 500 баз.
+    Объекты с уже заданным слагом не меняются.
+    """
+    objs = [obj for obj in objs if not obj.slug]
+    if not objs:
+        return
+    model = type(objs[0])
+    max_length = model._meta.get_field('slug').max_length
+    related = RelatedValues()
+    related.preload(objs, model.slug_related_paths)
+    bases = [_slug_base(obj, related) for obj in objs]
+
+    taken = set()
+    unique_bases = list(set(bases))
+    for start in range(0, len(unique_bases), COLLISION_LOOKUP_CHUNK):
+        lookup = Q()
+        for base in unique_bases[start:start + COLLISION_LOOKUP_CHUNK]:
+            lookup |= Q(slug__startswith=base)
+        taken.update(model._default_manager.filter(lookup).values_list('slug', flat=True))
+
+    for obj, base in zip(objs, bases):
+        obj.slug = _pick_slug(base, taken, max_length)
+        taken.add(obj.slug)
+
+
+def bulk_create_with_slugs(objs, batch_size=None, **kwargs):
+    objs = list(objs)
+    if not objs:
+        return objs
+    assign_slugs(objs)
+    return type(objs[0])._default_manager.bulk_create(objs, batch_size=batch_size, **kwargs)
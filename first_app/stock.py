@@ -0,0 +1,180 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Q, Sum, Value, When
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from . import changes
+from .models import Inventory, StockMovement, StockSnapshot
+from .slugs import assign_slugs
+
+# Сколько пар (склад, продукт) обрабатывать одним UPDATE
+PAIRS_CHUNK = 500
+
+
+def _pairs_filter(pairs):
+    lookup = Q()
+    for warehouse_id, product_id in pairs:
+        lookup |= Q(warehouse_id=warehouse_id, product_id=product_id)
+    return lookup
+
+
+def _chunks(items):
+    items = sorted(items)
+    for start in range(0, len(items), PAIRS_CHUNK):
+        yield items[start:start + PAIRS_CHUNK]
+
+
+def movements_for(kind, warehouse, product, quantity, reference='', to_warehouse=None):
+    """
+    Строки журнала для одной операции. Количество передаётся положительным (кроме корректировки),
+    знак определяется типом; перемещение даёт расход на исходном складе и приход на целевом.
+    """
+    if kind == StockMovement.RECEIPT:
+        signed = [(warehouse, quantity)]
+    elif kind == StockMovement.CONSUMPTION:
+        signed = [(warehouse, -quantity)]
+    elif kind == StockMovement.TRANSFER:
+        signed = [(warehouse, -quantity), (to_warehouse, quantity)]
+    else:
+        signed = [(warehouse, quantity)]
+    now = timezone.now()
+    return [StockMovement(warehouse=target, product=product, kind=kind, quantity=delta, reference=reference,
+                          created_at=now)
+            for target, delta in signed]
+
+
+def net_deltas(movements):
+    deltas = defaultdict(Decimal)
+    for movement in movements:
+        deltas[(movement.warehouse_id, movement.product_id)] += movement.quantity
+    return {pair: delta for pair, delta in deltas.items() if delta}
+
+
+def ensure_inventory(pairs):
+    """Создаёт недостающие строки Inventory с нулевым остатком, чтобы приращение было куда применить."""
+    existing = set()
+    for chunk in _chunks(pairs):
+        existing.update(Inventory.objects.filter(_pairs_filter(chunk)).values_list('warehouse_id', 'product_id'))
+    missing = [Inventory(warehouse_id=warehouse_id, product_id=product_id, quantity=0)
+               for warehouse_id, product_id in sorted(pairs) if (warehouse_id, product_id) not in existing]
+    if missing:
+        assign_slugs(missing)
+        # Строку мог только что создать параллельный запрос — тогда просто пропускаем её
+        Inventory.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def apply_deltas(deltas, allow_negative=False):
+    """
+    Применяет изменения остатков {(склад, продукт): приращение} одним UPDATE ... SET quantity = quantity + CASE
+    на каждые 500 пар. Остаток не читается в Python, поэтому параллельные записи не теряются.
+    """
+    ensure_inventory(deltas)
+    now = timezone.now()
+    for chunk in _chunks(deltas):
+        increment = Case(
+            *[When(warehouse_id=warehouse_id, product_id=product_id, then=Value(deltas[warehouse_id, product_id]))
+              for warehouse_id, product_id in chunk],
+            output_field=DecimalField(max_digits=10, decimal_places=2))
+        Inventory.objects.filter(_pairs_filter(chunk)).update(quantity=F('quantity') + increment, last_updated=now)
+    if not allow_negative:
+        check_not_negative([pair for pair, delta in deltas.items() if delta < 0])
+
+
+def check_not_negative(pairs):
+    # Проверка после UPDATE: строки уже заблокированы, откат транзакции отменит всё движение целиком
+    short = []
+    for chunk in _chunks(pairs):
+        short += Inventory.objects.filter(_pairs_filter(chunk), quantity__lt=0) \
+            .values_list('warehouse__slug', 'product__slug')
+    if short:
+        raise ValidationError({'quantity': [f"Недостаточно остатка: {product} на складе {warehouse}"
+                                            for warehouse, product in sorted(short)]})
+
+
+def record_movements(movements, apply=True, allow_negative=False):
+    """
+    Дописывает движения в журнал и (если apply) применяет их к Inventory в одной транзакции.
+    apply=False нужен, когда остаток уже записан напрямую и в журнал идёт только разница;
+    allow_negative — когда расход уже случился и отказать в нём нельзя (списание по рецептам).
+    """
+    movements = list(movements)
+    if not movements:
+        return movements
+    with transaction.atomic():
+        if apply:
+            apply_deltas(net_deltas(movements), allow_negative)
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+        transaction.on_commit(lambda: changes.bump(Inventory, StockMovement))
+    return movements
+
+
+def locked_quantities(pairs):
+    """Текущие остатки пар под блокировкой строк — для корректировок «установить остаток»."""
+    quantities = {}
+    for chunk in _chunks(pairs):
+        rows = Inventory.objects.select_for_update().filter(_pairs_filter(chunk)) \
+            .values_list('warehouse_id', 'product_id', 'quantity')
+        quantities.update(((warehouse_id, product_id), quantity) for warehouse_id, product_id, quantity in rows)
+    return quantities
+
+
+def adjustments(targets, current, reference=''):
+    """Корректировки, переводящие остатки current в targets: {(склад, продукт): количество}."""
+    now = timezone.now()
+    return [StockMovement(warehouse_id=warehouse_id, product_id=product_id, kind=StockMovement.ADJUSTMENT,
+                          quantity=quantity - current.get((warehouse_id, product_id), 0), reference=reference,
+                          created_at=now)
+            for (warehouse_id, product_id), quantity in targets.items()
+            if quantity != current.get((warehouse_id, product_id), 0)]
+
+
+def stock_at(warehouse_id, at, product_ids=None):
+    """
+    Остатки склада на момент at: последний снимок не позже at плюс движения после него.
+    Снимки делаются для всех пар сразу, поэтому читается не больше одного интервала журнала.
+    """
+    snapshots = StockSnapshot.objects.filter(warehouse_id=warehouse_id, taken_at__lte=at)
+    movements = StockMovement.objects.filter(warehouse_id=warehouse_id, created_at__lte=at)
+    if product_ids is not None:
+        snapshots = snapshots.filter(product_id__in=product_ids)
+        movements = movements.filter(product_id__in=product_ids)
+
+    balances = defaultdict(Decimal)
+    cutoff = snapshots.aggregate(Max('taken_at'))['taken_at__max']
+    if cutoff is not None:
+        balances.update(snapshots.filter(taken_at=cutoff).values_list('product_id', 'quantity'))
+        movements = movements.filter(created_at__gt=cutoff)
+    for product_id, total in movements.values_list('product_id').annotate(Sum('quantity')).order_by():
+        balances[product_id] += total
+    return dict(balances)
+
+
+def compact(cutoff=None):
+    """
+    Снимок остатков всех пар на момент cutoff (по умолчанию — сейчас минус STOCK_SNAPSHOT_LAG_SECONDS,
+    чтобы успели закоммититься транзакции с более ранним created_at). Считается от предыдущего
+    снимка, а не от начала журнала. Нулевые остатки не сохраняются: отсутствие строки означает ноль.
+    """
+    cutoff = cutoff or timezone.now() - timedelta(seconds=settings.STOCK_SNAPSHOT_LAG_SECONDS)
+    if StockSnapshot.objects.filter(taken_at__gte=cutoff).exists():
+        return 0
+    previous = StockSnapshot.objects.aggregate(Max('taken_at'))['taken_at__max']
+
+    balances = defaultdict(Decimal)
+    movements = StockMovement.objects.filter(created_at__lte=cutoff)
+    if previous is not None:
+        balances.update(((warehouse_id, product_id), quantity) for warehouse_id, product_id, quantity in
+                        StockSnapshot.objects.filter(taken_at=previous)
+                        .values_list('warehouse_id', 'product_id', 'quantity'))
+        movements = movements.filter(created_at__gt=previous)
+    for warehouse_id, product_id, total in movements.values_list('warehouse_id', 'product_id') \
+            .annotate(Sum('quantity')).order_by():
+        balances[warehouse_id, product_id] += total
+
+    snapshots = [StockSnapshot(warehouse_id=warehouse_id, product_id=product_id, taken_at=cutoff, quantity=quantity)
+                 for (warehouse_id, product_id), quantity in balances.items() if quantity]
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
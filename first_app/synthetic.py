@@ -0,0 +1,358 @@
+import multiprocessing
+import random
+from datetime import datetime, timedelta
+from datetime import time as day_time
+from decimal import Decimal
+from itertools import accumulate
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from . import changes, menus
+from .models import (
+    Restaurant, Table, Warehouse, Employee, Supplier, Product, Inventory, StockMovement,
+    Menu, Dish, MenuDetail, Modifier, RecipeItem, Customer, Reservation, Order, OrderDetail, Payment
+)
+from .slugs import transliterate_slug
+
+# Размеры при scale=1 (scale=100 — 10 млн заказов); справочник продуктов и блюд общий для сети и не масштабируется
+SCALE_UNIT = {'restaurants': 10, 'customers': 20_000, 'reservations': 30_000, 'orders': 100_000}
+SUPPLIERS, PRODUCTS, DISHES, LUNCH_DISHES = 40, 400, 250, 15
+# У первых MODIFIED_DISHES блюд есть свой модификатор, ещё GENERIC_MODIFIERS подходят к любому блюду
+MODIFIED_DISHES, GENERIC_MODIFIERS = 110, 10
+TABLES_PER_RESTAURANT = (12, 30)
+CENTRAL_WAREHOUSE_EVERY = 10
+# (должность, человек, диапазон зарплаты); менеджер идёт первым — он же manager ресторана или склада
+RESTAURANT_STAFF = (('Менеджер', 1, (90000, 160000)), ('Шеф-повар', 1, (80000, 140000)),
+                    ('Повар', 4, (45000, 80000)), ('Официант', 6, (35000, 55000)), ('Бармен', 2, (40000, 60000)))
+WAREHOUSE_STAFF = (('Менеджер склада', 1, (70000, 110000)), ('Кладовщик', 2, (40000, 55000)))
+HISTORY_DAYS = 365
+RESERVATION_DAYS = (-60, 30)
+INSERT_BATCH = 2000
+DEFAULT_CHUNK_SIZE = 10_000
+
+FIRST_NAMES = ["Анна", "Иван", "Мария", "Пётр", "Елена", "Алексей", "Ольга", "Дмитрий", "Наталья", "Сергей",
+               "Татьяна", "Андрей", "Юлия", "Михаил", "Ксения", "Николай", "Дарья", "Артём", "Полина", "Егор"]
+LAST_NAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков", "Морозов",
+              "Волков", "Алексеев", "Павлов", "Семёнов", "Голубев", "Виноградов", "Богданов", "Фёдоров", "Орлов"]
+CATEGORIES = {
+    "Супы": ["Борщ", "Солянка", "Уха", "Щи", "Окрошка"],
+    "Салаты": ["Оливье", "Винегрет", "Цезарь", "Греческий салат", "Сельдь под шубой"],
+    "Горячее": ["Бефстроганов", "Котлета по-киевски", "Пельмени", "Голубцы", "Плов", "Судак"],
+    "Гарниры": ["Пюре", "Гречка", "Рис", "Овощи гриль"],
+    "Десерты": ["Медовик", "Сырники", "Наполеон", "Блины", "Пирожок"],
+    "Напитки": ["Морс", "Компот", "Квас", "Чай", "Кофе"],
+}
+# Распределение по часам (обед и вечерний пик) и по дням недели (пятница и суббота — самые загруженные)
+HOURS = list(range(11, 23))
+HOUR_WEIGHTS = [2, 6, 8, 5, 3, 3, 5, 9, 10, 8, 4, 2]
+WEEKDAY_WEIGHTS = [8, 8, 9, 10, 14, 16, 12]
+DETAILS_PER_ORDER = ([1, 2, 3, 4, 5], [30, 30, 20, 12, 8])
+GENERATED_MODELS = (Warehouse, Restaurant, Employee, Table, Supplier, Product, Inventory, StockMovement, Menu, Dish,
+                    MenuDetail, Modifier, RecipeItem, Customer, Reservation, Order, OrderDetail, Payment)
+
+
+def _slug(base, suffix):
+    """Слаг, уникальный за счёт суффикса (обычно id): без запросов к базе, в пределах max_length=50."""
+    suffix = str(suffix)
+    return f"{base[:49 - len(suffix)].strip('-')}-{suffix}"
+
+
+class Catalog:
+    """
+    Справочная часть набора данных, целиком выводимая из (scale, seed, today): рестораны, столы, меню и цены.
+    Её строят и главный процесс (для вставки справочников), и каждый воркер (для заказов и броней),
+    поэтому воркерам ничего не передаётся, кроме этих трёх значений и номера пачки.
+    """
+
+    def __init__(self, scale, seed, today):
+        self.scale, self.seed, self.today = scale, seed, today
+        counts = {name: max(1, round(unit * scale)) for name, unit in SCALE_UNIT.items()}
+        self.restaurants, self.customers = counts['restaurants'], counts['customers']
+        self.reservations, self.orders = counts['reservations'], counts['orders']
+        rng = random.Random(f"{seed}:catalog")
+
+        self.restaurant_names = [f"Ресторан {number}" for number in range(1, self.restaurants + 1)]
+        self.restaurant_slugs = [transliterate_slug(name) for name in self.restaurant_names]
+        # Посещаемость филиалов неравномерна (логнормальное распределение), цены отличаются по районам
+        self.restaurant_weights = list(accumulate(rng.lognormvariate(0, 0.6) for _ in range(self.restaurants)))
+        self.price_factors = [rng.choice((Decimal('0.9'), Decimal('1.0'), Decimal('1.0'), Decimal('1.15'),
+                                          Decimal('1.3'))) for _ in range(self.restaurants)]
+        self.warehouses = self.restaurants + max(1, self.restaurants // CENTRAL_WAREHOUSE_EVERY)
+
+        # Столы каждого ресторана занимают непрерывный диапазон id
+        self.table_starts, self.table_capacities = [], []
+        for _ in range(self.restaurants):
+            self.table_starts.append(len(self.table_capacities) + 1)
+            count = rng.randint(*TABLES_PER_RESTAURANT)
+            self.table_capacities += [rng.choice((2, 2, 2, 4, 4, 4, 4, 6, 6, 8)) for _ in range(count)]
+        self.table_starts.append(len(self.table_capacities) + 1)
+
+        dishes = [(category, name) for category, names in CATEGORIES.items() for name in names]
+        self.dishes = [dishes[index % len(dishes)] + (index // len(dishes) + 1,) for index in range(DISHES)]
+        self.dish_prices = [Decimal(rng.randrange(190, 2500, 10)) for _ in range(DISHES)]
+        # Популярность блюд убывает по закону Ципфа: первые десятки блюд дают большую часть продаж
+        self.dish_weights = list(accumulate(1 / (rank + 1) for rank in range(DISHES)))
+        self.modifier_prices = [Decimal(rng.randrange(30, 300, 10))
+                                for _ in range(MODIFIED_DISHES + GENERIC_MODIFIERS)]
+
+        days = [today - timedelta(days=offset) for offset in range(HISTORY_DAYS)]
+        # Выручка сети растёт: свежие дни немного загруженнее старых
+        self.order_days = days
+        self.order_day_weights = list(accumulate(WEEKDAY_WEIGHTS[day.weekday()] * (2 - offset / HISTORY_DAYS)
+                                                 for offset, day in enumerate(days)))
+        self.hour_weights = list(accumulate(HOUR_WEIGHTS))
+
+    def dish_name(self, index):
+        category, name, variant = self.dishes[index]
+        return name if variant == 1 else f"{name} №{variant}"
+
+    def dish_slug(self, index):
+        return _slug(transliterate_slug(self.dish_name(index)), index + 1)
+
+    def modifier_slug(self, index):
+        return transliterate_slug(f"Добавка {index + 1}")
+
+    def menu_price(self, restaurant, dish):
+        return (self.dish_prices[dish] * self.price_factors[restaurant]).quantize(Decimal('1'))
+
+    def pick_restaurant(self, rng):
+        return rng.choices(range(self.restaurants), cum_weights=self.restaurant_weights)[0]
+
+    def pick_customer(self, rng):
+        # Постоянные гости (малые id) заказывают заметно чаще остальных
+        return min(int(self.customers * rng.random() ** 3) + 1, self.customers)
+
+    def pick_moment(self, rng, day):
+        hour = rng.choices(HOURS, cum_weights=self.hour_weights)[0]
+        return timezone.make_aware(datetime.combine(day, day_time(hour, rng.randrange(60), rng.randrange(60))))
+
+
+def _staff(rng, roles, **assignment):
+    return [(role, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), Decimal(rng.randrange(*salary, 500)),
+             assignment) for role, count, salary in roles for _ in range(count)]
+
+
+def load_reference(catalog):
+    """Справочники одной транзакцией: id проставляются заранее, поэтому циклические ссылки (менеджеры) не мешают."""
+    rng = random.Random(f"{catalog.seed}:reference")
+    created = catalog.today - timedelta(days=HISTORY_DAYS)
+    opening = timezone.make_aware(datetime.combine(created, day_time(9)))
+
+    staff = []
+    for index in range(catalog.restaurants):
+        staff += _staff(rng, RESTAURANT_STAFF, restaurant_id=index + 1)
+    restaurant_managers = list(range(1, len(staff) + 1, sum(count for _, count, _ in RESTAURANT_STAFF)))
+    warehouse_managers = []
+    for index in range(catalog.warehouses):
+        warehouse_managers.append(len(staff) + 1)
+        staff += _staff(rng, WAREHOUSE_STAFF, warehouse_id=index + 1)
+
+    warehouses = [Warehouse(id=index + 1, name=f"Склад {index + 1}", address=f"Промзона, {index + 1}",
+                            manager_id=warehouse_managers[index], slug=transliterate_slug(f"Склад {index + 1}"))
+                  for index in range(catalog.warehouses)]
+    restaurants = [Restaurant(id=index + 1, name=name, address=f"ул. Тверская, {index + 1}",
+                              phone=f"+7495{index + 1:07d}", email=f"branch{index + 1}@example.com",
+                              manager_id=restaurant_managers[index], warehouse_id=index + 1,
+                              slug=catalog.restaurant_slugs[index])
+                   for index, name in enumerate(catalog.restaurant_names)]
+    employees = [Employee(id=pk, first_name=first, last_name=last, role=role, salary=salary,
+                          hire_date=created + timedelta(days=rng.randrange(HISTORY_DAYS)),
+                          slug=_slug(transliterate_slug(f"{first}-{last}"), pk), **assignment)
+                 for pk, (role, first, last, salary, assignment) in enumerate(staff, start=1)]
+    tables = []
+    for restaurant in range(catalog.restaurants):
+        start, end = catalog.table_starts[restaurant], catalog.table_starts[restaurant + 1]
+        tables += [Table(id=pk, restaurant_id=restaurant + 1, table_number=pk - start + 1,
+                         capacity=catalog.table_capacities[pk - 1],
+                         slug=f"{catalog.restaurant_slugs[restaurant]}-{pk - start + 1}") for pk in range(start, end)]
+
+    suppliers = [Supplier(id=pk, name=f"Поставщик {pk}", contact_person=rng.choice(FIRST_NAMES),
+                          phone=f"+7499{pk:07d}", email=f"supplier{pk}@example.com", address=f"Москва, склад {pk}",
+                          slug=transliterate_slug(f"Поставщик {pk}")) for pk in range(1, SUPPLIERS + 1)]
+    units = (Product.UNIT_KG, Product.UNIT_L, Product.UNIT_PCS)
+    products = [Product(id=pk, name=f"Продукт {pk}", unit=rng.choice(units),
+                        supplier_id=rng.randint(1, SUPPLIERS), slug=transliterate_slug(f"Продукт {pk}"))
+                for pk in range(1, PRODUCTS + 1)]
+    inventory = [Inventory(warehouse_id=warehouse, product_id=product, quantity=Decimal(rng.randrange(20, 2000)),
+                           slug=f"produkt-{product}-sklad-{warehouse}")
+                 for warehouse in range(1, catalog.warehouses + 1) for product in range(1, PRODUCTS + 1)]
+    # Начальные остатки попадают и в журнал движений, как в миграции журнала
+    movements = [StockMovement(warehouse_id=row.warehouse_id, product_id=row.product_id,
+                               kind=StockMovement.ADJUSTMENT, quantity=row.quantity, reference='opening-balance',
+                               created_at=opening) for row in inventory]
+
+    dishes = [Dish(id=index + 1, name=catalog.dish_name(index), category=catalog.dishes[index][0],
+                   description="Блюдо сети", base_price=catalog.dish_prices[index], slug=catalog.dish_slug(index))
+              for index in range(DISHES)]
+    modifiers = [Modifier(id=index + 1, name=f"Добавка {index + 1}", price_change=catalog.modifier_prices[index],
+                          dish_id=index + 1 if index < MODIFIED_DISHES else None, slug=catalog.modifier_slug(index))
+                 for index in range(MODIFIED_DISHES + GENERIC_MODIFIERS)]
+    recipe_items = [RecipeItem(dish_id=dish, product_id=product, quantity=Decimal(rng.randrange(20, 400)) / 1000)
+                    for dish in range(1, DISHES + 1) for product in rng.sample(range(1, PRODUCTS + 1),
+                                                                               rng.randint(2, 5))]
+    recipe_items += [RecipeItem(modifier_id=modifier.id, product_id=rng.randint(1, PRODUCTS),
+                                quantity=Decimal(rng.randrange(10, 100)) / 1000) for modifier in modifiers]
+
+    menus_, details = [], []
+    for index in range(catalog.restaurants):
+        main, lunch = 2 * index + 1, 2 * index + 2
+        name = catalog.restaurant_names[index]
+        menus_ += [Menu(id=main, restaurant_id=index + 1, name="Основное меню", start_date=created,
+                        slug=transliterate_slug(f"Основное меню-{name}")),
+                   Menu(id=lunch, restaurant_id=index + 1, name="Бизнес-ланч", start_date=created,
+                        description="По будням с 12 до 16", slug=transliterate_slug(f"Бизнес-ланч-{name}"))]
+        details += [MenuDetail(menu_id=main, dish_id=dish + 1, price=catalog.menu_price(index, dish),
+                               is_available=rng.random() > 0.03) for dish in range(DISHES)]
+        details += [MenuDetail(menu_id=lunch, dish_id=dish + 1,
+                               price=(catalog.menu_price(index, dish) * Decimal('0.8')).quantize(Decimal('1')))
+                    for dish in sorted(rng.sample(range(DISHES), LUNCH_DISHES))]
+
+    with transaction.atomic():
+        for model, objs in ((Warehouse, warehouses), (Restaurant, restaurants), (Employee, employees),
+                            (Table, tables), (Supplier, suppliers), (Product, products), (Inventory, inventory),
+                            (StockMovement, movements), (Dish, dishes), (Modifier, modifiers),
+                            (RecipeItem, recipe_items), (Menu, menus_), (MenuDetail, details)):
+            model.objects.bulk_create(objs, batch_size=INSERT_BATCH)
+    return sum(map(len, (warehouses, restaurants, employees, tables, suppliers, products, inventory, movements,
+                         dishes, modifiers, recipe_items, menus_, details)))
+
+
+def _customers(catalog, rng, start, count):
+    customers = []
+    for pk in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        customers.append(Customer(id=pk, first_name=first, last_name=last, email=f"client{pk}@example.com",
+                                  phone=f"+79{pk:09d}", slug=_slug(transliterate_slug(f"{first}-{last}"), pk)))
+    Customer.objects.bulk_create(customers, batch_size=INSERT_BATCH)
+    return len(customers)
+
+
+def _reservations(catalog, rng, start, count):
+    reservations = []
+    for pk in range(start, start + count):
+        restaurant = catalog.pick_restaurant(rng)
+        table = rng.randrange(catalog.table_starts[restaurant], catalog.table_starts[restaurant + 1])
+        day = catalog.today + timedelta(days=rng.randint(*RESERVATION_DAYS))
+        if day < catalog.today:
+            status = rng.choices((Reservation.COMPLETED, Reservation.CANCELLED), (85, 15))[0]
+        else:
+            status = rng.choices((Reservation.CONFIRMED, Reservation.CANCELLED), (92, 8))[0]
+        number = table - catalog.table_starts[restaurant] + 1
+        reservations.append(Reservation(
+            id=pk, table_id=table, customer_id=catalog.pick_customer(rng) if rng.random() < 0.85 else None,
+            reservation_date=day, time=day_time(rng.choices(HOURS, cum_weights=catalog.hour_weights)[0],
+                                                rng.choice((0, 15, 30, 45))),
+            number_of_guests=rng.randint(1, catalog.table_capacities[table - 1]), status=status,
+            slug=_slug(f"{catalog.restaurant_slugs[restaurant]}-{number}-{day}", pk)))
+    Reservation.objects.bulk_create(reservations, batch_size=INSERT_BATCH)
+    return len(reservations)
+
+
+def _orders(catalog, rng, start, count):
+    orders, details, payments = [], [], []
+    for pk in range(start, start + count):
+        restaurant = catalog.pick_restaurant(rng)
+        day = rng.choices(catalog.order_days, cum_weights=catalog.order_day_weights)[0]
+        order_date = catalog.pick_moment(rng, day)
+        if day == catalog.today and rng.random() < 0.4:
+            status = Order.PENDING
+        else:
+            status = rng.choices((Order.COMPLETED, Order.CANCELLED), (94, 6))[0]
+        total = Decimal('0')
+        for _ in range(rng.choices(*DETAILS_PER_ORDER)[0]):
+            dish = rng.choices(range(DISHES), cum_weights=catalog.dish_weights)[0]
+            price, modifiers = catalog.menu_price(restaurant, dish), None
+            if dish < MODIFIED_DISHES and rng.random() < 0.2:
+                price += catalog.modifier_prices[dish]
+                modifiers = [catalog.modifier_slug(dish)]
+            quantity = rng.choices((1, 2, 3), (70, 22, 8))[0]
+            total += price * quantity
+            details.append(OrderDetail(order_id=pk, dish_id=dish + 1, quantity=quantity, price=price,
+                                       modifiers=modifiers))
+        paid_at = order_date + timedelta(minutes=rng.randint(25, 120))
+        customer = catalog.pick_customer(rng) if rng.random() < 0.7 else None
+        orders.append(Order(
+            id=pk, restaurant_id=restaurant + 1, customer_id=customer, order_date=order_date, total_amount=total,
+            status=status,
+            # Исторические заказы считаются уже списанными со склада, иначе их подхватит пакетное списание
+            stock_deducted_at=paid_at if status == Order.COMPLETED else None,
+            slug=_slug(f"payment-{catalog.restaurant_slugs[restaurant]}-{order_date:%Y%m%d%H%M%S}", pk)))
+        if status == Order.COMPLETED:
+            payments.append(Payment(
+                order_id=pk, amount=total, payment_time=paid_at, transaction_id=f"tx-{pk}",
+                payment_method=rng.choices((Payment.CARD, Payment.CASH, Payment.ONLINE), (60, 20, 20))[0],
+                slug=_slug(f"payment-{catalog.restaurant_slugs[restaurant]}-{paid_at:%Y%m%d%H%M%S}", pk)))
+    Order.objects.bulk_create(orders, batch_size=INSERT_BATCH)
+    OrderDetail.objects.bulk_create(details, batch_size=INSERT_BATCH)
+    Payment.objects.bulk_create(payments, batch_size=INSERT_BATCH)
+    return len(orders) + len(details) + len(payments)
+
+
+CHUNK_LOADERS = {'customers': _customers, 'reservations': _reservations, 'orders': _orders}
+_worker_catalog = None
+
+
+def _init_worker(scale, seed, today):
+    global _worker_catalog
+    _worker_catalog = Catalog(scale, seed, today)
+
+
+def load_chunk(task, catalog=None):
+    """Одна пачка (вид, номер, первый id, количество) в своей транзакции; данные зависят только от seed и номера."""
+    kind, number, start, count = task
+    catalog = catalog or _worker_catalog
+    rng = random.Random(f"{catalog.seed}:{kind}:{number}")
+    with transaction.atomic():
+        return kind, CHUNK_LOADERS[kind](catalog, rng, start, count)
+
+
+def chunk_tasks(kind, total, chunk_size):
+    return [(kind, number, start, min(chunk_size, total - start + 1))
+            for number, start in enumerate(range(1, total + 1, chunk_size))]
+
+
+def reset_sequences():
+    # id вставлялись явно: последовательности PostgreSQL нужно сдвинуть за максимальный id
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), GENERATED_MODELS):
+            cursor.execute(sql)
+
+
+def generate(scale=1, seed=1, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, today=None, log=None):
+    """
+    Заполняет пустую базу синтетическими данными. Одинаковые scale, seed, chunk_size и today дают одинаковые
+    данные при любом числе процессов: каждая пачка генерируется своим Random от seed и номера пачки.
+    Клиенты, брони и заказы вставляются пачками параллельно в workers процессах (fork; на SQLite — в одном).
+    Возвращает число вставленных строк.
+    """
+    log = log or (lambda message: None)
+    today = today or timezone.localdate()
+    catalog = Catalog(scale, seed, today)
+    rows = load_reference(catalog)
+    log(f"Справочники: {rows} строк")
+
+    phases = [chunk_tasks('customers', catalog.customers, chunk_size),
+              chunk_tasks('reservations', catalog.reservations, chunk_size) +
+              chunk_tasks('orders', catalog.orders, chunk_size)]
+    parallel = workers > 1 and connection.vendor != 'sqlite' and \
+        'fork' in multiprocessing.get_all_start_methods()
+    for tasks in phases:
+        if parallel:
+            # Соединения закрываются до fork: воркеры открывают свои, а не делят сокет родителя
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers, _init_worker, (scale, seed, today)) as pool:
+                results = pool.imap_unordered(load_chunk, tasks)
+                for done, (kind, count) in enumerate(results, start=1):
+                    rows += count
+                    log(f"{kind}: пачка {done}/{len(tasks)}, всего строк {rows}")
+        else:
+            for done, task in enumerate(tasks, start=1):
+                kind, count = load_chunk(task, catalog)
+                rows += count
+                log(f"{kind}: пачка {done}/{len(tasks)}, всего строк {rows}")
+
+    reset_sequences()
+    # bulk_create не отправляет сигналы: сбрасываем ETag и кэш документов меню вручную
+    changes.bump(*GENERATED_MODELS)
+    menus.bump_versions(range(1, catalog.restaurants + 1))
+    return rows
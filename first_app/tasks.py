@@ -1,54 +1,55 @@
 from celery import shared_task
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import Reservation
+from . import notifications, outbox, recipes, replicas, rollups, stock
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, max_retries=3)
-def send_reservation_notification(self, reservation_id, action):
-    try:
-        reservation = Reservation.objects.get(id=reservation_id)
-        customer = reservation.customer
-        if not customer.email:
-            logger.warning(f"Клиент {customer} не имеет email для бронирования {reservation_id}")
-            return f"No email for customer {customer.id}"
-
-        subject = f"Статус бронирования #{reservation_id}"
-        if action == 'confirmed':
-            message = (
-                f"Уважаемый {customer.first_name} {customer.last_name},\n\n"
-                f"Ваше бронирование стола #{reservation.table.table_number} в ресторане "
-                f"{reservation.table.restaurant.name} на {reservation.reservation_date} в "
-                f"{reservation.time} подтверждено.\n\n"
-                f"Количество гостей: {reservation.number_of_guests}\n"
-                f"Спасибо за выбор нашего ресторана!"
-            )
-        elif action == 'cancelled':
-            message = (
-                f"Уважаемый {customer.first_name} {customer.last_name},\n\n"
-                f"Ваше бронирование стола #{reservation.table.table_number} в ресторане "
-                f"{reservation.table.restaurant.name} на {reservation.reservation_date} в "
-                f"{reservation.time} было отменено.\n\n"
-                f"Если у вас есть вопросы, свяжитесь с нами."
-            )
-        else:
-            raise ValueError(f"Недопустимое действие: {action}")
-
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[customer.email],
-            fail_silently=False,
-        )
-        logger.info(f"Уведомление о бронировании {reservation_id} ({action}) отправлено на {customer.email}")
-        return f"Notification sent for reservation {reservation_id}"
-    except Reservation.DoesNotExist:
-        logger.error(f"Бронирование {reservation_id} не найдено")
-        return f"Reservation {reservation_id} not found"
-    except Exception as e:
-        logger.error(f"Ошибка при отправке уведомления для бронирования {reservation_id}: {str(e)}")
-        self.retry(countdown=60, exc=e)
+@shared_task
+def send_reservation_notification(reservation_id, action):
+    # Одиночная задача оставлена для уже поставленных в очередь сообщений и переводит их в outbox
+    outbox.record(reservation_id, action)
+    return f"Notification queued for reservation {reservation_id}"
+
+
+@shared_task
+def dispatch_reservation_outbox():
+    # Письма отправляет сам диспетчер: не ушедшие события остаются в outbox и держат порядок по брони
+    sent = outbox.dispatch(notifications.deliver, settings.RESERVATION_NOTIFY_BATCH_SIZE,
+                           max_batches=settings.RESERVATION_OUTBOX_MAX_BATCHES)
+    if sent:
+        logger.info(f"Из outbox отправлено событий бронирований: {sent}")
+    return sent
+
+
+@shared_task
+def send_reservation_notifications(events):
+    # Пачечная задача оставлена для уже поставленных в очередь пачек и возвращает их события в outbox
+    for reservation_id, action in events:
+        outbox.record(reservation_id, action)
+    return f"Notifications queued: {len(events)}"
+
+
+@shared_task
+def refresh_sales_rollups():
+    # Заказы читаются с реплики, агрегаты пишутся в primary; отставание реплики покрывает SALES_ROLLUP_OVERLAP_SECONDS
+    with replicas.replica_reads():
+        days = rollups.refresh_changed()
+    logger.info(f"Агрегаты продаж обновлены, пересчитано дней: {days}")
+    return days
+
+
+@shared_task
+def compact_stock_ledger():
+    snapshots = stock.compact()
+    logger.info(f"Снимок остатков сохранён, позиций: {snapshots}")
+    return snapshots
+
+
+@shared_task
+def deduct_completed_orders():
+    orders = recipes.deduct_pending(settings.STOCK_DEDUCTION_BATCH_SIZE, settings.STOCK_DEDUCTION_MAX_BATCHES)
+    if orders:
+        logger.info(f"Списаны ингредиенты заказов: {orders}")
+    return orders
@@ -1,12 +1,16 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include, re_path
 from .views import (
     RestaurantViewSet, TableViewSet, WarehouseViewSet, EmployeeViewSet,
     SupplierViewSet, ProductViewSet, InventoryViewSet, MenuViewSet,
     DishViewSet, MenuDetailViewSet, ModifierViewSet, CustomerViewSet,
-    ReservationViewSet, OrderViewSet, OrderDetailViewSet, PaymentViewSet
+    ReservationViewSet, OrderViewSet, OrderDetailViewSet, PaymentViewSet,
+    DailyRestaurantSalesViewSet, DailyDishSalesViewSet, StockMovementViewSet, RecipeItemViewSet
 )
 from rest_framework import routers
+from .metrics import metrics_view
+from .async_urls import urlpatterns as async_urlpatterns
 
 router = routers.SimpleRouter()
 router.register(r'restaurants', RestaurantViewSet)
@@ -16,19 +20,27 @@ router.register(r'employees', EmployeeViewSet)
 router.register(r'suppliers', SupplierViewSet)
 router.register(r'products', ProductViewSet)
 router.register(r'inventory', InventoryViewSet)
+router.register(r'stock-movements', StockMovementViewSet)
 router.register(r'menus', MenuViewSet)
 router.register(r'dishes', DishViewSet)
 router.register(r'menu-details', MenuDetailViewSet)
 router.register(r'modifiers', ModifierViewSet)
+router.register(r'recipe-items', RecipeItemViewSet)
 router.register(r'customers', CustomerViewSet)
 router.register(r'reservations', ReservationViewSet)
 router.register(r'orders', OrderViewSet)
 router.register(r'order-details', OrderDetailViewSet)
 router.register(r'payments', PaymentViewSet)
+router.register(r'analytics/restaurant-sales', DailyRestaurantSalesViewSet)
+router.register(r'analytics/dish-sales', DailyDishSalesViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include(router.urls)),
     path('api/v1/auth/', include('djoser.urls')),
-    re_path(r'^auth/', include('djoser.urls.authtoken'))
+    re_path(r'^auth/', include('djoser.urls.authtoken')),
+    path(settings.METRICS_PATH.lstrip('/'), metrics_view, name='metrics'),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
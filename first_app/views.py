@@ -1,45 +1,63 @@
 from rest_framework import viewsets, permissions, status
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.authentication import TokenAuthentication
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Sum, Value
 from .models import (
     Restaurant, Table, Warehouse, Employee, Supplier, Product, Inventory,
-    Menu, Dish, MenuDetail, Modifier, Customer, Reservation, Order, OrderDetail, Payment
+    Menu, Dish, MenuDetail, Modifier, Customer, Reservation, Order, OrderDetail, Payment,
+    DailyRestaurantSales, DailyDishSales, StockMovement, RecipeItem
 )
 from rest_framework.response import Response
 from .serializers import (
     RestaurantSerializer, EmployeeSerializer, SupplierSerializer, OrderSerializer, TableSerializer, WarehouseSerializer,
     ProductSerializer, InventorySerializer, MenuSerializer, DishSerializer, MenuDetailSerializer, ModifierSerializer,
-    CustomerSerializer, ReservationSerializer, OrderDetailSerializer, PaymentSerializer)
-from .tasks import send_reservation_notification
-from django.http import HttpResponse
+    CustomerSerializer, ReservationSerializer, OrderDetailSerializer, PaymentSerializer, InventoryBulkItemSerializer,
+    AvailabilityQuerySerializer, PlaceOrderSerializer, DailyRestaurantSalesSerializer, DailyDishSalesSerializer,
+    StockMovementSerializer, StockMovementItemSerializer, StockAtQuerySerializer, RecipeItemSerializer)
+from .availability import find_available_tables
+from .orders import place_order
+from . import changes, live, menus, notifications, outbox, recipes, stock
+from .mixins import ConditionalGetMixin, FastListMixin, QuerysetPlanMixin, StreamingExportMixin
+from .search import RankedSearchFilter
+from .pagination import StandardResultsSetPagination, TimeOrderedPagination
+from .renderers import EventStreamRenderer, ORJSONRenderer
+from .slugs import assign_slugs
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 
 
 # Create your views here.
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-
-class RestaurantViewSet(viewsets.ModelViewSet):
+class RestaurantViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Restaurant.objects.all()
     serializer_class = RestaurantSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['name', 'address']
     search_fields = ['name', 'address']
     ordering_fields = ['name', 'id']
     pagination_class = StandardResultsSetPagination
 
+    @action(detail=True, methods=['get'])
+    def menu(self, request, pk=None):
+        document = menus.get_document(pk)
+        if document is None:
+            restaurant = self.get_object()
+            document = menus.build_document(restaurant)
+            menus.store_document(restaurant.pk, document)
+        return Response(document, status=status.HTTP_200_OK)
 
-class TableViewSet(viewsets.ModelViewSet):
+
+class TableViewSet(ConditionalGetMixin, FastListMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Table.objects.all()
     serializer_class = TableSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['restaurant__slug', 'status', 'capacity']
     search_fields = ['table_number']
     ordering_fields = ['table_number', 'capacity']
@@ -55,23 +73,38 @@ class TableViewSet(viewsets.ModelViewSet):
         table.save()
         return Response({'status': table.status}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        params = self.get_availability_query(request)
+        slots = find_available_tables(params['restaurant'], params['date'], params['time'], params['guests'],
+                                      params.get('duration'))
+        return Response({'restaurant': params['restaurant'], 'date': params['date'], 'slots': slots},
+                        status=status.HTTP_200_OK)
+
+    @staticmethod
+    def get_availability_query(request):
+        times = [value for param in request.query_params.getlist('time') for value in param.split(',') if value]
+        query = AvailabilityQuerySerializer(data={**request.query_params.dict(), 'time': times})
+        query.is_valid(raise_exception=True)
+        return query.validated_data
 
-class WarehouseViewSet(viewsets.ModelViewSet):
+
+class WarehouseViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Warehouse.objects.all()
     serializer_class = WarehouseSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['name', 'address']
     search_fields = ['name', 'address']
     ordering_fields = ['name', 'id']
     pagination_class = StandardResultsSetPagination
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = {
         'restaurant__slug': ['exact'],
         'warehouse__slug': ['exact'],
@@ -83,162 +116,423 @@ class EmployeeViewSet(viewsets.ModelViewSet):
     pagination_class = StandardResultsSetPagination
 
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['name', 'email']
     search_fields = ['name', 'contact_person']
     ordering_fields = ['name', 'id']
     pagination_class = StandardResultsSetPagination
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['name', 'unit', 'supplier__slug']
     search_fields = ['name']
     ordering_fields = ['name', 'id']
     pagination_class = StandardResultsSetPagination
 
 
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Inventory.objects.all()
     serializer_class = InventorySerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['warehouse__slug', 'product__slug']
     search_fields = ['product__name']
     ordering_fields = ['quantity', 'last_updated']
     pagination_class = StandardResultsSetPagination
+    conditional_timestamp_field = 'last_updated'
+    bulk_batch_size = 1000
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        if not isinstance(request.data, list):
+            return Response({'error': 'Ожидается список позиций'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows, errors = {}, []
+        for index, item in enumerate(request.data):
+            serializer = InventoryBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                rows[index] = serializer.validated_data
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+
+        warehouses, products = self.resolve_bulk_slugs(rows.values())
+        items = {}
+        for index, row in rows.items():
+            row_errors = {}
+            if row['warehouse'] not in warehouses:
+                row_errors['warehouse'] = ['Склад не найден']
+            if row['product'] not in products:
+                row_errors['product'] = ['Продукт не найден']
+            if row_errors:
+                errors.append({'index': index, 'errors': row_errors})
+                continue
+            # Повтор одной и той же пары в запросе: побеждает последняя строка
+            items[(row['warehouse'], row['product'])] = row['quantity']
+
+        objs = [Inventory(warehouse=warehouses[warehouse_slug], product=products[product_slug], quantity=quantity)
+                for (warehouse_slug, product_slug), quantity in items.items()]
+        targets = {(obj.warehouse.id, obj.product.id): obj.quantity for obj in objs}
+        with transaction.atomic():
+            # Пересчёт остатков — это корректировка: в журнал пишется разница с остатком под блокировкой
+            current = stock.locked_quantities(targets)
+            assign_slugs(objs)
+            Inventory.objects.bulk_create(objs, batch_size=self.bulk_batch_size, update_conflicts=True,
+                                          unique_fields=['warehouse', 'product'],
+                                          update_fields=['quantity', 'last_updated'])
+            stock.record_movements(stock.adjustments(targets, current, reference='bulk'), apply=False)
+            # bulk_create не отправляет post_save
+            transaction.on_commit(lambda: changes.bump(Inventory))
+        errors.sort(key=lambda error: error['index'])
+        return Response({'upserted': len(objs), 'errors': errors}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def movements(self, request):
+        items = StockMovementItemSerializer(data=request.data, many=True, allow_empty=False)
+        items.is_valid(raise_exception=True)
+        warehouses, products = self.resolve_bulk_slugs(items.validated_data)
+        errors, movements = [], []
+        for item in items.validated_data:
+            item_errors = {}
+            for field in ('warehouse', 'to_warehouse'):
+                if field in item and item[field] not in warehouses:
+                    item_errors[field] = ['Склад не найден']
+            if item['product'] not in products:
+                item_errors['product'] = ['Продукт не найден']
+            errors.append(item_errors)
+            if not item_errors:
+                movements += stock.movements_for(item['kind'], warehouses[item['warehouse']],
+                                                 products[item['product']], item['quantity'], item['reference'],
+                                                 warehouses.get(item.get('to_warehouse')))
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        stock.record_movements(movements)
+        return Response(StockMovementSerializer(movements, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def at(self, request):
+        query = StockAtQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        warehouse = Warehouse.objects.filter(slug=query.validated_data['warehouse']).only('id', 'slug').first()
+        if warehouse is None:
+            return Response({'error': 'Склад не найден'}, status=status.HTTP_404_NOT_FOUND)
+        at = query.validated_data.get('at') or timezone.now()
+        balances = stock.stock_at(warehouse.id, at)
+        slugs = dict(Product.objects.filter(id__in=balances).values_list('id', 'slug'))
+        return Response({'warehouse': warehouse.slug, 'at': at,
+                         'stock': {slugs[product_id]: quantity for product_id, quantity in balances.items()
+                                   if quantity}},
+                        status=status.HTTP_200_OK)
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            inventory = serializer.save()
+            stock.record_movements(stock.adjustments({(inventory.warehouse_id, inventory.product_id):
+                                                      inventory.quantity}, {}), apply=False)
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        old_pair = (instance.warehouse_id, instance.product_id)
+        with transaction.atomic():
+            current = stock.locked_quantities([old_pair])
+            inventory = serializer.save()
+            targets = {old_pair: 0, (inventory.warehouse_id, inventory.product_id): inventory.quantity}
+            stock.record_movements(stock.adjustments(targets, current), apply=False)
+
+    def perform_destroy(self, instance):
+        pair = (instance.warehouse_id, instance.product_id)
+        with transaction.atomic():
+            current = stock.locked_quantities([pair])
+            stock.record_movements(stock.adjustments({pair: 0}, current), apply=False)
+            instance.delete()
+
+    @staticmethod
+    def resolve_bulk_slugs(rows):
+        warehouse_slugs = {row[field] for row in rows for field in ('warehouse', 'to_warehouse') if field in row}
+        product_slugs = {row['product'] for row in rows}
+        # Склады и продукты разрешаются одним запросом (UNION ALL)
+        kind = Value('warehouse', output_field=CharField())
+        warehouses = Warehouse.objects.filter(slug__in=warehouse_slugs).values_list(kind, 'slug', 'id', 'name')
+        kind = Value('product', output_field=CharField())
+        products = Product.objects.filter(slug__in=product_slugs).values_list(kind, 'slug', 'id', 'name')
+        # Неполные экземпляры (id, slug, name): этого достаточно для внешнего ключа и для слага
+        resolved = {'warehouse': {}, 'product': {}}
+        models = {'warehouse': Warehouse, 'product': Product}
+        if warehouse_slugs or product_slugs:
+            for model_kind, slug, pk, name in warehouses.union(products, all=True):
+                resolved[model_kind][slug] = models[model_kind](id=pk, slug=slug, name=name)
+        return resolved['warehouse'], resolved['product']
+
+
+class StockMovementViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = StockMovement.objects.all()
+    serializer_class = StockMovementSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = {
+        'warehouse__slug': ['exact'],
+        'product__slug': ['exact'],
+        'kind': ['exact'],
+        'reference': ['exact'],
+        'created_at': ['gte', 'lte'],
+    }
+    ordering_fields = ['created_at']
+    pagination_class = TimeOrderedPagination
+    keyset_ordering = ('created_at',)
+    conditional_timestamp_field = 'created_at'
 
-class MenuViewSet(viewsets.ModelViewSet):
+
+class MenuViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Menu.objects.all()
     serializer_class = MenuSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['restaurant__slug', 'name', 'start_date', 'end_date']
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'start_date']
     pagination_class = StandardResultsSetPagination
 
 
-class DishViewSet(viewsets.ModelViewSet):
+class DishViewSet(ConditionalGetMixin, FastListMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Dish.objects.all()
     serializer_class = DishSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['category', 'base_price']
     search_fields = ['name', 'description', 'category']
     ordering_fields = ['name', 'base_price']
     pagination_class = StandardResultsSetPagination
 
 
-class MenuDetailViewSet(viewsets.ModelViewSet):
+class MenuDetailViewSet(ConditionalGetMixin, FastListMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = MenuDetail.objects.all()
     serializer_class = MenuDetailSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['menu__slug', 'dish__slug', 'is_available']
     search_fields = ['dish__name']
     ordering_fields = ['price', 'is_available']
     pagination_class = StandardResultsSetPagination
 
 
-class ModifierViewSet(viewsets.ModelViewSet):
+class ModifierViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Modifier.objects.all()
     serializer_class = ModifierSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['dish__slug']
     search_fields = ['name']
     ordering_fields = ['name', 'price_change']
     pagination_class = StandardResultsSetPagination
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class RecipeItemViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
+    queryset = RecipeItem.objects.all()
+    serializer_class = RecipeItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['dish__slug', 'modifier__slug', 'product__slug']
+    ordering_fields = ['id', 'quantity']
+    pagination_class = StandardResultsSetPagination
+
+
+class CustomerViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['email', 'phone']
     search_fields = ['first_name', 'last_name', 'email']
     ordering_fields = ['first_name', 'last_name']
     pagination_class = StandardResultsSetPagination
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
     filterset_fields = ['table__slug', 'customer__slug', 'reservation_date', 'status']
     search_fields = ['customer__first_name', 'customer__last_name']
     ordering_fields = ['reservation_date', 'time']
-    pagination_class = StandardResultsSetPagination
+    pagination_class = TimeOrderedPagination
+    keyset_ordering = ('table', 'reservation_date')
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def cancel(self, request, pk=None):
         reservation = self.get_object()
         if reservation.status != Reservation.CONFIRMED:
             return Response({'error': 'Бронирование уже отменено или завершено'}, status=status.HTTP_400_BAD_REQUEST)
-        reservation.status = Reservation.CANCELLED
+        with transaction.atomic():
+            reservation.status = Reservation.CANCELLED
+            reservation.save()
+            reservation.table.status = Table.FREE
+            reservation.table.save()
+            outbox.record(reservation.id, notifications.CANCELLED)
+        return Response({'status': reservation.status}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def complete(self, request, pk=None):
+        reservation = self.get_object()
+        if reservation.status != Reservation.CONFIRMED:
+            return Response({'error': 'Бронирование уже отменено или завершено'}, status=status.HTTP_400_BAD_REQUEST)
+        reservation.status = Reservation.COMPLETED
         reservation.save()
         reservation.table.status = Table.FREE
         reservation.table.save()
-        send_reservation_notification.delay(reservation.id, 'cancelled')
         return Response({'status': reservation.status}, status=status.HTTP_200_OK)
 
     def perform_create(self, serializer):
-        reservation = serializer.save()
-        send_reservation_notification.delay(reservation.id, 'confirmed')
+        with transaction.atomic():
+            reservation = serializer.save()
+            outbox.record(reservation.id, notifications.CONFIRMED)
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(StreamingExportMixin, ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['restaurant__slug', 'customer__slug', 'status', 'order_date']
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
+    filterset_fields = {
+        'restaurant__slug': ['exact'],
+        'customer__slug': ['exact'],
+        'status': ['exact'],
+        'order_date': ['exact', 'gte', 'lte'],
+    }
     search_fields = ['customer__first_name', 'customer__last_name']
     ordering_fields = ['order_date', 'total_amount']
-    pagination_class = StandardResultsSetPagination
+    pagination_class = TimeOrderedPagination
+    keyset_ordering = ('restaurant', 'order_date', 'id')
+    export_fields = (('id', 'id'), ('restaurant', 'restaurant__slug'), ('customer', 'customer__slug'),
+                     ('order_date', 'order_date'), ('total_amount', 'total_amount'), ('status', 'status'),
+                     ('slug', 'slug'))
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def complete(self, request, pk=None):
         order = self.get_object()
         if order.status != Order.PENDING:
             return Response({'error': 'Заказ уже завершен или отменен'}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = Order.COMPLETED
-        order.save()
+        with transaction.atomic():
+            order.status = Order.COMPLETED
+            # Ресторан и дата заказа не меняются — сигналы агрегатов не перечитывают старый день
+            order.save(update_fields=['status', 'updated_at'])
+            # В часы пик списание ингредиентов откладывается на пакетную задачу Celery
+            if not settings.STOCK_DEDUCTION_DEFERRED:
+                recipes.deduct_orders([order.id])
         return Response({'status': order.status}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def place(self, request):
+        cart = PlaceOrderSerializer(data=request.data)
+        cart.is_valid(raise_exception=True)
+        order = place_order(cart.validated_data['restaurant'], cart.validated_data.get('customer'),
+                            cart.validated_data['items'])
+        order = self.get_queryset().get(pk=order.pk)
+        return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
 
-class OrderDetailViewSet(viewsets.ModelViewSet):
+
+class OrderDetailViewSet(StreamingExportMixin, ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = OrderDetail.objects.all()
     serializer_class = OrderDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['order__slug', 'dish__slug']
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
+    filterset_fields = {
+        'order__slug': ['exact'],
+        'dish__slug': ['exact'],
+        'order__restaurant__slug': ['exact'],
+        'order__order_date': ['gte', 'lte'],
+    }
     search_fields = ['dish__name']
     ordering_fields = ['quantity', 'price']
     pagination_class = StandardResultsSetPagination
+    export_fields = (('id', 'id'), ('order', 'order_id'), ('dish', 'dish__slug'), ('quantity', 'quantity'),
+                     ('price', 'price'), ('modifiers', 'modifiers'))
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(StreamingExportMixin, ConditionalGetMixin, QuerysetPlanMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['order__slug', 'payment_method', 'payment_time']
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, OrderingFilter]
+    filterset_fields = {
+        'order__slug': ['exact'],
+        'payment_method': ['exact'],
+        'payment_time': ['exact', 'gte', 'lte'],
+    }
     search_fields = ['transaction_id']
     ordering_fields = ['payment_time', 'amount']
+    pagination_class = TimeOrderedPagination
+    keyset_ordering = ('payment_time',)
+    export_fields = (('id', 'id'), ('order', 'order__slug'), ('amount', 'amount'),
+                     ('payment_method', 'payment_method'), ('transaction_id', 'transaction_id'),
+                     ('payment_time', 'payment_time'), ('slug', 'slug'))
+
+
+class DailyRestaurantSalesViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = DailyRestaurantSales.objects.all()
+    serializer_class = DailyRestaurantSalesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = {
+        'restaurant__slug': ['exact'],
+        'day': ['exact', 'gte', 'lte'],
+    }
+    ordering_fields = ['day', 'revenue', 'orders_count']
+    ordering = ['-day']
     pagination_class = StandardResultsSetPagination
 
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        totals = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            orders_count=Sum('orders_count'), cancelled_count=Sum('cancelled_count'), revenue=Sum('revenue'))
+        return Response({key: value or 0 for key, value in totals.items()})
+
+
+class DailyDishSalesViewSet(ConditionalGetMixin, QuerysetPlanMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = DailyDishSales.objects.all()
+    serializer_class = DailyDishSalesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = {
+        'restaurant__slug': ['exact'],
+        'dish__slug': ['exact'],
+        'day': ['exact', 'gte', 'lte'],
+    }
+    ordering_fields = ['day', 'revenue', 'quantity']
+    ordering = ['-day']
+    pagination_class = StandardResultsSetPagination
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        rows = self.filter_queryset(self.get_queryset()).order_by().values_list('dish__slug').annotate(
+            Sum('orders_count'), Sum('quantity'), Sum('cancelled_quantity'), Sum('revenue')).order_by('-revenue__sum')
+        fields = ('dish', 'orders_count', 'quantity', 'cancelled_quantity', 'revenue')
+        return Response([dict(zip(fields, row)) for row in rows])
+
+
+class RestaurantLiveView(APIView):
+    """
+    Лента зала и кухни по SSE (first_app.live): снимок столов и заказов в обработке, затем их изменения.
+    Тело ответа — асинхронный генератор, поэтому маршрут подключается только под ASGI (first_app.async_urls).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, ORJSONRenderer]
+
+    def get(self, request, pk=None):
+        restaurant = get_object_or_404(Restaurant.objects.all(), pk=pk)
+        response = StreamingHttpResponse(live.stream(restaurant.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Иначе nginx копит поток в буфере и события доходят пачками
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 
 """
 Просто тестовые функции, но я не захотел их удалять, не обращайте на них внимание)
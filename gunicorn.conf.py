@@ -0,0 +1,18 @@
+import glob
+import os
+
+# Каталог снимков метрик воркеров (first_app.metrics, METRICS_MULTIPROC_DIR)
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+
+
+def on_starting(server):
+    # Снимки воркеров прошлого запуска больше ничего не значат
+    if METRICS_MULTIPROC_DIR:
+        for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, '*.json*')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if METRICS_MULTIPROC_DIR:
+        from first_app.metrics import mark_process_dead
+        mark_process_dead(worker.pid, METRICS_MULTIPROC_DIR)